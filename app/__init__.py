@@ -1,31 +1,33 @@
-from flask import Flask
+import time
+
+# Measured from here, so the startup breakdown covers this package's imports
+_imports_started = time.perf_counter()
+
+import click
+from flask import Flask, current_app, g, request
 from flask_cors import CORS
 from sqlalchemy import event
 from app.core.config import settings
+from app.core.metrics import REQUEST_SECONDS
 from app.db.session import SessionLocal
 from app.extensions import db
-from app.embeddings import faiss_service  # Import the singleton instance
+from app.embeddings import faiss_service, search_backend, search_batcher  # Import the singleton instances
 import json
-from app.schemas.product import ProductSchema  # Import your ProductSchema
 import logging
 
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, ProductSchema):
-            return obj.model_dump()  # Convert ProductSchema to a dictionary
-        return super().default(obj)
-
+IMPORT_SECONDS = time.perf_counter() - _imports_started
 
 def create_app():
+    setup_started = time.perf_counter()
     app = Flask(__name__)
     logging.basicConfig(level=logging.DEBUG)
     CORS(app)
-    # Use the custom encoder in your Flask app
-    app.json_encoder = CustomJSONEncoder
 
     app.config["SQLALCHEMY_DATABASE_URI"] = settings.DATABASE_URL
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["FLASK_RUN_OPTIONS"] = {"threaded": False}
+    # 404s raised by handlers carry their own message
+    app.config["ERROR_404_HELP"] = False
 
     # Initialize extensions
     db.init_app(app)
@@ -34,37 +36,185 @@ def create_app():
     from app.models.product import Product  # noqa
     from app.api.namespaces import api
     from app.mock_data import create_mock_data
+    from app.embeddings.index_sync import register_index_sync
+    from app.db.migrations import add_missing_columns
+
+    register_index_sync()
 
     with app.app_context():
         # Create database tables
         db.create_all()
+        add_missing_columns(db.engine, Product)
 
         print("before mock")
         create_mock_data(db.session)
         print("after mock")
 
-        # Initialize FAISS service
-        try:
-            faiss_service.initialize_index()
-        except ValueError as e:
-            print(str(e))
-
     # Initialize Flask-RestX API
     api.init_app(app)
+    # Batched searches run on the batcher's thread, inside this app's context
+    search_batcher.init_app(app)
+
+    # Load the model and index off the request path; /ready reports when done
+    startup_timings = {
+        "imports": IMPORT_SECONDS,
+        "app_setup": time.perf_counter() - setup_started,
+    }
+    if settings.WARMUP_IN_BACKGROUND:
+        faiss_service.start_warm_up(app, startup_timings)
+    else:
+        with app.app_context():
+            startup_timings.update(faiss_service.warm_up())
+        print(
+            "Startup timings: "
+            + " ".join(f"{phase}={seconds:.2f}s" for phase, seconds in startup_timings.items())
+        )
+
+    if settings.PROFILING_ENABLED:
+        from app.core.profiling import RequestProfiler
+
+        # Registered first so the profile spans the other request hooks too
+        RequestProfiler(
+            settings.PROFILE_DIR,
+            header=settings.PROFILE_HEADER,
+            sample_rate=settings.PROFILE_SAMPLE_RATE,
+            keep=settings.PROFILE_KEEP,
+            top_n=settings.PROFILE_TOP_N,
+        ).init_app(app)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            # The URL rule, not the path, keeps the label set bounded
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            REQUEST_SECONDS.labels(request.method, route, str(response.status_code)).observe(
+                time.perf_counter() - started
+            )
+        return response
+
+    @app.route("/ready")
+    def ready():
+        status = search_backend.readiness()
+        return status, 200 if status["status"] == "ready" else 503
 
     app.session_local = SessionLocal
 
+    @app.cli.command("build-index")
+    def build_index():
+        """Rebuild the search index from the database and publish a release."""
+        if settings.INDEX_READ_ONLY:
+            raise SystemExit("INDEX_READ_ONLY is set; run the builder with INDEX_READ_ONLY=false")
+        faiss_service.wait_until_warm()
+        faiss_service.refresh_index()
+
+    @app.cli.command("build-neighbors")
+    def build_neighbors():
+        """Recompute the "more like this" neighbor table."""
+        faiss_service.wait_until_warm()
+        faiss_service.build_neighbors()
+
+    @app.cli.command("ingest")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--chunk-size", default=5000, show_default=True, help="Rows per chunk")
+    @click.option("--workers", default=2, show_default=True, help="Encoding threads")
+    @click.option(
+        "--publish/--no-publish",
+        default=True,
+        show_default=True,
+        help="Build and publish an index release from the database afterwards",
+    )
+    def ingest(path, chunk_size, workers, publish):
+        """Stream a catalog CSV into the database and the search index.
+
+        Rows are upserted by their id column (id, product_id or ProductID).
+        Files without one are keyed by name and description: a row updates
+        the product with the same name and description, or gets a new id
+        after the highest existing one. Rows without a name or with an id
+        that is not a positive integer are skipped and counted.
+        """
+        if settings.INDEX_READ_ONLY:
+            raise SystemExit("INDEX_READ_ONLY is set; run the builder with INDEX_READ_ONLY=false")
+        from app.embeddings.ingest import ingest_catalog
+
+        faiss_service.wait_until_warm()
+        try:
+            result = ingest_catalog(path, chunk_size=chunk_size, workers=workers, publish=publish)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(json.dumps(result, indent=2))
+
+    @app.cli.command("serve-shards")
+    @click.option("--count", default=2, show_default=True, help="Number of shard processes")
+    @click.option("--base-port", default=5101, show_default=True)
+    @click.option("--key", type=click.Choice(["id", "category"]), default="id", show_default=True)
+    @click.option("--index-root", default="data/shards", show_default=True)
+    def serve_shards(count, base_port, key, index_root):
+        """Run a local cluster of shard processes until interrupted."""
+        from app.embeddings.sharding import LocalShardCluster
+
+        cluster = LocalShardCluster(count, base_port, index_root, key=key)
+        cluster.start()
+        try:
+            if not cluster.wait_until_ready():
+                raise click.ClickException("A shard process exited or never became ready")
+            click.echo(
+                "Shards ready. Start a coordinator with\n"
+                f"  SHARD_COUNT={count} SHARD_KEY={key} "
+                f"SHARD_URLS='{json.dumps(cluster.urls)}' flask run"
+            )
+            # Keep the others serving when one dies, so the coordinator's
+            # handling of a missing shard can be tried out
+            running = set(range(count))
+            while running:
+                for shard in sorted(running):
+                    code = cluster.processes[shard].poll()
+                    if code is not None:
+                        click.echo(f"Shard {shard} exited with status {code}")
+                        running.discard(shard)
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            cluster.stop()
+
+    @app.cli.command("export-encoder")
+    @click.option("--model", default=None, help="Defaults to EMBEDDING_MODEL")
+    @click.option("--output", default=None, help="Defaults to EMBEDDING_ONNX_DIR")
+    @click.option("--opset", default=14, show_default=True)
+    def export_encoder(model, output, opset):
+        """Export the embedding model to ONNX (fp32 and int8) for the onnx backends."""
+        from app.embeddings.encoders import export_onnx
+
+        result = export_onnx(
+            model or settings.EMBEDDING_MODEL, output or settings.EMBEDDING_ONNX_DIR, opset=opset
+        )
+        click.echo(json.dumps(result, indent=2))
+
+    @app.cli.command("check-encoder")
+    @click.option("--backend", type=click.Choice(["onnx", "onnx_int8"]), default="onnx_int8")
+    def check_encoder(backend):
+        """Compare an exported ONNX encoder with the reference model's embeddings."""
+        from app.embeddings.encoders import check_agreement, create_encoder
+
+        try:
+            encoder = create_encoder(backend, settings.EMBEDDING_MODEL, settings.EMBEDDING_ONNX_DIR)
+            result = check_agreement(encoder, settings.EMBEDDING_MIN_AGREEMENT)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(json.dumps(result, indent=2))
+
     @app.teardown_appcontext
     def close_session(exception=None):
         db.session.remove()
 
     @event.listens_for(db.session, "after_attach")
     def on_attach(session, instance):
-        if not session.app.debug:
-            session.configure(expire_on_commit=False)
-
-    @event.listens_for(db.session, "after_rollback")
-    def on_rollback(session):
-        session.rollback()
+        if not current_app.debug:
+            session.expire_on_commit = False
 
     return app
@@ -1,6 +1,16 @@
 from flask import Blueprint
+from app.core.config import settings
 from .namespaces import api
+from .routes.admin import admin_ns
+from .routes.metrics import metrics_ns
 from .routes.products import products_ns
 
 api_bp = Blueprint("api", __name__)
 api.add_namespace(products_ns)
+api.add_namespace(admin_ns)
+api.add_namespace(metrics_ns)
+# Only shard processes serve the coordinator's endpoints
+if settings.SHARD_ID is not None:
+    from .routes.shard import shard_ns
+
+    api.add_namespace(shard_ns)
@@ -0,0 +1 @@
+"""FastAPI routers served by app.main"""
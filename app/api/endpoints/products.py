@@ -0,0 +1,152 @@
+from typing import AsyncIterator, Dict
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.routes.products import search_options
+from app.api.serialization import (
+    JSON,
+    NDJSON,
+    dump_products,
+    encode_response,
+    ndjson_lines,
+    parse_fields,
+    prefers_ndjson,
+)
+from app.core.config import settings
+from app.services.async_product_service import (
+    SearchPool,
+    get_related_products,
+    get_similar_products,
+    get_similar_products_batch,
+)
+from app.services.product_service import top_k_error
+
+# Same paths, bodies and status codes as the Flask products namespace
+router = APIRouter(prefix="/products", tags=["products"])
+
+
+async def get_session(request: Request) -> AsyncIterator[AsyncSession]:
+    # Connects on first query, so searches the catalog hydrates never do
+    async with request.app.state.async_session() as session:
+        yield session
+
+
+def get_search_pool(request: Request) -> SearchPool:
+    return request.app.state.search_pool
+
+
+def _respond(request: Request, data) -> Response:
+    # Encoded once, as the Flask API's representations do
+    if prefers_ndjson(request.headers.get("accept")):
+        return StreamingResponse(ndjson_lines(data), media_type=NDJSON)
+    return Response(encode_response(data), media_type=JSON)
+
+
+def _error(status: int, message: str) -> JSONResponse:
+    # flask_restx's abort() body
+    return JSONResponse({"message": message}, status_code=status)
+
+
+async def _json_object(request: Request) -> Dict:
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise ValueError("Request body must be valid JSON")
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object")
+    return payload
+
+
+@router.post("/")
+async def search_products(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    pool: SearchPool = Depends(get_search_pool),
+):
+    try:
+        payload = await _json_object(request)
+        query = payload.get("query")
+        top_k = payload.get("top_k", 5)
+
+        if not query:
+            return _error(400, "Query parameter is required")
+        error = top_k_error(top_k)
+        if error is not None:
+            return _error(400, error)
+
+        fields = parse_fields(payload.get("fields"))
+        products = await get_similar_products(
+            session, pool, query, top_k, **search_options(payload)
+        )
+        return _respond(request, dump_products(products, fields))
+
+    except RuntimeError as e:
+        return _error(503, f"Search service unavailable: {str(e)}")
+    except ValueError as e:
+        return _error(400, str(e))
+    except Exception as e:
+        print(f"Internal server error: {str(e)}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@router.post("/batch")
+async def search_products_batch(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    pool: SearchPool = Depends(get_search_pool),
+):
+    try:
+        payload = await _json_object(request)
+        items = payload.get("queries")
+
+        if not isinstance(items, list) or not items:
+            return _error(400, "queries must be a non-empty list")
+        if len(items) > settings.BATCH_MAX_QUERIES:
+            return _error(400, f"At most {settings.BATCH_MAX_QUERIES} queries per batch")
+
+        fields = parse_fields(payload.get("fields"))
+        outcomes = await get_similar_products_batch(
+            session, pool, items, **search_options(payload)
+        )
+        for outcome in outcomes:
+            if "products" in outcome:
+                outcome["products"] = dump_products(outcome["products"], fields)
+        # NDJSON streams one line per query
+        if prefers_ndjson(request.headers.get("accept")):
+            return _respond(request, outcomes)
+        return _respond(request, {"results": outcomes})
+
+    except RuntimeError as e:
+        return _error(503, f"Search service unavailable: {str(e)}")
+    except ValueError as e:
+        return _error(400, str(e))
+
+
+@router.get("/{product_id}/similar")
+async def related_products(
+    product_id: int,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    pool: SearchPool = Depends(get_search_pool),
+):
+    try:
+        top_k = int(request.query_params.get("top_k", 5))
+    except ValueError:
+        top_k = None
+    error = top_k_error(top_k)
+    if error is not None:
+        return _error(400, error)
+
+    try:
+        fields = parse_fields(request.query_params.get("fields"))
+        products = await get_related_products(session, pool, product_id, top_k)
+        return _respond(request, dump_products(products, fields))
+
+    except LookupError as e:
+        return _error(404, str(e))
+    except RuntimeError as e:
+        return _error(503, f"Search service unavailable: {str(e)}")
+    except ValueError as e:
+        return _error(400, str(e))
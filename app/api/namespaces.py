@@ -1,9 +1,13 @@
 # app/api/namespaces.py
 from flask_restx import Api
 
+from app.api.serialization import JSON, NDJSON, output_json, output_ndjson
+
 api = Api(
     title="Your API Title",
     version="1.0",
     description="Your API Description",
     doc="/docs",
 )
+api.representation(JSON)(output_json)
+api.representation(NDJSON)(output_ndjson)
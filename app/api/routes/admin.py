@@ -0,0 +1,43 @@
+from flask_restx import Namespace, Resource
+from app.core.config import settings
+from app.core.security import require_api_key
+from app.embeddings import faiss_service, search_backend, search_batcher
+
+# Every route starts work or exposes internal state, so all need an API key
+admin_ns = Namespace(
+    "admin", description="Search service operations", decorators=[require_api_key]
+)
+
+
+@admin_ns.route("/search-scheduler")
+class SearchSchedulerStats(Resource):
+    def get(self):
+        return {"enabled": settings.SEARCH_BATCHING_ENABLED, **search_batcher.stats()}
+
+
+@admin_ns.route("/caches")
+class CacheStats(Resource):
+    def get(self):
+        return faiss_service.cache_stats()
+
+
+@admin_ns.route("/index")
+class IndexStatus(Resource):
+    def get(self):
+        return faiss_service.index_status()
+
+
+@admin_ns.route("/index/rebuild")
+class IndexRebuild(Resource):
+    def post(self):
+        # Searches keep using the current snapshot until the new one is ready
+        started = faiss_service.start_rebuild()
+        return {"started": started, **faiss_service.index_status()}, 202 if started else 409
+
+
+@admin_ns.route("/shards")
+class ShardStatus(Resource):
+    def get(self):
+        if search_backend is faiss_service:
+            return {"coordinator": False, "shard_id": faiss_service.shard_id}
+        return {"coordinator": True, **search_backend.stats()}
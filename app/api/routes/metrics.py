@@ -0,0 +1,12 @@
+from flask import Response
+from flask_restx import Namespace, Resource
+from app.core.metrics import CONTENT_TYPE, REGISTRY
+
+metrics_ns = Namespace("metrics", description="Prometheus metrics")
+
+
+@metrics_ns.route("")
+class Metrics(Resource):
+    def get(self):
+        # Prometheus text format, so bypass the API's JSON representation
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -1,26 +1,61 @@
 from flask_restx import Namespace, Resource
 from flask import request
-from app.services.product_service import get_similar_products
-from app.schemas.product import ProductSchema
-import json  # Import the json module
+from app.core.config import settings
+from app.services.product_service import (
+    get_related_products,
+    get_similar_products,
+    get_similar_products_batch,
+    top_k_error,
+)
+from app.api.serialization import dump_products, parse_fields, prefers_ndjson
+from app.embeddings.facets import SearchFilters
+from app.embeddings.faiss_service import SEARCH_MODES
 
 products_ns = Namespace("products", description="Product operations")
 
+# Optional per-request index tuning knobs accepted in the request body;
+# "filters" ({category, tags, price_min, price_max}), "mode" and "fields"
+# (a projection such as "id,name") are parsed separately
+SEARCH_OPTIONS = ("nprobe", "ef_search")
+
+
+def search_options(payload: dict) -> dict:
+    mode = payload.get("mode", "vector")
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"mode must be one of {', '.join(SEARCH_MODES)}")
+    options = {
+        "filters": SearchFilters.from_dict(payload.get("filters")),
+        "mode": mode,
+    }
+    for name in SEARCH_OPTIONS:
+        value = payload.get(name)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise ValueError(f"{name} must be a positive integer")
+        options[name] = value
+    return options
+
 
 @products_ns.route("/")
 class ProductList(Resource):
     def post(self):
         try:
             # Get query parameters
-            query = request.json.get("query")
-            top_k = request.json.get("top_k", 5)
+            payload = request.json or {}
+            query = payload.get("query")
+            top_k = payload.get("top_k", 5)
 
             if not query:
-                products_ns.abort(400, "Query parameter is required")
+                raise ValueError("Query parameter is required")
+            error = top_k_error(top_k)
+            if error is not None:
+                raise ValueError(error)
 
-            similar_products = get_similar_products(query, top_k)
-            # Serialize using the custom encoder
-            return json.dumps(similar_products, cls=CustomJSONEncoder)
+            fields = parse_fields(payload.get("fields"))
+            similar_products = get_similar_products(query, top_k, **search_options(payload))
+            # Encoded once by the API's representation (JSON, or NDJSON on request)
+            return dump_products(similar_products, fields)
 
         except RuntimeError as e:
             products_ns.abort(503, f"Search service unavailable: {str(e)}")
@@ -34,8 +69,55 @@ class ProductList(Resource):
             }, 500  # Return the error message and a 500 status code
 
 
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, ProductSchema):
-            return obj.dict()
-        return super().default(obj)
\ No newline at end of file
+@products_ns.route("/batch")
+class ProductBatch(Resource):
+    def post(self):
+        try:
+            payload = request.json or {}
+            items = payload.get("queries")
+
+            if not isinstance(items, list) or not items:
+                products_ns.abort(400, "queries must be a non-empty list")
+            if len(items) > settings.BATCH_MAX_QUERIES:
+                products_ns.abort(
+                    400, f"At most {settings.BATCH_MAX_QUERIES} queries per batch"
+                )
+
+            fields = parse_fields(payload.get("fields"))
+            outcomes = get_similar_products_batch(items, **search_options(payload))
+            for outcome in outcomes:
+                if "products" in outcome:
+                    outcome["products"] = dump_products(outcome["products"], fields)
+            if prefers_ndjson(request.headers.get("Accept")):
+                # One line per query
+                return outcomes
+            return {"results": outcomes}
+
+        except RuntimeError as e:
+            products_ns.abort(503, f"Search service unavailable: {str(e)}")
+        except ValueError as e:
+            products_ns.abort(400, str(e))
+
+
+@products_ns.route("/<int:product_id>/similar")
+class RelatedProducts(Resource):
+    def get(self, product_id):
+        try:
+            top_k = int(request.args.get("top_k", 5))
+        except ValueError:
+            top_k = None
+        error = top_k_error(top_k)
+        if error is not None:
+            products_ns.abort(400, error)
+
+        try:
+            fields = parse_fields(request.args.get("fields"))
+            products = get_related_products(product_id, top_k)
+            return dump_products(products, fields)
+
+        except LookupError as e:
+            products_ns.abort(404, str(e))
+        except RuntimeError as e:
+            products_ns.abort(503, f"Search service unavailable: {str(e)}")
+        except ValueError as e:
+            products_ns.abort(400, str(e))
@@ -0,0 +1,58 @@
+from flask_restx import Namespace, Resource
+from flask import request
+from app.api.routes.products import search_options
+from app.core.security import require_api_key
+from app.embeddings import faiss_service
+from app.embeddings.sharding import decode_vectors, encode_vectors
+
+# Called by a shard coordinator, not by clients; /shard/vector returns raw
+# catalog embeddings, so both routes need an API key
+shard_ns = Namespace(
+    "shard",
+    description="Shard-local search for a coordinator",
+    decorators=[require_api_key],
+)
+
+
+@shard_ns.route("/search")
+class ShardSearch(Resource):
+    def post(self):
+        payload = request.json or {}
+        try:
+            top_ks = payload.get("top_ks")
+            if not isinstance(top_ks, list) or not all(
+                isinstance(k, int) and not isinstance(k, bool) and k > 0 for k in top_ks
+            ):
+                raise ValueError("top_ks must be a list of positive integers")
+            results = faiss_service.search_batch(
+                payload.get("queries"),
+                top_ks,
+                query_embeddings=decode_vectors(payload.get("vectors")),
+                **search_options(payload),
+            )
+            return {
+                "shard": faiss_service.shard_id,
+                "index_version": faiss_service.snapshot.version,
+                "results": results,
+            }
+
+        except RuntimeError as e:
+            shard_ns.abort(503, f"Search service unavailable: {str(e)}")
+        except ValueError as e:
+            shard_ns.abort(400, str(e))
+
+
+@shard_ns.route("/vector")
+class ShardVector(Resource):
+    def post(self):
+        product_id = (request.json or {}).get("product_id")
+        if isinstance(product_id, bool) or not isinstance(product_id, int):
+            shard_ns.abort(400, "product_id must be an integer")
+        snapshot = faiss_service.snapshot
+        if snapshot is None:
+            shard_ns.abort(503, "Search service unavailable: Search index is not built yet")
+
+        vector = snapshot.catalog.vector(product_id)
+        if vector is None:
+            shard_ns.abort(404, f"Product {product_id} is not indexed")
+        return {"shard": faiss_service.shard_id, "vector": encode_vectors(vector[None, :])}
@@ -0,0 +1,105 @@
+# app/api/serialization.py
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+import orjson
+from flask import current_app
+from pydantic import TypeAdapter
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from app.core.metrics import stage
+from app.schemas.product import ProductSchema
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+
+PRODUCT_FIELDS = tuple(ProductSchema.model_fields)
+
+# Dumps a whole list of products in one pydantic-core call
+_PRODUCT_LIST = TypeAdapter(List[ProductSchema])
+
+# Non-string keys are written as strings, like json.dumps does
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+_DUMP_SECONDS = stage("dump")
+_SERIALIZE_SECONDS = stage("serialize")
+
+
+def dumps(data) -> bytes:
+    return orjson.dumps(data, option=_ORJSON_OPTIONS)
+
+
+def encode_response(data) -> bytes:
+    """``dumps`` for a whole response body, timed as the serialize stage."""
+    with _SERIALIZE_SECONDS.time():
+        return dumps(data)
+
+
+def parse_fields(raw) -> Optional[Set[str]]:
+    """Parse a ``fields`` projection (``"id,name"`` or a list of names).
+
+    None means every field.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    if not isinstance(raw, list) or not all(isinstance(name, str) for name in raw):
+        raise ValueError("fields must be a comma-separated string or a list of strings")
+    fields = {name.strip() for name in raw if name.strip()}
+    if not fields:
+        raise ValueError("fields must name at least one field")
+    unknown = fields - set(PRODUCT_FIELDS)
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(sorted(unknown))}; "
+            f"expected some of {', '.join(PRODUCT_FIELDS)}"
+        )
+    return fields
+
+
+def dump_products(
+    products: Sequence[ProductSchema], fields: Optional[Set[str]] = None
+) -> List[Dict]:
+    """Plain dicts for ``products``, restricted to ``fields`` when given."""
+    with _DUMP_SECONDS.time():
+        return _PRODUCT_LIST.dump_python(
+            list(products), include={"__all__": fields} if fields else None
+        )
+
+
+def ndjson_lines(data) -> Iterator[bytes]:
+    """One JSON line per item of a list, or a single line for anything else."""
+    items: Iterable = data if isinstance(data, list) else [data]
+    # Only encoding counts; time spent waiting on the client between lines does not
+    seconds = 0.0
+    for item in items:
+        started = time.perf_counter()
+        line = dumps(item) + b"\n"
+        seconds += time.perf_counter() - started
+        yield line
+    _SERIALIZE_SECONDS.observe(seconds)
+
+
+def output_json(data, code, headers=None):
+    """Flask-RESTX representation that encodes a response body exactly once."""
+    response = current_app.response_class(
+        encode_response(data), status=code, mimetype=JSON
+    )
+    response.headers.extend(headers or {})
+    return response
+
+
+def output_ndjson(data, code, headers=None):
+    """Streams list responses line by line for ``Accept: application/x-ndjson``."""
+    response = current_app.response_class(ndjson_lines(data), status=code, mimetype=NDJSON)
+    response.headers.extend(headers or {})
+    return response
+
+
+def prefers_ndjson(accept: Optional[str]) -> bool:
+    """Whether an ``Accept`` header asks for NDJSON over JSON."""
+    if not accept:
+        return False
+    return parse_accept_header(accept, MIMEAccept).best_match([JSON, NDJSON]) == NDJSON
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,7 +6,122 @@ class Settings(BaseSettings):
     API_KEYS: List[str]
     DATABASE_URL: str
 
+    # Search index
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    # sentence_transformers (reference) | onnx | onnx_int8; the ONNX backends
+    # run the model exported to EMBEDDING_ONNX_DIR by `flask export-encoder`
+    EMBEDDING_BACKEND: str = "sentence_transformers"
+    EMBEDDING_ONNX_DIR: str = "data/onnx_encoder"
+    # Lowest cosine to the reference embeddings an ONNX encoder may load with
+    EMBEDDING_MIN_AGREEMENT: float = 0.95
+    EMBEDDING_THREADS: int = 0  # ONNX Runtime intra-op threads, 0 = default
+    INDEX_DIR: str = "data/faiss_index"
+    INDEX_PERSIST: bool = True
+    # Serve only releases published under INDEX_DIR by a builder process
+    # (`flask build-index`); never read the catalog or build an index
+    INDEX_READ_ONLY: bool = False
+    # Poll INDEX_DIR for newly published releases and swap them in (0 disables)
+    INDEX_RELOAD_INTERVAL_SECONDS: float = 0
+    INDEX_KEEP_RELEASES: int = 2
+    # flat | hnsw | ivf_flat | ivf_pq | auto (chosen by catalog size)
+    INDEX_TYPE: str = "auto"
+    INDEX_HNSW_M: int = 32
+    INDEX_EF_CONSTRUCTION: int = 80
+    INDEX_EF_SEARCH: int = 64
+    INDEX_NLIST: int = 0  # 0 = about 4 * sqrt(rows)
+    INDEX_NPROBE: int = 16
+    INDEX_PQ_M: int = 48
+    INDEX_PQ_NBITS: int = 8
+    INDEX_TRAIN_SAMPLE: int = 100_000
+    # float32 | float16 | sq8 | binary: how the index stores vectors
+    INDEX_STORAGE: str = "float32"
+    INDEX_PCA_DIM: int = 0  # project vectors to this many dimensions, 0 = off
+    # Fetch k * factor candidates and re-score them with the full-precision
+    # vectors of the published release (0 or 1 = off)
+    INDEX_RERANK_FACTOR: int = 0
+
+    # Sharding: a shard process indexes only the products the plan assigns to
+    # SHARD_ID and serves them on /shard/*; give every shard its own INDEX_DIR
+    SHARD_ID: Optional[int] = None  # None = index the whole catalog
+    SHARD_COUNT: int = 1
+    SHARD_KEY: str = "id"  # id | category
+    # id sharding: first product id of shards 1..N-1; empty = id modulo N
+    SHARD_ID_BOUNDARIES: List[int] = []
+    # Coordinator: fan searches out to these shard base URLs, in shard order
+    SHARD_URLS: List[str] = []
+    # Answer with the shards that responded by then
+    SHARD_DEADLINE_MS: float = 250
+    # Sent as X-API-Key to the shards, whose /shard/* routes require one of
+    # their API_KEYS; defaults to this process's first API key
+    SHARD_API_KEY: Optional[str] = None
+
+    # Async entry point (uvicorn app.main:app): encode and search run on this
+    # many threads so the event loop keeps serving other requests meanwhile
+    ASYNC_SEARCH_WORKERS: int = 4
+    # Searches queued or running before new ones are refused with 503 (0 = no limit)
+    ASYNC_MAX_PENDING_SEARCHES: int = 64
+    # Defaults to the Flask app's database URL with its async driver
+    # (sqlite -> sqlite+aiosqlite)
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # Load the model and index in a background thread at startup (GET /ready
+    # turns 200 when done) instead of blocking create_app
+    WARMUP_IN_BACKGROUND: bool = True
+
+    # Content-addressed embedding store used by index (re)builds
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "data/embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: Optional[int] = 2_000_000
+    EMBEDDING_CACHE_MAX_AGE_DAYS: Optional[float] = 30
+    ENCODE_BATCH_SIZE: int = 256
+
+    # Hydrate search hits with one IN (...) query instead of the in-memory catalog
+    CATALOG_HYDRATE_FROM_DB: bool = False
+
+    # Upper bound on items accepted by POST /products/batch
+    BATCH_MAX_QUERIES: int = 256
+    # Upper bound on top_k for every search endpoint and batch item
+    MAX_TOP_K: int = 1000
+
+    # Coalesce concurrent single searches into batched encode + search calls.
+    # Only useful when the server handles requests on several threads.
+    SEARCH_BATCHING_ENABLED: bool = False
+    SEARCH_BATCH_MAX_SIZE: int = 32
+    SEARCH_BATCH_MAX_WAIT_MS: float = 5.0
+
+    # In-process LRU caches for query embeddings and hydrated search results
+    QUERY_EMBEDDING_CACHE_SIZE: int = 10_000
+    RESULT_CACHE_SIZE: int = 5_000
+    QUERY_CACHE_TTL_SECONDS: Optional[float] = 600
+    FILTER_SELECTOR_CACHE_SIZE: int = 256
+    # Filters matching at most this many products are searched exactly, not
+    # through the ANN index (0 = always use the index)
+    FILTER_EXACT_SEARCH_LIMIT: int = 4096
+
+    # BM25 keyword index and how hybrid search merges it with vector hits
+    LEXICAL_INDEX_ENABLED: bool = True
+    HYBRID_FUSION: str = "rrf"  # rrf | weighted
+    HYBRID_VECTOR_DEPTH: int = 100
+    HYBRID_LEXICAL_DEPTH: int = 100
+    HYBRID_RRF_K: int = 60
+    HYBRID_VECTOR_WEIGHT: float = 0.5  # weighted fusion only
+
+    # Materialized "more like this" neighbors per product (0 disables the table)
+    NEIGHBORS_TOP_N: int = 20
+    NEIGHBORS_BUILD_ON_REBUILD: bool = True
+    NEIGHBORS_BLOCK_SIZE: int = 1024
+
+    # Per-request cProfile runs (off: no hooks are registered at all). A
+    # request is profiled when it sends PROFILE_HEADER or is sampled at
+    # PROFILE_SAMPLE_RATE; the newest PROFILE_KEEP dumps stay in PROFILE_DIR
+    PROFILING_ENABLED: bool = False
+    PROFILE_HEADER: str = "X-Profile"
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_DIR: str = "data/profiles"
+    PROFILE_KEEP: int = 50
+    PROFILE_TOP_N: int = 15
+
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,201 @@
+# app/core/metrics.py
+import mmap
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds, from sub-millisecond cache hits to slow encodes
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# (labels, value) pairs of one gauge
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    text = ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs)
+    return "{" + text + "}" if text else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Timer:
+    __slots__ = ("series", "started")
+
+    def __init__(self, series: "HistogramSeries"):
+        self.series = series
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.series.observe(time.perf_counter() - self.started)
+
+
+class HistogramSeries:
+    """Bucket counts and sum of one label combination."""
+
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bound plus the +Inf overflow; cumulated when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        slot = bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += seconds
+
+    def time(self) -> _Timer:
+        """Context manager observing the seconds spent inside it."""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram:
+    """A Prometheus histogram, one series per combination of label values.
+
+    Observing costs a bisect and an uncontended lock; look series up once
+    with ``labels`` and keep them where the label values are fixed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> HistogramSeries:
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, HistogramSeries(self.bounds))
+        return series
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for values, series in sorted(self._series.items()):
+            counts, total = series.snapshot()
+            pairs = list(zip(self.labelnames, values))
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_labels(pairs + [('le', _number(bound))])} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(pairs)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {cumulative}")
+        return lines
+
+
+def render_samples(name: str, documentation: str, samples: Samples) -> List[str]:
+    # Collectors name running totals *_total, as Prometheus counters
+    kind = "counter" if name.endswith("_total") else "gauge"
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(sorted(labels.items()))} {_number(value)}")
+    return lines
+
+
+class Registry:
+    """Histograms updated as requests run, plus collectors that compute
+    gauges (and totals kept elsewhere) only when ``/metrics`` is scraped."""
+
+    def __init__(self):
+        self._histograms: List[Histogram] = []
+        # Each returns {name: (documentation, samples)}
+        self._collectors: List[Callable[[], Dict[str, Tuple[str, Samples]]]] = []
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        histogram = Histogram(*args, **kwargs)
+        self._histograms.append(histogram)
+        return histogram
+
+    def add_collector(self, collector: Callable[[], Dict[str, Tuple[str, Samples]]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+        for collector in self._collectors:
+            try:
+                gauges = collector()
+            except Exception as e:
+                # One broken collector must not hide every other metric
+                print(f"Error collecting metrics from {collector}: {str(e)}")
+                continue
+            for name, (documentation, samples) in gauges.items():
+                lines.extend(render_samples(name, documentation, samples))
+        return "\n".join(lines) + "\n"
+
+
+def process_memory() -> Dict[str, Tuple[str, Samples]]:
+    resident = _resident_bytes()
+    if resident is None:
+        return {}
+    return {
+        "process_resident_memory_bytes": ("Resident set size of this process", [({}, resident)])
+    }
+
+
+def _resident_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        # Only Linux has /proc
+        return None
+    return pages * mmap.PAGESIZE
+
+
+REGISTRY = Registry()
+REGISTRY.add_collector(process_memory)
+
+# Where a search request spends its time; see README "Metrics" for the stages
+SEARCH_STAGE_SECONDS = REGISTRY.histogram(
+    "search_stage_seconds", "Seconds spent per search stage", ("stage",)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Seconds from request start until the response is returned",
+    ("method", "route", "status"),
+)
+
+
+def stage(name: str) -> HistogramSeries:
+    return SEARCH_STAGE_SECONDS.labels(name)
@@ -0,0 +1,133 @@
+# app/core/profiling.py
+import cProfile
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+from flask import Flask, g, request
+
+
+class RequestProfiler:
+    """Runs selected requests under cProfile.
+
+    A request is profiled when it carries ``header`` (any non-empty value)
+    or is drawn with probability ``sample_rate``. Its ``top_n`` functions by
+    own time are printed with the request's log, the full profile is written
+    to ``directory`` (open it with ``python -m pstats`` or snakeviz) and only
+    the newest ``keep`` files are kept. The file name is returned in the
+    ``X-Profile-Id`` response header.
+
+    cProfile sees the request's own thread: time spent inside torch or FAISS
+    shows up under the Python call that entered them. Work handed to other
+    threads, such as the search batcher, is not included, and neither is a
+    streamed response body. One request is profiled at a time; others that
+    qualify meanwhile run unprofiled.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        header: str = "X-Profile",
+        sample_rate: float = 0.0,
+        keep: int = 50,
+        top_n: int = 15,
+    ):
+        self.directory = directory
+        self.header = header
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.top_n = top_n
+        self._active = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        # after_request is skipped when a handler raises
+        app.teardown_request(self._discard)
+
+    def _wanted(self) -> bool:
+        if self.header and request.headers.get(self.header):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start(self) -> None:
+        if not self._wanted() or not self._active.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        g.profile = (profiler, time.perf_counter())
+        profiler.enable()
+
+    def _finish(self, response):
+        entry = g.pop("profile", None)
+        if entry is None:
+            return response
+        profiler, started = entry
+        profiler.disable()
+        self._active.release()
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+
+        stats = pstats.Stats(profiler)
+        label = f"{request.method} {request.path} -> {response.status_code}"
+        print(f"Profile of {label} ({elapsed_ms:.1f} ms), top {self.top_n} by own time:")
+        for line in self.hot_functions(stats):
+            print(line)
+        name = self._save(stats)
+        if name is not None:
+            response.headers["X-Profile-Id"] = name
+        return response
+
+    def _discard(self, exception=None) -> None:
+        entry = g.pop("profile", None)
+        if entry is not None:
+            entry[0].disable()
+            self._active.release()
+
+    def hot_functions(self, stats: pstats.Stats) -> List[str]:
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)
+        lines = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in rows[: self.top_n]:
+            where = function if filename == "~" else f"{_short(filename)}:{line}({function})"
+            lines.append(
+                f"  {own * 1000:9.2f} ms own {cumulative * 1000:9.2f} ms cum {calls:7d}x  {where}"
+            )
+        return lines
+
+    def _save(self, stats: pstats.Stats) -> Optional[str]:
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method.lower()}-{slug}-{uuid.uuid4().hex[:8]}.prof"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stats.dump_stats(os.path.join(self.directory, name))
+            self._prune()
+        except OSError as e:
+            print(f"Could not write profile to {self.directory}: {str(e)}")
+            return None
+        return name
+
+    def _prune(self) -> None:
+        profiles = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".prof")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in profiles[: max(len(profiles) - self.keep, 0)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                # Another worker pruned it first
+                pass
+
+
+def _short(filename: str) -> str:
+    """``filename`` from its package directory on, e.g. ``faiss/__init__.py``."""
+    parts = filename.replace("\\", "/").split("/")
+    for marker in ("site-packages", "dist-packages", "lib"):
+        if marker in parts:
+            return "/".join(parts[len(parts) - parts[::-1].index(marker) :])
+    cwd = os.getcwd().replace("\\", "/") + "/"
+    return filename[len(cwd) :] if filename.startswith(cwd) else filename
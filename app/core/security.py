@@ -1,18 +1,42 @@
+from functools import wraps
+from typing import Optional
+
 from fastapi import Security, HTTPException
 from fastapi.security.api_key import APIKeyHeader, APIKeyQuery
+from flask import request
+from flask_restx import abort
 from app.core.config import settings
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 api_key_query = APIKeyQuery(name="api_key", auto_error=False)
 
+
+def is_valid_api_key(api_key: Optional[str]) -> bool:
+    return bool(api_key) and api_key in settings.API_KEYS
+
+
 async def get_api_key(
     api_key_header: str = Security(api_key_header),
     api_key_query: str = Security(api_key_query),
 ):
-    if api_key_header:
-        if api_key_header in settings.API_KEYS:
-            return api_key_header
-    if api_key_query:
-        if api_key_query in settings.API_KEYS:
-            return api_key_query
-    raise HTTPException(status_code=401, detail="Invalid or missing API Key")
\ No newline at end of file
+    if is_valid_api_key(api_key_header):
+        return api_key_header
+    if is_valid_api_key(api_key_query):
+        return api_key_query
+    raise HTTPException(status_code=401, detail="Invalid or missing API Key")
+
+
+def require_api_key(view):
+    """Flask counterpart of ``get_api_key``: reject requests without a key
+    from ``API_KEYS`` in the X-API-Key header or the api_key query parameter."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not (
+            is_valid_api_key(request.headers.get("X-API-Key"))
+            or is_valid_api_key(request.args.get("api_key"))
+        ):
+            abort(401, "Invalid or missing API Key")
+        return view(*args, **kwargs)
+
+    return wrapper
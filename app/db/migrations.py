@@ -0,0 +1,31 @@
+# app/db/migrations.py
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+
+def add_missing_columns(engine: Engine, model) -> List[str]:
+    """Add nullable columns declared on ``model`` but missing from its table.
+
+    ``create_all`` never alters existing tables, so databases created before
+    a column was added would fail every query touching the model. Only
+    additive, nullable changes are handled here.
+    """
+    table = model.__table__
+    inspector = inspect(engine)
+    if not inspector.has_table(table.name):
+        return []
+
+    existing = {column["name"] for column in inspector.get_columns(table.name)}
+    added = []
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            conn.execute(
+                text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}')
+            )
+            added.append(column.name)
+    return added
@@ -1,3 +1,28 @@
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+from app.embeddings.batching import SearchBatcher
 from app.embeddings.faiss_service import FaissService
+from app.embeddings.sharding import ShardCoordinator, ShardPlan
 
 faiss_service = FaissService()
+REGISTRY.add_collector(faiss_service.metrics)
+
+# Searches go to the local index, or fan out to shard processes (SHARD_URLS)
+search_backend = faiss_service
+if settings.SHARD_URLS:
+    search_backend = ShardCoordinator(
+        settings.SHARD_URLS,
+        ShardPlan.from_settings(settings),
+        faiss_service,
+        deadline_ms=settings.SHARD_DEADLINE_MS,
+        api_key=settings.SHARD_API_KEY or next(iter(settings.API_KEYS), None),
+    )
+    REGISTRY.add_collector(search_backend.metrics)
+
+# Only used when SEARCH_BATCHING_ENABLED; the worker thread starts on first use
+search_batcher = SearchBatcher(
+    search_backend.search_batch,
+    max_batch_size=settings.SEARCH_BATCH_MAX_SIZE,
+    max_wait_ms=settings.SEARCH_BATCH_MAX_WAIT_MS,
+)
+REGISTRY.add_collector(search_batcher.metrics)
@@ -0,0 +1,196 @@
+# app/embeddings/batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.metrics import REGISTRY, Samples
+
+# Upper bounds of the batch size histogram buckets; larger batches land in "+Inf"
+_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+_BATCH_SIZE = REGISTRY.histogram(
+    "search_batch_size",
+    "Searches coalesced into each batched search",
+    buckets=_BATCH_SIZE_BUCKETS,
+).labels()
+
+
+@dataclass
+class _Request:
+    query: str
+    top_k: int
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class SearchBatcher:
+    """Coalesces concurrent single-query searches into batched searches.
+
+    Callers enqueue a request and block on a future. One worker thread takes
+    the oldest request, keeps collecting until ``max_batch_size`` requests or
+    ``max_wait_ms`` after that request arrived, then runs them through
+    ``search_batch`` in one go and resolves every future. If the batched call
+    fails, each request is retried on its own, so one caller's bad request
+    never fails the others it was batched with.
+
+    Batches run inside ``app``'s application context (see ``init_app``), as
+    the same search would in the request thread.
+    """
+
+    def __init__(
+        self,
+        search_batch: Callable[[List[str], List[int]], List[List[Dict]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        app=None,
+    ):
+        self._search_batch = search_batch
+        self._app = app
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._batch_sizes = {str(bound): 0 for bound in _BATCH_SIZE_BUCKETS}
+        self._batch_sizes["+Inf"] = 0
+        self._wait_seconds_total = 0.0
+
+    def init_app(self, app) -> None:
+        self._app = app
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._run, name="search-batcher", daemon=True
+            )
+            self._worker.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._start_lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join(timeout)
+
+    def submit(self, query: str, top_k: int = 5) -> Future:
+        if not query.strip():
+            raise ValueError("Search query cannot be empty")
+        if isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1:
+            raise ValueError("top_k must be a positive integer")
+        # A forked worker inherits a dead thread object, not the thread
+        if self._worker is None or not self._worker.is_alive():
+            self.start()
+        request = _Request(query, top_k)
+        self._queue.put(request)
+        return request.future
+
+    def search(
+        self, query: str, top_k: int = 5, timeout: Optional[float] = None
+    ) -> List[Dict]:
+        return self.submit(query, top_k).result(timeout)
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = (
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if request is None:
+                # Shutdown: serve what we have, then let the loop exit
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            started = time.perf_counter()
+            self._record(batch, started)
+            with self._app.app_context() if self._app is not None else nullcontext():
+                self._run_batch(first, batch)
+
+    def _run_batch(self, first: _Request, batch: List[_Request]) -> None:
+        try:
+            results = self._search_batch(
+                [request.query for request in batch],
+                [request.top_k for request in batch],
+            )
+        except Exception as e:
+            if len(batch) == 1:
+                first.future.set_exception(e)
+            else:
+                # Find out whose request failed; the others still succeed
+                self._run_each(batch)
+            return
+
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+    def _run_each(self, batch: List[_Request]) -> None:
+        for request in batch:
+            try:
+                result = self._search_batch([request.query], [request.top_k])[0]
+            except Exception as e:
+                request.future.set_exception(e)
+            else:
+                request.future.set_result(result)
+
+    def _record(self, batch: List[_Request], started: float) -> None:
+        size = len(batch)
+        bucket = next(
+            (str(bound) for bound in _BATCH_SIZE_BUCKETS if size <= bound), "+Inf"
+        )
+        _BATCH_SIZE.observe(size)
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._batch_sizes[bucket] += 1
+            self._wait_seconds_total += sum(
+                started - request.enqueued_at for request in batch
+            )
+
+    def metrics(self) -> Dict[str, Tuple[str, Samples]]:
+        """Gauges for the metrics registry; batch sizes go to ``search_batch_size``."""
+        return {
+            "search_batch_queue_depth": (
+                "Searches waiting to be batched",
+                [({}, float(self._queue.qsize()))],
+            ),
+        }
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "running": self._worker is not None and self._worker.is_alive(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "mean_queue_wait_ms": (
+                    self._wait_seconds_total / self._items * 1000.0 if self._items else 0.0
+                ),
+                "batch_size_histogram": dict(self._batch_sizes),
+            }
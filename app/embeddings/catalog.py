@@ -0,0 +1,287 @@
+# app/embeddings/catalog.py
+import copy
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CATALOG_COLUMNS = ("name", "description", "category", "tags")
+NUMERIC_COLUMNS = ("price",)
+# Every product field held in memory, in the order ``from_rows`` expects
+CATALOG_FIELDS = CATALOG_COLUMNS + NUMERIC_COLUMNS
+
+# Use a dense id -> row array while it stays within this factor of the row count,
+# otherwise fall back to binary search over the sorted ids
+_DENSE_INDEX_MAX_RATIO = 4
+
+
+class StringColumn:
+    """Strings packed as one UTF-8 byte buffer plus an ``n + 1`` offsets array."""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_values(cls, values: Iterable[Optional[str]]) -> "StringColumn":
+        encoded = [(value or "").encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    @classmethod
+    def concat(cls, parts: Sequence["StringColumn"]) -> "StringColumn":
+        """One column holding the strings of ``parts`` in order."""
+        if not parts:
+            return cls.from_values([])
+        data = np.concatenate([part.data for part in parts])
+        offsets = np.zeros(sum(len(part) for part in parts) + 1, dtype=np.int64)
+        row, base = 0, 0
+        for part in parts:
+            offsets[row + 1 : row + len(part) + 1] = part.offsets[1:] + base
+            row += len(part)
+            base += int(part.offsets[-1])
+        return cls(data, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.data.nbytes + self.offsets.nbytes)
+
+
+def _pack_rows(
+    rows: Sequence[Sequence],
+) -> Tuple[np.ndarray, Dict[str, StringColumn], Dict[str, np.ndarray]]:
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    columns = {
+        name: StringColumn.from_values(row[pos + 1] for row in rows)
+        for pos, name in enumerate(CATALOG_COLUMNS)
+    }
+    offset = len(CATALOG_COLUMNS) + 1
+    numeric = {
+        name: np.array(
+            [np.nan if row[pos + offset] is None else row[pos + offset] for row in rows],
+            dtype=np.float64,
+        )
+        for pos, name in enumerate(NUMERIC_COLUMNS)
+    }
+    return ids, columns, numeric
+
+
+class ProductCatalog:
+    """Array-backed copy of the product fields served with search results.
+
+    Base rows are stored columnar and addressed through a dense id -> row
+    index. Rows changed after the catalog was built live in a small overlay
+    (and deleted base rows are masked) until the next full rebuild compacts
+    them back into the columns. ``copy`` shares the base arrays, so changes
+    can be applied to a copy while readers keep using the original.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        columns: Dict[str, StringColumn],
+        embeddings: np.ndarray,
+        numeric: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.columns = columns
+        # float64 columns with NaN for missing values
+        self.numeric = numeric or {
+            name: np.full(len(self.ids), np.nan) for name in NUMERIC_COLUMNS
+        }
+        self.embeddings = embeddings
+        self._alive = np.ones(len(self.ids), dtype=bool)
+        self._overlay: Dict[int, Tuple[Dict, np.ndarray]] = {}
+        self._build_row_index()
+
+    @classmethod
+    def from_rows(
+        cls, rows: Sequence[Sequence], embeddings: np.ndarray
+    ) -> "ProductCatalog":
+        """Build from ``(id, *CATALOG_FIELDS)`` tuples."""
+        ids, columns, numeric = _pack_rows(rows)
+        return cls(ids, columns, embeddings, numeric)
+
+    def copy(self) -> "ProductCatalog":
+        """A copy whose mask and overlay can change independently."""
+        clone = copy.copy(self)
+        clone._alive = self._alive.copy()
+        clone._overlay = dict(self._overlay)
+        return clone
+
+    def _build_row_index(self) -> None:
+        n = len(self.ids)
+        max_id = int(self.ids.max()) if n else -1
+        if n and self.ids.min() >= 0 and max_id < _DENSE_INDEX_MAX_RATIO * n + 1024:
+            self._dense = np.full(max_id + 1, -1, dtype=np.int32)
+            self._dense[self.ids] = np.arange(n, dtype=np.int32)
+            self._sorted_ids = None
+            self._sorted_rows = None
+        else:
+            self._dense = None
+            order = np.argsort(self.ids, kind="stable")
+            self._sorted_ids = self.ids[order]
+            self._sorted_rows = order.astype(np.int32)
+
+    def __len__(self) -> int:
+        return int(self._alive.sum()) + len(self._overlay)
+
+    def base_rows(self, product_ids: np.ndarray) -> np.ndarray:
+        """Vectorized id -> base row lookup; -1 for unknown or deleted ids."""
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        if self._dense is not None:
+            in_range = (product_ids >= 0) & (product_ids < len(self._dense))
+            rows = np.full(len(product_ids), -1, dtype=np.int64)
+            rows[in_range] = self._dense[product_ids[in_range]]
+        else:
+            pos = np.searchsorted(self._sorted_ids, product_ids)
+            pos = np.minimum(pos, max(len(self._sorted_ids) - 1, 0))
+            rows = np.full(len(product_ids), -1, dtype=np.int64)
+            if len(self._sorted_ids):
+                found = self._sorted_ids[pos] == product_ids
+                rows[found] = self._sorted_rows[pos[found]]
+        valid = rows >= 0
+        rows[valid] = np.where(self._alive[rows[valid]], rows[valid], -1)
+        return rows
+
+    def _base_record(self, row: int) -> Dict:
+        record = {"id": int(self.ids[row])}
+        for name, column in self.columns.items():
+            record[name] = column[row]
+        for name, values in self.numeric.items():
+            value = values[row]
+            record[name] = None if np.isnan(value) else float(value)
+        return record
+
+    def records(self, product_ids: Sequence[int]) -> List[Optional[Dict]]:
+        """Product field dicts in the order of ``product_ids`` (None when unknown)."""
+        rows = self.base_rows(np.asarray(product_ids, dtype=np.int64))
+        results: List[Optional[Dict]] = []
+        for pid, row in zip(product_ids, rows):
+            overlay = self._overlay.get(int(pid))
+            if overlay is not None:
+                results.append({"id": int(pid), **overlay[0]})
+            elif row >= 0:
+                results.append(self._base_record(int(row)))
+            else:
+                results.append(None)
+        return results
+
+    def vector(self, product_id: int) -> Optional[np.ndarray]:
+        """The stored normalized embedding of ``product_id``, or None."""
+        overlay = self._overlay.get(int(product_id))
+        if overlay is not None:
+            return overlay[1]
+        row = self.base_rows(np.array([product_id], dtype=np.int64))[0]
+        if row < 0:
+            return None
+        return np.asarray(self.embeddings[row], dtype=np.float32)
+
+    def rescore(self, queries: np.ndarray, product_ids: np.ndarray) -> np.ndarray:
+        """Exact inner products of each query with the stored vectors of its
+        row of candidate ``product_ids``; -inf for padding and unknown ids.
+
+        Reads only the candidates' rows, so a memory-mapped ``embeddings``
+        array stays mostly on disk.
+        """
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        rows = self.base_rows(product_ids.ravel()).reshape(product_ids.shape)
+        vectors = np.asarray(self.embeddings[np.maximum(rows, 0)], dtype=np.float32)
+        scores = np.einsum("qcd,qd->qc", vectors, queries).astype(np.float32)
+        scores[rows < 0] = -np.inf
+        if self._overlay:
+            for q, c in zip(*np.nonzero(np.isin(product_ids, list(self._overlay)))):
+                scores[q, c] = self._overlay[int(product_ids[q, c])][1] @ queries[q]
+        return scores
+
+    def upsert(self, records: List[Dict], embeddings: np.ndarray) -> None:
+        for record, vector in zip(records, embeddings):
+            pid = int(record["id"])
+            self._mask_base(pid)
+            fields = {name: record.get(name) or "" for name in CATALOG_COLUMNS}
+            for name in NUMERIC_COLUMNS:
+                value = record.get(name)
+                fields[name] = None if value is None else float(value)
+            self._overlay[pid] = (fields, np.asarray(vector, dtype=np.float32))
+
+    def remove(self, product_ids: Iterable[int]) -> None:
+        for pid in product_ids:
+            self._mask_base(int(pid))
+            self._overlay.pop(int(pid), None)
+
+    def overlay_records(self) -> List[Dict]:
+        return [{"id": pid, **fields} for pid, (fields, _) in self._overlay.items()]
+
+    def overlay_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and embeddings of the overlay rows."""
+        ids = np.fromiter(self._overlay, dtype=np.int64, count=len(self._overlay))
+        if not len(ids):
+            dimension = self.embeddings.shape[1] if self.embeddings.ndim == 2 else 0
+            return ids, np.zeros((0, dimension), dtype=np.float32)
+        vectors = np.vstack([vector for _, vector in self._overlay.values()])
+        return ids, vectors.astype(np.float32, copy=False)
+
+    def _mask_base(self, product_id: int) -> None:
+        row = self.base_rows(np.array([product_id], dtype=np.int64))[0]
+        if row >= 0:
+            self._alive[row] = False
+
+    @property
+    def alive(self) -> np.ndarray:
+        """Mask of base rows that were neither deleted nor replaced."""
+        return self._alive
+
+    @property
+    def overlay_size(self) -> int:
+        return len(self._overlay)
+
+    @property
+    def nbytes(self) -> int:
+        total = self.ids.nbytes + self._alive.nbytes
+        total += sum(column.nbytes for column in self.columns.values())
+        total += sum(values.nbytes for values in self.numeric.values())
+        if self._dense is not None:
+            total += self._dense.nbytes
+        else:
+            total += self._sorted_ids.nbytes + self._sorted_rows.nbytes
+        return int(total)
+
+
+class CatalogBuilder:
+    """Assembles a catalog from ``(id, *CATALOG_FIELDS)`` rows added in id
+    order one chunk at a time. Only the packed columns of earlier chunks are
+    kept, not their rows."""
+
+    def __init__(self):
+        self._parts: List[Tuple[np.ndarray, Dict[str, StringColumn], Dict[str, np.ndarray]]] = []
+
+    def add(self, rows: Sequence[Sequence]) -> None:
+        if rows:
+            self._parts.append(_pack_rows(rows))
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids, _, _ in self._parts)
+
+    def build(self, embeddings: np.ndarray) -> ProductCatalog:
+        """The catalog of every row added, with one ``embeddings`` row each."""
+        if not self._parts:
+            return ProductCatalog.from_rows([], embeddings)
+        ids = np.concatenate([part[0] for part in self._parts])
+        columns = {
+            name: StringColumn.concat([part[1][name] for part in self._parts])
+            for name in CATALOG_COLUMNS
+        }
+        numeric = {
+            name: np.concatenate([part[2][name] for part in self._parts])
+            for name in NUMERIC_COLUMNS
+        }
+        self._parts = []
+        return ProductCatalog(ids, columns, embeddings, numeric)
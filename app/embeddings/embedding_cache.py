@@ -0,0 +1,176 @@
+# app/embeddings/embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK = 900
+
+
+def text_key(model_name: str, text: str) -> str:
+    """Content address of an embedding: the model plus a hash of the encoded text."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+
+class EmbeddingCache:
+    """Persistent embedding store backed by a single SQLite file.
+
+    Vectors are stored as raw float32 bytes keyed by ``text_key``. Entries
+    remember when they were last used so stale ones can be collected by age,
+    and the store can be capped by entry count.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used"
+                " ON embeddings (last_used)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Bulk lookup; returns only the keys that were found."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, np.ndarray] = {}
+        if not keys:
+            return found
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start : start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, dim, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, dim, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32, count=dim)
+                if rows:
+                    conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                        [now, *chunk],
+                    )
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (key, int(vector.shape[0]), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vector, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def collect_garbage(
+        self, max_entries: Optional[int] = None, max_age_seconds: Optional[float] = None
+    ) -> int:
+        """Drop entries unused for ``max_age_seconds`` and trim to ``max_entries``.
+
+        The least recently used entries go first. Returns the number removed.
+        """
+        removed = 0
+        with self._lock, self._connect() as conn:
+            if max_age_seconds is not None:
+                cursor = conn.execute(
+                    "DELETE FROM embeddings WHERE last_used < ?",
+                    (time.time() - max_age_seconds,),
+                )
+                removed += cursor.rowcount
+            if max_entries is not None:
+                total = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                excess = total - max_entries
+                if excess > 0:
+                    cursor = conn.execute(
+                        "DELETE FROM embeddings WHERE key IN ("
+                        " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (excess,),
+                    )
+                    removed += cursor.rowcount
+        return removed
+
+
+def encode_with_cache(
+    model,
+    model_name: str,
+    texts: List[str],
+    cache: Optional[EmbeddingCache],
+    batch_size: int = 256,
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """Encode ``texts`` reusing cached vectors and storing new ones.
+
+    Only cache misses reach ``model.encode``, in batches of ``batch_size``.
+    Returns the float32 matrix in input order and hit/miss counts.
+    """
+    if cache is None:
+        vectors = np.asarray(model.encode(texts, batch_size=batch_size), dtype=np.float32)
+        return vectors, {"hits": 0, "misses": len(texts), "encoded": len(texts)}
+
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32), {"hits": 0, "misses": 0, "encoded": 0}
+
+    keys = [text_key(model_name, text) for text in texts]
+    found = cache.get_many(keys)
+
+    # Identical texts share one encode
+    missing: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+
+    missing_keys = list(missing)
+    for start in range(0, len(missing_keys), batch_size):
+        batch_keys = missing_keys[start : start + batch_size]
+        batch_vectors = np.asarray(
+            model.encode([missing[key] for key in batch_keys], batch_size=batch_size),
+            dtype=np.float32,
+        )
+        new_items = dict(zip(batch_keys, batch_vectors))
+        cache.put_many(new_items)
+        found.update(new_items)
+
+    hits = sum(1 for key in keys if key not in missing)
+    vectors = np.vstack([found[key] for key in keys]).astype(np.float32, copy=False)
+    return vectors, {
+        "hits": hits,
+        "misses": len(keys) - hits,
+        "encoded": len(missing_keys),
+    }
@@ -0,0 +1,311 @@
+# app/embeddings/encoders.py
+"""Text encoders behind one interface.
+
+``sentence_transformers`` runs the reference PyTorch model. ``onnx`` and
+``onnx_int8`` run the same transformer exported to ONNX (fp32, or with
+dynamically quantized int8 weights) on ONNX Runtime, with tokenization and
+pooling done outside the graph, so serving needs neither torch nor
+sentence-transformers. Export once with ``flask export-encoder``.
+
+The export stores reference embeddings of a few probe texts; ONNX encoders
+compare themselves against them when loaded (``check_agreement``).
+"""
+import inspect
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+ENCODER_BACKENDS = ("sentence_transformers", "onnx", "onnx_int8")
+
+ONNX_CONFIG_FILE = "encoder.json"
+ONNX_MODEL_FILES = {"onnx": "model.onnx", "onnx_int8": "model_int8.onnx"}
+REFERENCE_FILE = "reference.npy"
+
+# Short and long, plain and noisy product texts for the agreement check
+PROBE_TEXTS = (
+    "comfortable running shoes for men",
+    "Wireless Noise-Cancelling Headphones",
+    "Sony WH-1000XM4 over-ear bluetooth headset, 30h battery",
+    "cotton t-shirt",
+    "A timeless classic on military strategy. Explore ancient wisdom and learn "
+    "the principles of warfare.",
+    "stainless steel water bottle 750ml insulated",
+    "kids toy",
+    "Men's slim fit formal trousers in navy blue with a flat front and belt loops",
+    "4k ultra hd smart tv 55 inch",
+    "gift for mom",
+)
+
+
+def encoder_key(model_name: str, backend: str) -> str:
+    """Identity of an encoder's vectors, for embedding cache keys and index
+    artifacts. The reference backend keeps the bare model name."""
+    if backend == "sentence_transformers":
+        return model_name
+    return f"{model_name}+{backend}"
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _lowercases(normalizer: Optional[Dict]) -> bool:
+    """Whether a tokenizers normalizer spec (tokenizer.json) lowercases."""
+    if not normalizer:
+        return False
+    if normalizer.get("type") == "Sequence":
+        return any(_lowercases(step) for step in normalizer.get("normalizers", []))
+    return normalizer.get("type") == "Lowercase" or bool(normalizer.get("lowercase"))
+
+
+class Encoder:
+    """Encodes texts into float32 row vectors."""
+
+    backend = ""
+    # True when the model cannot tell "Shoes" from "shoes", so callers may
+    # lowercase texts (e.g. cache keys) without changing the vectors
+    do_lower_case = False
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @property
+    def key(self) -> str:
+        return encoder_key(self.model_name, self.backend)
+
+    @property
+    def dimension(self) -> int:
+        raise NotImplementedError
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        raise NotImplementedError
+
+
+class SentenceTransformerEncoder(Encoder):
+    backend = "sentence_transformers"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        # Either sentence-transformers or the tokenizer itself may lowercase
+        self.do_lower_case = bool(
+            getattr(self.model[0], "do_lower_case", False)
+            or getattr(self.model.tokenizer, "do_lower_case", False)
+        )
+
+    @property
+    def dimension(self) -> int:
+        return int(self.model.get_sentence_embedding_dimension())
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+
+class OnnxEncoder(Encoder):
+    """A transformer exported by ``export_onnx``, run on ONNX Runtime."""
+
+    def __init__(self, model_dir: str, quantized: bool = False, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), encoding="utf-8") as f:
+            self.config = json.load(f)
+        super().__init__(self.config["model_name"])
+        self.backend = "onnx_int8" if quantized else "onnx"
+        self.model_dir = model_dir
+
+        tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        with open(tokenizer_path, encoding="utf-8") as f:
+            self.do_lower_case = _lowercases(json.load(f).get("normalizer"))
+        self.tokenizer.enable_truncation(self.config["max_seq_length"])
+        self.tokenizer.enable_padding(
+            pad_id=self.config["pad_token_id"], pad_token=self.config["pad_token"]
+        )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILES[self.backend]),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {node.name for node in self.session.get_inputs()}
+
+    @property
+    def dimension(self) -> int:
+        return int(self.config["dimension"])
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        parts = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(list(texts[start : start + batch_size]))
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+            hidden = self.session.run(None, feeds)[0]
+
+            if self.config["pooling"] == "cls":
+                pooled = hidden[:, 0]
+            else:
+                weights = mask[:, :, None].astype(np.float32)
+                pooled = (hidden * weights).sum(axis=1) / np.maximum(
+                    weights.sum(axis=1), 1e-9
+                )
+            if self.config["normalize"]:
+                pooled = _normalized(pooled)
+            parts.append(pooled.astype(np.float32))
+        if not parts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.vstack(parts)
+
+
+def create_encoder(
+    backend: str, model_name: str, onnx_dir: Optional[str] = None, threads: int = 0
+) -> Encoder:
+    if backend == "sentence_transformers":
+        return SentenceTransformerEncoder(model_name)
+    if backend in ("onnx", "onnx_int8"):
+        if not onnx_dir or not os.path.exists(os.path.join(onnx_dir, ONNX_CONFIG_FILE)):
+            raise ValueError(
+                f"No exported ONNX model in {onnx_dir!r}; run 'flask export-encoder'"
+            )
+        encoder = OnnxEncoder(onnx_dir, quantized=backend == "onnx_int8", threads=threads)
+        if encoder.model_name != model_name:
+            raise ValueError(
+                f"ONNX model in {onnx_dir} was exported from {encoder.model_name}, "
+                f"not {model_name}"
+            )
+        return encoder
+    raise ValueError(f"Unknown encoder backend {backend!r}; expected one of {ENCODER_BACKENDS}")
+
+
+def agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Row-wise cosine similarity between two encoders' vectors of the same texts."""
+    cosines = (_normalized(reference) * _normalized(candidate)).sum(axis=1)
+    return {
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "p01_cosine": float(np.percentile(cosines, 1)),
+    }
+
+
+def check_agreement(encoder: OnnxEncoder, min_cosine: float) -> Dict[str, float]:
+    """Compare ``encoder`` with the reference vectors stored at export.
+
+    Raises ValueError when any probe text falls below ``min_cosine``.
+    """
+    reference = np.load(os.path.join(encoder.model_dir, REFERENCE_FILE))
+    result = agreement(reference, encoder.encode(encoder.config["probe_texts"]))
+    if result["min_cosine"] < min_cosine:
+        raise ValueError(
+            f"{encoder.backend} encoder disagrees with {encoder.model_name}: "
+            f"min cosine {result['min_cosine']:.4f} < {min_cosine}"
+        )
+    return result
+
+
+def export_onnx(
+    model_name: str, output_dir: str, opset: int = 14, probe_texts=PROBE_TEXTS
+) -> Dict:
+    """Export ``model_name``'s transformer to ONNX, plus an int8 copy.
+
+    Needs torch, sentence-transformers, onnx and onnxruntime. Writes the
+    tokenizer, pooling settings and reference embeddings of ``probe_texts``
+    next to the models.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0]
+    tokenizer = transformer.tokenizer
+    pooling = next((module for module in model if type(module).__name__ == "Pooling"), None)
+    normalize = any(type(module).__name__ == "Normalize" for module in model)
+    pooling_config = pooling.get_config_dict() if pooling is not None else {}
+    # sentence-transformers 2-5 store one flag per mode, later versions a name
+    pooling_mode = pooling_config.get("pooling_mode") or (
+        "cls" if pooling_config.get("pooling_mode_cls_token") else "mean"
+    )
+    if pooling_mode not in ("cls", "mean"):
+        raise ValueError(f"Unsupported pooling mode {pooling_mode!r} for ONNX export")
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [
+        name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample
+    ]
+
+    class HiddenStates(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    fp32_path = os.path.join(output_dir, ONNX_MODEL_FILES["onnx"])
+    # Newer torch defaults to the dynamo exporter, which needs onnxscript;
+    # the TorchScript exporter handles these models and dynamic axes fine
+    legacy = (
+        {"dynamo": False}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters
+        else {}
+    )
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStates(transformer.auto_model.eval()),
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                name: {0: "batch", 1: "sequence"}
+                for name in input_names + ["last_hidden_state"]
+            },
+            opset_version=opset,
+            **legacy,
+        )
+    quantize_dynamic(
+        fp32_path,
+        os.path.join(output_dir, ONNX_MODEL_FILES["onnx_int8"]),
+        weight_type=QuantType.QInt8,
+    )
+
+    probe_texts = list(probe_texts)
+    np.save(
+        os.path.join(output_dir, REFERENCE_FILE),
+        np.asarray(model.encode(probe_texts), dtype=np.float32),
+    )
+    config = {
+        "model_name": model_name,
+        "dimension": int(model.get_sentence_embedding_dimension()),
+        "max_seq_length": int(model.max_seq_length),
+        "pooling": pooling_mode,
+        "normalize": normalize,
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": int(tokenizer.pad_token_id),
+        "probe_texts": probe_texts,
+    }
+    # Written last: create_encoder treats its presence as a complete export
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    return {
+        backend: check_agreement(OnnxEncoder(output_dir, quantized=backend == "onnx_int8"), 0.0)
+        for backend in ONNX_MODEL_FILES
+    }
+
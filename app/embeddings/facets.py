@@ -0,0 +1,223 @@
+# app/embeddings/facets.py
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.embeddings.catalog import ProductCatalog
+
+
+def facet_value(value: str) -> str:
+    return value.strip().casefold()
+
+
+def split_tags(tags: Optional[str]) -> List[str]:
+    return [tag for tag in (facet_value(t) for t in (tags or "").split(",")) if tag]
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """Restrictions on which products a search may return.
+
+    ``categories`` and ``tags`` match any of the listed values; the price
+    bounds are inclusive. Hashable, so it can be part of a cache key.
+    """
+
+    categories: Tuple[str, ...] = ()
+    tags: Tuple[str, ...] = ()
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, payload: Optional[Dict]) -> Optional["SearchFilters"]:
+        """Parse the ``filters`` object of a request; None when it is empty."""
+        if not payload:
+            return None
+        if not isinstance(payload, dict):
+            raise ValueError("filters must be an object")
+
+        def values(name: str) -> Tuple[str, ...]:
+            raw = payload.get(name)
+            if raw is None:
+                return ()
+            if isinstance(raw, str):
+                raw = [raw]
+            if not isinstance(raw, list) or not all(isinstance(v, str) for v in raw):
+                raise ValueError(f"filters.{name} must be a string or list of strings")
+            return tuple(sorted({facet_value(v) for v in raw if v.strip()}))
+
+        def bound(name: str) -> Optional[float]:
+            raw = payload.get(name)
+            if raw is None:
+                return None
+            if isinstance(raw, bool) or not isinstance(raw, (int, float)):
+                raise ValueError(f"filters.{name} must be a number")
+            return float(raw)
+
+        unknown = set(payload) - {"category", "tags", "price_min", "price_max"}
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+        filters = cls(
+            categories=values("category"),
+            tags=values("tags"),
+            price_min=bound("price_min"),
+            price_max=bound("price_max"),
+        )
+        if filters == cls():
+            return None
+        return filters
+
+    def to_dict(self) -> Dict:
+        """The request form ``from_dict`` parses back into equal filters."""
+        payload = {}
+        if self.categories:
+            payload["category"] = list(self.categories)
+        if self.tags:
+            payload["tags"] = list(self.tags)
+        if self.price_min is not None:
+            payload["price_min"] = self.price_min
+        if self.price_max is not None:
+            payload["price_max"] = self.price_max
+        return payload
+
+    def matches(self, record: Dict) -> bool:
+        if self.categories and facet_value(record.get("category") or "") not in self.categories:
+            return False
+        if self.tags and not set(self.tags) & set(split_tags(record.get("tags"))):
+            return False
+        price = record.get("price")
+        if self.price_min is not None and (price is None or price < self.price_min):
+            return False
+        if self.price_max is not None and (price is None or price > self.price_max):
+            return False
+        return True
+
+
+class FacetIndex:
+    """Per-facet product id sets precomputed from the catalog base rows.
+
+    Each category and tag value maps to a sorted id array; prices are kept
+    sorted so a range resolves with two binary searches. Resolved filters
+    become a bitmap over product ids for ``faiss.IDSelectorBitmap``, which
+    FAISS checks while scanning instead of filtering afterwards.
+    """
+
+    def __init__(
+        self,
+        categories: Dict[str, np.ndarray],
+        tags: Dict[str, np.ndarray],
+        price_values: np.ndarray,
+        price_ids: np.ndarray,
+    ):
+        self.categories = categories
+        self.tags = tags
+        self.price_values = price_values
+        self.price_ids = price_ids
+
+    @classmethod
+    def from_catalog(cls, catalog: ProductCatalog) -> "FacetIndex":
+        ids = catalog.ids
+        category_rows: Dict[str, List[int]] = {}
+        tag_rows: Dict[str, List[int]] = {}
+        category_column = catalog.columns["category"]
+        tags_column = catalog.columns["tags"]
+        for row in range(len(ids)):
+            category = facet_value(category_column[row])
+            if category:
+                category_rows.setdefault(category, []).append(row)
+            for tag in split_tags(tags_column[row]):
+                tag_rows.setdefault(tag, []).append(row)
+
+        def id_sets(rows_by_value: Dict[str, List[int]]) -> Dict[str, np.ndarray]:
+            return {
+                value: np.unique(ids[np.asarray(rows, dtype=np.int64)])
+                for value, rows in rows_by_value.items()
+            }
+
+        prices = np.asarray(catalog.numeric["price"])
+        priced = ~np.isnan(prices)
+        order = np.argsort(prices[priced], kind="stable")
+        return cls(
+            id_sets(category_rows),
+            id_sets(tag_rows),
+            prices[priced][order],
+            ids[priced][order],
+        )
+
+    def _union(self, table: Dict[str, np.ndarray], values: Tuple[str, ...]) -> np.ndarray:
+        arrays = [table[value] for value in values if value in table]
+        if not arrays:
+            return np.zeros(0, dtype=np.int64)
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.unique(np.concatenate(arrays))
+
+    def resolve(self, filters: SearchFilters, catalog: ProductCatalog) -> np.ndarray:
+        """Sorted ids of products that may satisfy ``filters``.
+
+        Rows changed since the index was built are checked individually, so
+        the result is a superset of the matches; callers re-check hits with
+        ``SearchFilters.matches``.
+        """
+        candidates: Optional[np.ndarray] = None
+
+        def narrow(ids: np.ndarray) -> None:
+            nonlocal candidates
+            candidates = (
+                ids
+                if candidates is None
+                else np.intersect1d(candidates, ids, assume_unique=True)
+            )
+
+        if filters.categories:
+            narrow(self._union(self.categories, filters.categories))
+        if filters.tags:
+            narrow(self._union(self.tags, filters.tags))
+        if filters.price_min is not None or filters.price_max is not None:
+            lo = (
+                np.searchsorted(self.price_values, filters.price_min, side="left")
+                if filters.price_min is not None
+                else 0
+            )
+            hi = (
+                np.searchsorted(self.price_values, filters.price_max, side="right")
+                if filters.price_max is not None
+                else len(self.price_values)
+            )
+            narrow(np.sort(self.price_ids[lo:hi]))
+
+        if candidates is None:
+            candidates = np.zeros(0, dtype=np.int64)
+        overlay = [
+            record["id"] for record in catalog.overlay_records() if filters.matches(record)
+        ]
+        if overlay:
+            candidates = np.union1d(candidates, np.asarray(overlay, dtype=np.int64))
+        return candidates
+
+
+class IdBitmapSelector:
+    """A ``faiss.IDSelectorBitmap`` that keeps its backing bitmap alive."""
+
+    def __init__(self, ids: np.ndarray):
+        # Sorted, as FacetIndex.resolve returns them
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.count = int(len(ids))
+        size = int(ids.max()) + 1 if len(ids) else 1
+        bits = np.zeros(size, dtype=bool)
+        bits[ids] = True
+        # FAISS reads bit (id & 7) of byte (id >> 3)
+        self.bitmap = np.packbits(bits, bitorder="little")
+        self.selector = faiss.IDSelectorBitmap(
+            len(self.bitmap), faiss.swig_ptr(self.bitmap)
+        )
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        """Boolean mask of which ``ids`` the selector admits."""
+        ids = np.asarray(ids, dtype=np.int64)
+        mask = (ids >= 0) & (ids < len(self.bitmap) * 8)
+        in_range = ids[mask]
+        mask[mask] = (self.bitmap[in_range >> 3] >> (in_range & 7)) & 1 == 1
+        return mask
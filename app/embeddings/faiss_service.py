@@ -1,9 +1,67 @@
+import os
+import threading
+import time
+from dataclasses import replace
+from itertools import islice
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from flask import current_app, has_app_context
+from app.core.config import settings
+from app.core.metrics import Samples, stage
 from app.models.product import Product
 from app.extensions import db
-from typing import List, Dict, Optional
+from app.embeddings import index_store
+from app.embeddings.catalog import CATALOG_FIELDS, CatalogBuilder, ProductCatalog
+from app.embeddings.embedding_cache import EmbeddingCache, encode_with_cache
+from app.embeddings.encoders import (
+    Encoder,
+    OnnxEncoder,
+    check_agreement,
+    create_encoder,
+    encoder_key,
+)
+from app.embeddings.lru_cache import LRUCache
+from app.embeddings.facets import FacetIndex, IdBitmapSelector, SearchFilters
+from app.embeddings.lexical import BM25Index, fuse
+from app.embeddings.neighbors import NeighborTable, build_neighbor_table
+from app.embeddings.snapshot import IndexSnapshot
+from app.embeddings.index_factory import IndexSpec, build_index, vector_bytes
+from app.embeddings.sharding import ShardPlan
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Set, Tuple
+
+_ENCODE_SECONDS = stage("encode")
+_INDEX_SEARCH_SECONDS = stage("index_search")
+_HYBRID_SECONDS = stage("hybrid_fusion")
+
+# "vector" ranks by embedding similarity only; "hybrid" fuses it with BM25
+SEARCH_MODES = ("vector", "hybrid")
+WARMUP_STATES = ("idle", "warming", "ready", "failed")
+
+
+def normalize_query(query: str, lowercase: bool = False) -> str:
+    """Cache key form of a query: collapsed whitespace, and lowercased when
+    the encoder lowercases its input anyway (``Encoder.do_lower_case``)."""
+    query = " ".join(query.split())
+    return query.lower() if lowercase else query
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _results_nbytes(results: List[Dict]) -> int:
+    # Rough footprint of hydrated results: the strings dominate
+    size = 64
+    for result in results:
+        size += 200 + sum(
+            len(value) for value in result["product"].values() if isinstance(value, str)
+        )
+    return size
 
 
 class FaissService:
@@ -17,91 +75,1135 @@ class FaissService:
 
     def __init__(self):
         if not hasattr(self, "_initialized") or not self._initialized:
-            self.model = SentenceTransformer("all-MiniLM-L6-v2")
-            self.index: Optional[faiss.Index] = None
-            self.product_ids: List[int] = []
-            self.descriptions: List[str] = []
+            # Identity of the configured encoder's vectors; embedding cache keys
+            # and index artifacts are tied to it
+            self.model_name = encoder_key(settings.EMBEDDING_MODEL, settings.EMBEDDING_BACKEND)
+            # Loaded on first use or by warm_up; the reference backend pulls in torch
+            self._encoder: Optional[Encoder] = None
+            self._encoder_lock = threading.Lock()
+            # Index, catalog and side indexes of one generation. Replaced as a
+            # single reference, so readers never lock and never see a mix.
+            self.snapshot: Optional[IndexSnapshot] = None
+            # Opened on first use, so importing the app touches no files
+            self._embedding_cache: Optional[EmbeddingCache] = None
+            self._embedding_cache_lock = threading.Lock()
+            self.last_encode_stats: Dict[str, int] = {}
+            # Bumped whenever a snapshot is published
+            self.index_version = 0
+            self.query_embedding_cache = LRUCache(
+                settings.QUERY_EMBEDDING_CACHE_SIZE,
+                settings.QUERY_CACHE_TTL_SECONDS,
+                sizeof=lambda vector: vector.nbytes + 96,
+            )
+            self.result_cache = LRUCache(
+                settings.RESULT_CACHE_SIZE,
+                settings.QUERY_CACHE_TTL_SECONDS,
+                sizeof=_results_nbytes,
+            )
+            # Resolved filter bitmaps, keyed by (filters, index_version)
+            self.selector_cache = LRUCache(
+                settings.FILTER_SELECTOR_CACHE_SIZE,
+                sizeof=lambda selector: selector.bitmap.nbytes + selector.ids.nbytes + 128,
+            )
+            self.index_spec = IndexSpec(
+                index_type=settings.INDEX_TYPE,
+                hnsw_m=settings.INDEX_HNSW_M,
+                ef_construction=settings.INDEX_EF_CONSTRUCTION,
+                ef_search=settings.INDEX_EF_SEARCH,
+                nlist=settings.INDEX_NLIST,
+                nprobe=settings.INDEX_NPROBE,
+                pq_m=settings.INDEX_PQ_M,
+                pq_nbits=settings.INDEX_PQ_NBITS,
+                train_sample=settings.INDEX_TRAIN_SAMPLE,
+                storage=settings.INDEX_STORAGE,
+                pca_dim=settings.INDEX_PCA_DIM,
+            )
+            # A shard indexes only its partition of the catalog
+            self.shard_id: Optional[int] = settings.SHARD_ID
+            self.shard_plan = ShardPlan.from_settings(settings)
+            if self.shard_id is not None and not 0 <= self.shard_id < self.shard_plan.count:
+                raise ValueError(f"SHARD_ID must be below SHARD_COUNT ({self.shard_plan.count})")
+            # Identifies compatible artifacts; shards never load each other's
+            self.index_key = self.index_spec.key()
+            if self.shard_id is not None:
+                self.index_key += f",shard={self.shard_id}@{self.shard_plan.describe()}"
+            # Serializes snapshot writers: incremental updates and publishing
+            self._write_lock = threading.Lock()
+            # Serializes full builds
+            self._build_lock = threading.Lock()
+            # Changes committed while a full build runs, replayed onto its result
+            self._changes_during_build: Optional[List[Tuple[Dict[int, Dict], Set[int]]]] = None
+            self._rebuild_start_lock = threading.Lock()
+            self._rebuild_thread: Optional[threading.Thread] = None
+            self.rebuild_status: Dict = {"state": "idle"}
+            # Process that runs the release watcher; forked workers start their own
+            self._watcher_pid: Optional[int] = None
+            # Seconds per phase of the last full build or release load
+            self.last_build_timings: Dict[str, float] = {}
+            self._warmup_thread: Optional[threading.Thread] = None
+            self._warmup_app = None
+            self.warmup_status: Dict = {"state": "idle"}
+            if hasattr(os, "register_at_fork"):
+                os.register_at_fork(after_in_child=self._after_fork_in_child)
             self._initialized = True
 
     def __del__(self):
-        if self.index is not None:
-            try:
-                # Release the FAISS index
-                faiss.delete_index(self.index)
-            except:
-                pass
-            self.index = None
+        # Release the FAISS index
+        self.snapshot = None
+
+    def _after_fork_in_child(self) -> None:
+        # Only the forking thread survives, so locks held by a warm-up or
+        # rebuild thread in the parent would never be released here
+        self._encoder_lock = threading.Lock()
+        # Reopened on first use; the store's lock may be held by a parent thread
+        self._embedding_cache_lock = threading.Lock()
+        self._embedding_cache = None
+        self._write_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._rebuild_start_lock = threading.Lock()
+        self._changes_during_build = None
+        if self.rebuild_status["state"] == "running":
+            self.rebuild_status = {
+                **self.rebuild_status,
+                "state": "failed",
+                "error": "interrupted by fork",
+            }
+        if self.warmup_status["state"] == "warming":
+            # Forked before the parent finished warming up: start over here
+            self.start_warm_up(self._warmup_app, self.warmup_status.get("startup_timings"))
+
+    @property
+    def embedding_cache(self) -> Optional[EmbeddingCache]:
+        """The persistent embedding store, or None when EMBEDDING_CACHE_ENABLED
+        is off."""
+        if self._embedding_cache is None and settings.EMBEDDING_CACHE_ENABLED:
+            with self._embedding_cache_lock:
+                if self._embedding_cache is None:
+                    self._embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH)
+        return self._embedding_cache
 
-    def initialize_index(self) -> None:
+    @property
+    def encoder(self) -> Encoder:
+        if self._encoder is None:
+            self.load_encoder()
+        return self._encoder
+
+    def load_encoder(self) -> float:
+        """Load the configured encoder if needed; returns seconds spent.
+
+        ONNX encoders are checked against the reference embeddings saved at
+        export and refused below EMBEDDING_MIN_AGREEMENT.
+        """
+        with self._encoder_lock:
+            if self._encoder is not None:
+                return 0.0
+            started = time.perf_counter()
+            encoder = create_encoder(
+                settings.EMBEDDING_BACKEND,
+                settings.EMBEDDING_MODEL,
+                onnx_dir=settings.EMBEDDING_ONNX_DIR,
+                threads=settings.EMBEDDING_THREADS,
+            )
+            if isinstance(encoder, OnnxEncoder):
+                result = check_agreement(encoder, settings.EMBEDDING_MIN_AGREEMENT)
+                print(f"{encoder.backend} encoder agreement with {encoder.model_name}: {result}")
+            self._encoder = encoder
+            elapsed = time.perf_counter() - started
+        print(
+            f"Loaded {settings.EMBEDDING_BACKEND} encoder for "
+            f"{settings.EMBEDDING_MODEL} in {elapsed:.2f}s"
+        )
+        return elapsed
+
+    def warm_up(self) -> Dict[str, float]:
+        """Load the model and the index and run one encode and search, so the
+        first request pays for neither. Returns seconds per phase.
+        """
+        timings = {"model_load": self.load_encoder()}
+        if settings.SHARD_URLS:
+            # A coordinator only encodes queries; the shards hold the index
+            return timings
         try:
-            all_products = db.session.query(Product).all()
+            self.initialize_index()
+            timings.update(self.last_build_timings)
+        except ValueError as e:
+            # No products yet; the first search after they arrive builds
+            print(str(e))
+
+        started = time.perf_counter()
+        vector = np.asarray(self.encoder.encode(["warm up"]), dtype=np.float32)
+        faiss.normalize_L2(vector)
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.ntotal:
+            snapshot.search(
+                vector, min(10, snapshot.ntotal), rerank=settings.INDEX_RERANK_FACTOR
+            )
+        timings["warmup_query"] = time.perf_counter() - started
+        return timings
+
+    def start_warm_up(self, app, startup_timings: Optional[Dict[str, float]] = None) -> None:
+        """Run ``warm_up`` in a background thread inside ``app``'s context and
+        log a startup time breakdown when it finishes.
+
+        ``startup_timings`` holds phases measured before the call (imports,
+        app setup) to include in the log.
+        """
+        self._warmup_app = app
+        self.warmup_status = {
+            "state": "warming",
+            "started_at": time.time(),
+            "startup_timings": dict(startup_timings or {}),
+        }
+        self._warmup_thread = threading.Thread(
+            target=self._run_warm_up,
+            args=(app, dict(startup_timings or {})),
+            name="index-warmup",
+            daemon=True,
+        )
+        self._warmup_thread.start()
+
+    def _run_warm_up(self, app, timings: Dict[str, float]) -> None:
+        started = time.perf_counter()
+        status = dict(self.warmup_status)
+        try:
+            with app.app_context():
+                timings.update(self.warm_up())
+            status["state"] = "ready"
+        except Exception as e:
+            status["state"] = "failed"
+            status["error"] = str(e)
+            print(f"Error warming up search service: {str(e)}")
+        timings["warmup_total"] = time.perf_counter() - started
+        status.pop("startup_timings", None)
+        status["timings"] = {phase: round(seconds, 3) for phase, seconds in timings.items()}
+        status["finished_at"] = time.time()
+        self.warmup_status = status
+        print(
+            "Startup timings: "
+            + " ".join(f"{phase}={seconds:.2f}s" for phase, seconds in timings.items())
+        )
+
+    def wait_until_warm(self, timeout: Optional[float] = None) -> None:
+        thread = self._warmup_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def readiness(self) -> Dict:
+        """``ready`` once warm-up has finished and an index is being served."""
+        state = self.warmup_status["state"]
+        if state == "warming":
+            return {"status": "warming"}
+        if self.snapshot is None:
+            return {
+                "status": "unavailable",
+                "error": self.warmup_status.get("error") or "Search index is not built yet",
+            }
+        return {"status": "ready", "index_version": self.snapshot.version}
+
+    def initialize_index(self, force_rebuild: bool = False) -> None:
+        """Build (or load) a complete snapshot from the database and publish it.
 
-            if not all_products:
+        Searches keep using the previous snapshot until the new one is swapped
+        in. Changes committed while building are replayed onto it first.
+        """
+        self._build_and_publish(lambda: self._build_snapshot(force_rebuild))
+
+    def initialize_index_streamed(self, store: EmbeddingCache, chunk_size: int) -> None:
+        """``initialize_index(force_rebuild=True)`` reading the products in
+        chunks and taking their vectors from ``store``; see
+        ``_build_streamed_snapshot``."""
+        self._build_and_publish(lambda: self._build_streamed_snapshot(store, chunk_size))
+
+    def _build_and_publish(self, build: Callable[[], IndexSnapshot]) -> None:
+        with self._build_lock:
+            with self._write_lock:
+                self._changes_during_build = []
+            try:
+                snapshot = build()
+            except Exception as e:
+                with self._write_lock:
+                    self._changes_during_build = None
+                print(f"Error initializing FAISS index: {str(e)}")
+                raise
+
+            with self._write_lock:
+                changes, self._changes_during_build = self._changes_during_build, None
+                for upserts, stale_ids in changes:
+                    snapshot = self._derive(snapshot, upserts, stale_ids)
+                self._publish(snapshot)
+        self._ensure_reload_watcher()
+
+    def _build_snapshot(self, force_rebuild: bool) -> IndexSnapshot:
+        timings: Dict[str, float] = {}
+        self.last_build_timings = timings
+        started = time.perf_counter()
+        if settings.INDEX_READ_ONLY:
+            # Serving workers map whatever release a builder published last
+            snapshot = self._load_persisted_snapshot(None)
+            timings["index_load"] = time.perf_counter() - started
+            if snapshot is None:
+                raise ValueError(f"No published search index in {settings.INDEX_DIR}")
+            print(
+                f"Loaded FAISS index release {snapshot.release} with "
+                f"{len(snapshot.catalog)} products from {settings.INDEX_DIR}"
+            )
+            return snapshot
+
+        rows = self._catalog_query().all()
+        if self.shard_id is not None:
+            rows = [row for row in rows if self._owns(row.id, row.category)]
+
+        timings["db_read"] = time.perf_counter() - started
+        if not rows:
+            raise ValueError("No products found in database")
+
+        fingerprint = index_store.compute_fingerprint(rows, self.model_name)
+        if settings.INDEX_PERSIST and not force_rebuild:
+            started = time.perf_counter()
+            snapshot = self._load_persisted_snapshot(fingerprint)
+            timings["index_load"] = time.perf_counter() - started
+            if snapshot is not None:
+                print(
+                    f"Loaded FAISS index with {len(snapshot.catalog)} products from {settings.INDEX_DIR}"
+                )
+                return snapshot
+
+        descriptions = [row.description or "" for row in rows]
+
+        started = time.perf_counter()
+        description_embeddings = self.encode_documents(descriptions)
+
+        # Normalize the vectors before adding
+        description_embeddings = description_embeddings.astype(np.float32)
+        faiss.normalize_L2(description_embeddings)
+        timings["encode"] = time.perf_counter() - started
+        started = time.perf_counter()
+        catalog = ProductCatalog.from_rows(rows, description_embeddings)
+        snapshot = self._index_catalog(catalog, fingerprint, timings, started)
+
+        print(
+            f"Successfully initialized {snapshot.index_type} FAISS index "
+            f"with {len(rows)} products "
+            f"(embedding cache hits={self.last_encode_stats['hits']}, "
+            f"misses={self.last_encode_stats['misses']})"
+        )
+        return snapshot
+
+    def _build_streamed_snapshot(self, store: EmbeddingCache, chunk_size: int) -> IndexSnapshot:
+        """Build from the database ``chunk_size`` rows at a time.
+
+        Each chunk's vectors come from ``store`` (texts it lacks are encoded
+        and added) and go straight into a memory-mapped matrix, and its fields
+        into packed catalog columns. Neither the rows as Python objects nor
+        an in-heap copy of every vector exist at once, so peak memory is
+        about the finished index and catalog.
+        """
+        if settings.INDEX_READ_ONLY:
+            raise ValueError("INDEX_READ_ONLY is set; this process cannot build an index")
+        timings: Dict[str, float] = {}
+        self.last_build_timings = timings
+        started = time.perf_counter()
+        query = self._catalog_query()
+        total = query.count()
+        if not total:
+            raise ValueError("No products found in database")
+
+        digest = index_store.fingerprint_digest(self.model_name)
+        builder = CatalogBuilder()
+        stats = {"hits": 0, "misses": 0, "encoded": 0}
+        os.makedirs(settings.INDEX_DIR, exist_ok=True)
+        spool_path = os.path.join(settings.INDEX_DIR, f".vectors-{os.getpid()}.npy")
+        vectors = None
+        count = 0
+        try:
+            for rows in _chunks(query.yield_per(chunk_size), chunk_size):
+                if self.shard_id is not None:
+                    rows = [row for row in rows if self._owns(row.id, row.category)]
+                    if not rows:
+                        continue
+                index_store.update_fingerprint(digest, rows)
+                chunk_vectors, chunk_stats = encode_with_cache(
+                    self.encoder,
+                    self.model_name,
+                    [row.description or "" for row in rows],
+                    store,
+                    batch_size=settings.ENCODE_BATCH_SIZE,
+                )
+                chunk_vectors = np.array(chunk_vectors, dtype=np.float32)
+                faiss.normalize_L2(chunk_vectors)
+                if vectors is None:
+                    vectors = np.lib.format.open_memmap(
+                        spool_path, mode="w+", dtype=np.float32,
+                        shape=(total, chunk_vectors.shape[1]),
+                    )
+                vectors[count : count + len(rows)] = chunk_vectors
+                builder.add(rows)
+                count += len(rows)
+                for key in stats:
+                    stats[key] += chunk_stats[key]
+            if not count:
                 raise ValueError("No products found in database")
+            vectors.flush()
+            self.last_encode_stats = stats
+            timings["encode"] = time.perf_counter() - started
 
-            self.descriptions = [product.description for product in all_products]
-            self.product_ids = [product.id for product in all_products]
+            started = time.perf_counter()
+            catalog = builder.build(vectors[:count])
+            snapshot = self._index_catalog(catalog, digest.hexdigest(), timings, started)
+        finally:
+            # Mappings still reading it stay valid; the release holds a copy
+            try:
+                os.remove(spool_path)
+            except OSError:
+                pass
 
-            description_embeddings = self.model.encode(self.descriptions)
+        print(
+            f"Successfully initialized {snapshot.index_type} FAISS index "
+            f"with {count} products in chunks of {chunk_size} "
+            f"(embedding store hits={stats['hits']}, misses={stats['misses']})"
+        )
+        return snapshot
 
-            # Create a CPU index
-            dimension = description_embeddings.shape[1]
-            self.index = faiss.IndexFlatIP(dimension)
+    def _catalog_query(self):
+        """``(id, *CATALOG_FIELDS)`` of the products this process indexes, by id."""
+        query = db.session.query(
+            Product.id, *(getattr(Product, name) for name in CATALOG_FIELDS)
+        )
+        if self.shard_id is not None:
+            low, high = self.shard_plan.id_range(self.shard_id)
+            if low is not None:
+                query = query.filter(Product.id >= low)
+            if high is not None:
+                query = query.filter(Product.id < high)
+        return query.order_by(Product.id)
 
-            # Normalize the vectors before adding
-            faiss.normalize_L2(description_embeddings)
+    def _index_catalog(
+        self,
+        catalog: ProductCatalog,
+        fingerprint: str,
+        timings: Dict[str, float],
+        started: float,
+    ) -> IndexSnapshot:
+        """Index ``catalog``'s embeddings, add the side indexes and persist
+        the result as a release. ``started`` is when the build phase began."""
+        # Create a CPU index of the configured (or auto-selected) type
+        index = build_index(catalog.embeddings, catalog.ids, self.index_spec)
+        snapshot = IndexSnapshot(
+            index=index,
+            catalog=catalog,
+            facets=FacetIndex.from_catalog(catalog),
+            lexical=(
+                BM25Index.from_catalog(catalog) if settings.LEXICAL_INDEX_ENABLED else None
+            ),
+            fingerprint=fingerprint,
+        )
+        timings["index_build"] = time.perf_counter() - started
 
-            # Add the vectors to the index
-            self.index = faiss.IndexIDMap(self.index)
-            self.index.add_with_ids(
-                description_embeddings.astype(np.float32),
-                np.array(self.product_ids).astype(np.int64),
+        if settings.NEIGHBORS_TOP_N > 0 and settings.NEIGHBORS_BUILD_ON_REBUILD:
+            # Built before persisting so the table ships in the same release
+            started = time.perf_counter()
+            snapshot = replace(
+                snapshot, neighbors=self._build_neighbor_table(snapshot, persist=False)
             )
+            timings["neighbors_build"] = time.perf_counter() - started
 
-            print(
-                f"Successfully initialized FAISS index with {len(all_products)} products"
+        if settings.INDEX_PERSIST:
+            started = time.perf_counter()
+            release = self._persist_snapshot(snapshot)
+            if release is not None:
+                # Serve the full-precision vectors (only read by re-ranking
+                # and neighbor builds) from the release instead of the heap
+                catalog.embeddings = index_store.load_embeddings(settings.INDEX_DIR, release)
+            snapshot = replace(snapshot, release=release)
+            timings["index_save"] = time.perf_counter() - started
+        return snapshot
+
+    def encode_documents(self, texts: List[str]) -> np.ndarray:
+        """Encode catalog texts, only sending embedding cache misses to the model."""
+        vectors, self.last_encode_stats = encode_with_cache(
+            self.encoder,
+            self.model_name,
+            texts,
+            self.embedding_cache,
+            batch_size=settings.ENCODE_BATCH_SIZE,
+        )
+        return vectors
+
+    def _load_persisted_snapshot(
+        self, fingerprint: Optional[str]
+    ) -> Optional[IndexSnapshot]:
+        try:
+            artifact = index_store.load_index(
+                settings.INDEX_DIR, fingerprint, self.model_name, self.index_key
             )
+        except Exception as e:
+            print(f"Ignoring unreadable FAISS index at {settings.INDEX_DIR}: {str(e)}")
+            return None
+        if artifact is None:
+            return None
+
+        catalog = artifact.catalog
+        lexical = None
+        if settings.LEXICAL_INDEX_ENABLED:
+            lexical = artifact.lexical or BM25Index.from_catalog(catalog)
+        return IndexSnapshot(
+            index=artifact.index,
+            catalog=catalog,
+            facets=FacetIndex.from_catalog(catalog),
+            lexical=lexical,
+            neighbors=artifact.neighbors if settings.NEIGHBORS_TOP_N > 0 else None,
+            fingerprint=artifact.fingerprint,
+            mmapped=artifact.mmapped,
+            release=artifact.release,
+        )
+
+    def _persist_snapshot(self, snapshot: IndexSnapshot) -> Optional[str]:
+        try:
+            return index_store.save_index(
+                settings.INDEX_DIR,
+                snapshot.index,
+                snapshot.catalog,
+                snapshot.fingerprint,
+                self.model_name,
+                self.index_key,
+                snapshot.lexical,
+                snapshot.neighbors,
+                keep_releases=settings.INDEX_KEEP_RELEASES,
+            )
+        except (OSError, ValueError) as e:
+            # A read-only filesystem only costs us the warm start next time
+            print(f"Could not persist FAISS index to {settings.INDEX_DIR}: {str(e)}")
+            return None
+
+    def _publish(self, snapshot: IndexSnapshot) -> None:
+        # Callers hold _write_lock. Cached results and selectors are keyed by
+        # version; drop the old ones eagerly.
+        self.index_version += 1
+        self.snapshot = replace(snapshot, version=self.index_version)
+        self.result_cache.clear()
+        self.selector_cache.clear()
+
+    def reload_published(self) -> bool:
+        """Swap in the release a builder published last, if it is not the one
+        being served.
+
+        Changes applied incrementally in this process are dropped with the
+        old snapshot; the new release was built from the database after them
+        or will be superseded by the next one.
+        """
+        with self._build_lock:
+            snapshot = self._load_persisted_snapshot(None)
+            if snapshot is None:
+                return False
+            with self._write_lock:
+                current = self.snapshot
+                if current is not None and current.release == snapshot.release:
+                    return False
+                self._publish(snapshot)
+        print(
+            f"Reloaded FAISS index release {snapshot.release} with "
+            f"{len(snapshot.catalog)} products"
+        )
+        return True
+
+    def _ensure_reload_watcher(self) -> None:
+        # Threads do not survive fork, so every worker checks for its own
+        if settings.INDEX_RELOAD_INTERVAL_SECONDS <= 0 or self._watcher_pid == os.getpid():
+            return
+        with self._rebuild_start_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            threading.Thread(
+                target=self._watch_releases, name="index-reload", daemon=True
+            ).start()
+
+    def _watch_releases(self) -> None:
+        skipped = None
+        while True:
+            time.sleep(settings.INDEX_RELOAD_INTERVAL_SECONDS)
+            release = index_store.current_release(settings.INDEX_DIR)
+            snapshot = self.snapshot
+            if (
+                release is None
+                or release == skipped
+                or (snapshot is not None and snapshot.release == release)
+                or self._build_lock.locked()
+            ):
+                continue
+            try:
+                if not self.reload_published():
+                    # Built for another model or index configuration
+                    skipped = release
+            except Exception as e:
+                print(f"Could not reload FAISS index release {release}: {str(e)}")
+                skipped = release
+
+    def _current_snapshot(self) -> IndexSnapshot:
+        self._ensure_reload_watcher()
+        snapshot = self.snapshot
+        if snapshot is None:
+            if self.warmup_status["state"] == "warming":
+                raise RuntimeError("Search index is warming up")
+            # Never hold a request for a full build: start one and fail fast
+            if has_app_context():
+                self.start_rebuild()
+            raise RuntimeError("Search index is not built yet")
+        return snapshot
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilters] = None,
+        mode: str = "vector",
+    ) -> List[Dict]:
+        if not query.strip():
+            raise ValueError("Search query cannot be empty")
+
+        try:
+            return self.search_batch(
+                [query],
+                [top_k],
+                nprobe=nprobe,
+                ef_search=ef_search,
+                filters=filters,
+                mode=mode,
+            )[0]
 
         except Exception as e:
-            print(f"Error initializing FAISS index: {str(e)}")
+            print(f"Error during search: {str(e)}")
             raise
 
-    def search(self, query: str, top_k: int = 5) -> List[Dict]:
-        if self.index is None:
-            self.initialize_index()
+    def search_batch(
+        self,
+        queries: Optional[List[str]],
+        top_ks: List[int],
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilters] = None,
+        mode: str = "vector",
+        query_embeddings: Optional[np.ndarray] = None,
+    ) -> List[List[Dict]]:
+        """Search many queries with one encode call and one index search.
 
-        if not query.strip():
+        Queries answered from the result cache skip both steps. The rest are
+        searched once with their largest ``top_k`` and each row is trimmed to
+        its own ``top_k``. Results are returned in input order. ``nprobe``
+        (IVF) and ``ef_search`` (HNSW) override the index defaults.
+        ``filters`` is applied inside the FAISS search through an id selector.
+        In ``hybrid`` mode the vector candidates are fused with BM25 keyword
+        candidates and ``similarity_score`` holds the fused score.
+
+        ``query_embeddings`` (normalized, one row per query) replaces encoding
+        the queries, as when a shard coordinator already did. ``queries`` may
+        then be None for a vector search; such results are not cached.
+        """
+        snapshot = self._current_snapshot()
+
+        if query_embeddings is not None:
+            if len(query_embeddings) != len(top_ks):
+                raise ValueError("query_embeddings and top_ks must have the same length")
+            if query_embeddings.ndim != 2 or query_embeddings.shape[1] != snapshot.index.d:
+                raise ValueError(f"Query vectors must have {snapshot.index.d} dimensions")
+        if queries is None:
+            if query_embeddings is None or mode != "vector":
+                raise ValueError("Search queries are required")
+        elif len(queries) != len(top_ks):
+            raise ValueError("queries and top_ks must have the same length")
+        elif any(not query.strip() for query in queries):
             raise ValueError("Search query cannot be empty")
+        if not top_ks:
+            return []
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"mode must be one of {', '.join(SEARCH_MODES)}")
+        if mode == "hybrid" and snapshot.lexical is None:
+            raise ValueError("Hybrid search is disabled (LEXICAL_INDEX_ENABLED)")
 
         try:
-            # Encode and normalize the query
-            query_embedding = self.model.encode([query])
-            faiss.normalize_L2(query_embedding)
-
-            # Perform the search
-            distances, indices = self.index.search(
-                query_embedding.astype(np.float32), min(top_k, len(self.product_ids))
-            )
-
-            # Build results
-            recommended_products = []
-            for i, idx in enumerate(indices[0]):
-                if idx != -1:  # Valid index
-                    recommended_products.append(
-                        {
-                            "product_id": int(idx),
-                            "description": self.descriptions[
-                                self.product_ids.index(int(idx))
-                            ],
-                            "similarity_score": float(distances[0][i]),
-                        }
-                    )
+            lowercase = queries is not None and self.encoder.do_lower_case
+            keys = [
+                (
+                    normalize_query(query, lowercase) if queries is not None else None,
+                    int(top_k),
+                    filters,
+                    (nprobe, ef_search, mode),
+                    snapshot.version,
+                )
+                for query, top_k in zip(queries or [None] * len(top_ks), top_ks)
+            ]
+            results: List[Optional[List[Dict]]] = [
+                self.result_cache.get(key) if key[0] is not None else None for key in keys
+            ]
+            pending = [pos for pos, cached in enumerate(results) if cached is None]
+            if not pending:
+                return results
+
+            selector = self._selector(snapshot, filters) if filters else None
+            if selector is not None and selector.count == 0:
+                for pos in pending:
+                    results[pos] = []
+                return results
+
+            if query_embeddings is not None:
+                query_embeddings = np.ascontiguousarray(query_embeddings[pending], dtype=np.float32)
+            else:
+                query_embeddings = self.encode_queries([queries[pos] for pos in pending])
+            # Over-fetch past changed rows that matched the filters when the
+            # facet index was built but no longer do
+            extra = snapshot.catalog.overlay_size if filters is not None else 0
+            depth = settings.HYBRID_VECTOR_DEPTH if mode == "hybrid" else 0
+            max_k = min(
+                max(max(keys[pos][1], depth) for pos in pending) + extra,
+                snapshot.ntotal,
+            )
+            with _INDEX_SEARCH_SECONDS.time():
+                distances, indices = snapshot.search(
+                    query_embeddings,
+                    max_k,
+                    nprobe=nprobe,
+                    ef_search=ef_search,
+                    selector=selector,
+                    rerank=settings.INDEX_RERANK_FACTOR,
+                    exact_limit=settings.FILTER_EXACT_SEARCH_LIMIT,
+                )
 
-            return recommended_products
+            for row, pos in enumerate(pending):
+                top_k = keys[pos][1]
+                limit = max(top_k, depth) + extra
+                vector_results = self._build_results(
+                    snapshot, indices[row][:limit], distances[row][:limit], filters
+                )
+                if mode == "hybrid":
+                    with _HYBRID_SECONDS.time():
+                        results[pos] = self._hybrid_results(
+                            snapshot,
+                            queries[pos],
+                            vector_results[: max(top_k, depth)],
+                            top_k,
+                            filters,
+                            selector,
+                        )
+                else:
+                    results[pos] = vector_results[:top_k]
+                if keys[pos][0] is not None:
+                    self.result_cache.put(keys[pos], results[pos])
+            return results
 
         except Exception as e:
-            print(f"Error during search: {str(e)}")
+            print(f"Error during batch search: {str(e)}")
             raise
 
-    def refresh_index(self) -> None:
-        self.initialize_index()
+    def similar_to_product(self, product_id: int, top_k: int = 5) -> List[Dict]:
+        """Products most similar to an indexed product, without re-encoding it.
+
+        Answered from the neighbor table when it covers the product, otherwise
+        by searching with the product's stored vector.
+        """
+        snapshot = self._current_snapshot()
+
+        if snapshot.neighbors is not None:
+            hit = snapshot.neighbors.lookup(snapshot.catalog, product_id, top_k)
+            if hit is not None:
+                results = self._build_results(snapshot, *hit)[:top_k]
+                # Neighbors deleted since the build leave gaps; search instead
+                if len(results) == min(top_k, len(snapshot.catalog) - 1):
+                    return results
+
+        vector = snapshot.catalog.vector(product_id)
+        if vector is None:
+            raise LookupError(f"Product {product_id} is not indexed")
+        k = min(top_k + 1, snapshot.ntotal)
+        with _INDEX_SEARCH_SECONDS.time():
+            distances, indices = snapshot.search(
+                vector[None, :], k, rerank=settings.INDEX_RERANK_FACTOR
+            )
+        results = [
+            result
+            for result in self._build_results(snapshot, indices[0], distances[0])
+            if result["product_id"] != product_id
+        ]
+        return results[:top_k]
+
+    def build_neighbors(self) -> NeighborTable:
+        """Recompute the top-N neighbor table for the current snapshot.
+
+        Products changed incrementally afterwards fall back to a live search
+        until the next build.
+        """
+        snapshot = self._current_snapshot()
+        table = self._build_neighbor_table(snapshot)
+        with self._write_lock:
+            current = self.snapshot
+            # Only attach the table to the generation it was computed for
+            if current is not None and current.index is snapshot.index:
+                self.snapshot = replace(current, neighbors=table)
+        return table
+
+    def _build_neighbor_table(
+        self, snapshot: IndexSnapshot, persist: bool = True
+    ) -> NeighborTable:
+        started = time.perf_counter()
+        table = build_neighbor_table(
+            snapshot.index,
+            snapshot.catalog,
+            settings.NEIGHBORS_TOP_N,
+            fingerprint=snapshot.fingerprint,
+            block_size=settings.NEIGHBORS_BLOCK_SIZE,
+            rerank=settings.INDEX_RERANK_FACTOR,
+        )
+
+        # Only a table for the published catalog can be reused after a restart
+        if persist and settings.INDEX_PERSIST and snapshot.fingerprint is not None:
+            try:
+                index_store.save_neighbors(settings.INDEX_DIR, table)
+            except OSError as e:
+                print(f"Could not persist neighbor table to {settings.INDEX_DIR}: {str(e)}")
+
+        print(
+            f"Built neighbor table for {table.rows.shape[0]} products "
+            f"(top {table.top_n}) in {time.perf_counter() - started:.1f}s"
+        )
+        return table
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Normalized float32 query vectors, reusing cached embeddings."""
+        lowercase = self.encoder.do_lower_case
+        normalized = [normalize_query(query, lowercase) for query in queries]
+        vectors: List[Optional[np.ndarray]] = [
+            self.query_embedding_cache.get(text) for text in normalized
+        ]
+        missing = sorted(
+            {text for text, vector in zip(normalized, vectors) if vector is None}
+        )
+        if missing:
+            with _ENCODE_SECONDS.time():
+                encoded = np.asarray(
+                    self.encoder.encode(missing, batch_size=settings.ENCODE_BATCH_SIZE),
+                    dtype=np.float32,
+                )
+            faiss.normalize_L2(encoded)
+            fresh = dict(zip(missing, encoded))
+            for text, vector in fresh.items():
+                # Copy so a cached row does not pin the whole batch array
+                self.query_embedding_cache.put(text, vector.copy())
+            vectors = [
+                vector if vector is not None else fresh[text]
+                for text, vector in zip(normalized, vectors)
+            ]
+        return np.vstack(vectors)
+
+    def _selector(
+        self, snapshot: IndexSnapshot, filters: SearchFilters
+    ) -> IdBitmapSelector:
+        key = (filters, snapshot.version)
+        selector = self.selector_cache.get(key)
+        if selector is None:
+            selector = IdBitmapSelector(snapshot.facets.resolve(filters, snapshot.catalog))
+            self.selector_cache.put(key, selector)
+        return selector
+
+    def cache_stats(self) -> Dict[str, Dict]:
+        snapshot = self.snapshot
+        neighbors = snapshot.neighbors if snapshot is not None else None
+        return {
+            "index_version": self.index_version,
+            "query_embeddings": self.query_embedding_cache.stats(),
+            "results": self.result_cache.stats(),
+            "filter_selectors": self.selector_cache.stats(),
+            "neighbors": (
+                {
+                    "products": int(neighbors.rows.shape[0]),
+                    "top_n": neighbors.top_n,
+                    "approx_bytes": neighbors.nbytes,
+                }
+                if neighbors is not None
+                else None
+            ),
+        }
+
+    def index_status(self) -> Dict:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return {
+                "ready": False,
+                "rebuild": self.rebuild_status,
+                "warmup": self.warmup_status,
+            }
+        return {
+            "ready": True,
+            "index_version": snapshot.version,
+            "index_type": snapshot.index_type,
+            "storage": self.index_spec.storage,
+            "pca_dim": self.index_spec.pca_dim,
+            "rerank_factor": settings.INDEX_RERANK_FACTOR,
+            "release": snapshot.release,
+            "mmapped": snapshot.mmapped,
+            "products": len(snapshot.catalog),
+            # Rows changed since the last full build
+            "pending_changes": snapshot.catalog.overlay_size,
+            "built_at": snapshot.built_at,
+            "rebuild": self.rebuild_status,
+            "warmup": self.warmup_status,
+        }
+
+    def metrics(self) -> Dict[str, Tuple[str, Samples]]:
+        """Gauges for ``/metrics``, computed when it is scraped."""
+        warmup_state = self.warmup_status["state"]
+        gauges = {
+            "search_encoder_loaded": (
+                "1 once the embedding model is loaded",
+                [({"backend": settings.EMBEDDING_BACKEND}, int(self._encoder is not None))],
+            ),
+            "search_warmup_state": (
+                "1 for the current warm-up state",
+                [({"state": state}, int(state == warmup_state)) for state in WARMUP_STATES],
+            ),
+            "search_index_version": ("Version of the served index", [({}, self.index_version)]),
+        }
+        caches = {
+            "query_embeddings": self.query_embedding_cache.stats(),
+            "results": self.result_cache.stats(),
+            "filter_selectors": self.selector_cache.stats(),
+        }
+        for name, key, documentation in (
+            ("search_cache_entries", "entries", "Entries held per in-process cache"),
+            ("search_cache_bytes", "approx_bytes", "Approximate memory per in-process cache"),
+            ("search_cache_hits_total", "hits", "Lookups answered per in-process cache"),
+            ("search_cache_misses_total", "misses", "Lookups missed per in-process cache"),
+            ("search_cache_evictions_total", "evictions", "Entries evicted per in-process cache"),
+        ):
+            gauges[name] = (
+                documentation,
+                [({"cache": cache}, stats[key]) for cache, stats in caches.items()],
+            )
+
+        snapshot = self.snapshot
+        if snapshot is None:
+            return gauges
+        catalog = snapshot.catalog
+        index_bytes = vector_bytes(snapshot.index)
+        if snapshot.delta is not None:
+            index_bytes += vector_bytes(snapshot.delta)
+        labels = {"index_type": snapshot.index_type, "storage": self.index_spec.storage}
+        gauges.update(
+            {
+                "search_index_products": ("Products in the served index", [({}, len(catalog))]),
+                "search_index_vectors": ("Vectors in the served index", [({}, snapshot.ntotal)]),
+                "search_index_pending_changes": (
+                    "Rows changed since the last full build",
+                    [({}, catalog.overlay_size)],
+                ),
+                "search_index_vector_bytes": (
+                    "Memory of the index's stored vectors",
+                    [({**labels, "mmapped": str(snapshot.mmapped).lower()}, index_bytes)],
+                ),
+                "search_catalog_bytes": (
+                    "Memory of the in-memory product catalog",
+                    [
+                        ({"part": "fields"}, catalog.nbytes),
+                        ({"part": "embeddings"}, int(catalog.embeddings.nbytes)),
+                    ],
+                ),
+                "search_lexical_index_bytes": (
+                    "Memory of the BM25 keyword index",
+                    [({}, snapshot.lexical.nbytes if snapshot.lexical is not None else 0)],
+                ),
+                "search_neighbor_table_bytes": (
+                    "Memory of the precomputed neighbor table",
+                    [({}, snapshot.neighbors.nbytes if snapshot.neighbors is not None else 0)],
+                ),
+            }
+        )
+        return gauges
+
+    def _build_results(
+        self,
+        snapshot: IndexSnapshot,
+        ids: np.ndarray,
+        scores: np.ndarray,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict]:
+        """Attach catalog fields to raw FAISS hits.
+
+        Skips padding (-1) ids, ids the catalog no longer holds, repeated ids,
+        keeping the best, and rows that were changed so they no longer
+        satisfy ``filters``.
+        """
+        valid = ids != -1
+        hit_ids = [int(pid) for pid in ids[valid]]
+        records = snapshot.catalog.records(hit_ids)
+
+        recommended_products = []
+        seen = set()
+        for pid, score, record in zip(hit_ids, scores[valid], records):
+            if record is None or pid in seen:
+                continue
+            if filters is not None and not filters.matches(record):
+                continue
+            seen.add(pid)
+            recommended_products.append(
+                {
+                    "product_id": pid,
+                    "description": record["description"],
+                    "similarity_score": float(score),
+                    "product": record,
+                }
+            )
+        return recommended_products
+
+    def _hybrid_results(
+        self,
+        snapshot: IndexSnapshot,
+        query: str,
+        vector_results: List[Dict],
+        top_k: int,
+        filters: Optional[SearchFilters],
+        selector: Optional[IdBitmapSelector],
+    ) -> List[Dict]:
+        """Fuse vector hits with the best BM25 matches for ``query``."""
+        lexical_ids, lexical_scores = snapshot.lexical.search(
+            query,
+            settings.HYBRID_LEXICAL_DEPTH,
+            snapshot.catalog,
+            allowed=selector.contains if selector is not None else None,
+        )
+        fused = fuse(
+            [(result["product_id"], result["similarity_score"]) for result in vector_results],
+            list(zip(lexical_ids.tolist(), lexical_scores.tolist())),
+            method=settings.HYBRID_FUSION,
+            rrf_k=settings.HYBRID_RRF_K,
+            vector_weight=settings.HYBRID_VECTOR_WEIGHT,
+        )
+
+        records = {result["product_id"]: result["product"] for result in vector_results}
+        lexical_only = [pid for pid, _ in fused if pid not in records]
+        records.update(zip(lexical_only, snapshot.catalog.records(lexical_only)))
+
+        hybrid_results = []
+        for pid, score in fused:
+            record = records[pid]
+            if record is None or (filters is not None and not filters.matches(record)):
+                continue
+            hybrid_results.append(
+                {
+                    "product_id": pid,
+                    "description": record["description"],
+                    "similarity_score": score,
+                    "product": record,
+                }
+            )
+            if len(hybrid_results) == top_k:
+                break
+        return hybrid_results
+
+    def apply_changes(
+        self, upserts: Dict[int, Dict], deleted_ids: Iterable[int]
+    ) -> None:
+        """Publish one committed batch of product inserts/updates/deletes.
+
+        ``upserts`` maps product ids to their current field values. Only those
+        rows are re-encoded; the new snapshot shares everything else with the
+        current one.
+        """
+        if self.shard_id is not None:
+            # Products another shard owns, possibly since this change, are deletes here
+            foreign = {
+                pid
+                for pid, fields in upserts.items()
+                if not self._owns(pid, fields.get("category"))
+            }
+            upserts = {pid: fields for pid, fields in upserts.items() if pid not in foreign}
+            deleted_ids = set(deleted_ids) | foreign
+        stale_ids = set(deleted_ids) | set(upserts)
+        if not stale_ids:
+            return
+
+        with self._write_lock:
+            if self._changes_during_build is not None:
+                # The running build may have read the rows before this commit
+                self._changes_during_build.append((dict(upserts), stale_ids))
+            snapshot = self.snapshot
+            if snapshot is None:
+                # Nothing built yet; the first full build will include these rows
+                return
+            self._publish(self._derive(snapshot, upserts, stale_ids))
+
+        print(
+            f"Applied {len(upserts)} upserts and {len(stale_ids) - len(upserts)} "
+            f"deletes to FAISS index"
+        )
+
+    def _owns(self, product_id: int, category: Optional[str]) -> bool:
+        return self.shard_plan.shard_of(product_id, category) == self.shard_id
+
+    def _derive(
+        self, snapshot: IndexSnapshot, upserts: Dict[int, Dict], stale_ids: Set[int]
+    ) -> IndexSnapshot:
+        records = [{"id": pid, **fields} for pid, fields in upserts.items()]
+        embeddings = None
+        if records:
+            embeddings = self.encode_documents(
+                [record.get("description") or "" for record in records]
+            )
+            faiss.normalize_L2(embeddings)
+        # The result no longer matches the persisted artifact; the next start
+        # rebuilds it from the embedding cache
+        return snapshot.with_changes(stale_ids, records, embeddings)
+
+    def refresh_index(self) -> Dict[str, int]:
+        """Rebuild from the database, re-encoding only products whose text changed."""
+        self.initialize_index(force_rebuild=True)
+        stats = dict(self.last_encode_stats)
+
+        if self.embedding_cache is not None:
+            max_age = settings.EMBEDDING_CACHE_MAX_AGE_DAYS
+            stats["evicted"] = self.embedding_cache.collect_garbage(
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+                max_age_seconds=max_age * 86400 if max_age is not None else None,
+            )
+        print(f"Refreshed FAISS index: {stats}")
+        return stats
+
+    def start_rebuild(self) -> bool:
+        """Run ``refresh_index`` in a background thread.
+
+        Returns False if a build is already running. Must be called inside an
+        app context, which the thread re-enters to read the products.
+        """
+        with self._rebuild_start_lock:
+            running = self._rebuild_thread is not None and self._rebuild_thread.is_alive()
+            if running or self._build_lock.locked():
+                return False
+            self.rebuild_status = {
+                "state": "running",
+                "started_at": time.time(),
+                "finished_at": None,
+                "duration_seconds": None,
+                "error": None,
+                "stats": None,
+            }
+            self._rebuild_thread = threading.Thread(
+                target=self._run_rebuild,
+                args=(current_app._get_current_object(),),
+                name="index-rebuild",
+                daemon=True,
+            )
+            self._rebuild_thread.start()
+            return True
+
+    def _run_rebuild(self, app) -> None:
+        started = time.perf_counter()
+        status = dict(self.rebuild_status)
+        try:
+            with app.app_context():
+                status["stats"] = self.refresh_index()
+            status["state"] = "succeeded"
+        except Exception as e:
+            status["state"] = "failed"
+            status["error"] = str(e)
+        status["finished_at"] = time.time()
+        status["duration_seconds"] = round(time.perf_counter() - started, 3)
+        self.rebuild_status = status
@@ -0,0 +1,291 @@
+# app/embeddings/index_factory.py
+import math
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+STORAGE_TYPES = ("float32", "float16", "sq8", "binary")
+
+_SCALAR_QUANTIZERS = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+# "auto" picks the first type whose row limit is above the catalog size
+_AUTO_THRESHOLDS = (
+    (20_000, "flat"),
+    (1_000_000, "hnsw"),
+    (5_000_000, "ivf_flat"),
+)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """Everything that determines how an index is built.
+
+    Stored in the persisted artifact so a config change forces a rebuild.
+    """
+
+    index_type: str = "auto"
+    hnsw_m: int = 32
+    ef_construction: int = 80
+    ef_search: int = 64
+    nlist: int = 0  # 0 = derive from the row count
+    nprobe: int = 16
+    pq_m: int = 48
+    pq_nbits: int = 8
+    train_sample: int = 100_000
+    # How vectors are stored in the index; see STORAGE_TYPES
+    storage: str = "float32"
+    pca_dim: int = 0  # 0 = keep the full dimension
+
+    def key(self) -> str:
+        return ",".join(f"{name}={value}" for name, value in sorted(asdict(self).items()))
+
+
+def resolve_index_type(spec: IndexSpec, n: int) -> str:
+    if spec.index_type != "auto":
+        if spec.index_type not in INDEX_TYPES:
+            raise ValueError(
+                f"Unknown index type {spec.index_type!r}; expected one of {INDEX_TYPES} or 'auto'"
+            )
+        return spec.index_type
+    for limit, index_type in _AUTO_THRESHOLDS:
+        if n < limit:
+            return index_type
+    return "ivf_pq"
+
+
+def _nlist(spec: IndexSpec, n: int) -> int:
+    # ~4*sqrt(n) lists, but keep at least 39 training points per centroid
+    nlist = spec.nlist or int(4 * math.sqrt(n))
+    return max(1, min(nlist, n // 39))
+
+
+def _pq_m(spec: IndexSpec, dimension: int) -> int:
+    # PQ needs the sub-quantizer count to divide the dimension
+    return max(m for m in range(1, min(spec.pq_m, dimension) + 1) if dimension % m == 0)
+
+
+def _training_sample(vectors: np.ndarray, spec: IndexSpec) -> np.ndarray:
+    n = vectors.shape[0]
+    if n <= spec.train_sample:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(0)
+    rows = np.sort(rng.choice(n, spec.train_sample, replace=False))
+    return np.ascontiguousarray(vectors[rows], dtype=np.float32)
+
+
+class BinaryIndex:
+    """Sign-bit codes searched by Hamming distance, behind the float index API.
+
+    Each vector (after the optional PCA ``transform``) keeps one bit per
+    dimension, 32x less than float32. Scores are ``1 - 2 * hamming / bits``,
+    a coarse stand-in for cosine similarity meant to be re-ranked exactly.
+    """
+
+    def __init__(
+        self, index: faiss.IndexBinary, transform: Optional[faiss.VectorTransform] = None
+    ):
+        self.index = index
+        self.transform = transform
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def d(self) -> int:
+        return self.transform.d_in if self.transform is not None else self.index.d
+
+    def codes(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.transform is not None:
+            vectors = self.transform.apply(vectors)
+        return np.packbits(vectors > 0, axis=1)
+
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        self.index.add_with_ids(self.codes(vectors), ids)
+
+    def search(self, vectors: np.ndarray, k: int, params=None):
+        distances, ids = self.index.search(self.codes(vectors), k, params=params)
+        return (1.0 - 2.0 * distances / self.index.d).astype(np.float32), ids
+
+
+def resolve_storage(spec: IndexSpec, dimension: int) -> str:
+    if spec.storage not in STORAGE_TYPES:
+        raise ValueError(
+            f"Unknown index storage {spec.storage!r}; expected one of {STORAGE_TYPES}"
+        )
+    if spec.pca_dim and not 0 < spec.pca_dim < dimension:
+        raise ValueError(f"PCA dimension must be between 1 and {dimension - 1}")
+    if spec.storage == "binary" and (spec.pca_dim or dimension) % 8:
+        raise ValueError("Binary codes need a dimension that is a multiple of 8")
+    return spec.storage
+
+
+def _float_index(index_type: str, storage: str, dimension: int, n: int, spec: IndexSpec):
+    quantizer_type = _SCALAR_QUANTIZERS.get(storage)
+    if index_type == "flat":
+        if quantizer_type is None:
+            return faiss.IndexFlatIP(dimension)
+        return faiss.IndexScalarQuantizer(
+            dimension, quantizer_type, faiss.METRIC_INNER_PRODUCT
+        )
+    if index_type == "hnsw":
+        if quantizer_type is None:
+            base = faiss.IndexHNSWFlat(dimension, spec.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        else:
+            base = faiss.IndexHNSWSQ(
+                dimension, quantizer_type, spec.hnsw_m, faiss.METRIC_INNER_PRODUCT
+            )
+        base.hnsw.efConstruction = spec.ef_construction
+        base.hnsw.efSearch = spec.ef_search
+        return base
+
+    nlist = _nlist(spec, n)
+    quantizer = faiss.IndexFlatIP(dimension)
+    if index_type == "ivf_pq":
+        base = faiss.IndexIVFPQ(
+            quantizer,
+            dimension,
+            nlist,
+            _pq_m(spec, dimension),
+            spec.pq_nbits,
+            faiss.METRIC_INNER_PRODUCT,
+        )
+    elif quantizer_type is None:
+        base = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+    else:
+        base = faiss.IndexIVFScalarQuantizer(
+            quantizer, dimension, nlist, quantizer_type, faiss.METRIC_INNER_PRODUCT
+        )
+    base.nprobe = min(spec.nprobe, nlist)
+    return base
+
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, spec: IndexSpec):
+    """Build an inner-product index over L2-normalized ``vectors``.
+
+    Inner product on normalized vectors is cosine similarity, so every index
+    type returns scores with the same meaning as the exact flat index.
+    Trainable types are trained on a random sample of at most
+    ``spec.train_sample`` rows.
+
+    ``spec.storage`` trades accuracy for memory: float16 and sq8 (one byte
+    per dimension) scalar-quantize the stored vectors, binary keeps sign bits
+    in a ``BinaryIndex``. ``spec.pca_dim`` first projects vectors onto their
+    leading principal components.
+    """
+    n, dimension = vectors.shape
+    index_type = resolve_index_type(spec, n)
+    storage = resolve_storage(spec, dimension)
+
+    if index_type == "ivf_pq" and n < (1 << spec.pq_nbits) * 39:
+        print(f"Too few products ({n}) to train IVF-PQ; using an IVF-flat index")
+        index_type = "ivf_flat"
+    if index_type.startswith("ivf") and n < 39:
+        index_type = "flat"
+    if index_type == "ivf_pq" and storage != "float32":
+        print(f"IVF-PQ codes are already compressed; ignoring {storage} storage")
+        storage = "float32"
+    if storage == "binary" and index_type.startswith("ivf"):
+        print("Binary codes are searched with flat or HNSW indexes; using HNSW")
+        index_type = "hnsw"
+
+    stored_dimension = spec.pca_dim or dimension
+    transform = faiss.PCAMatrix(dimension, spec.pca_dim) if spec.pca_dim else None
+
+    if storage == "binary":
+        if index_type == "hnsw":
+            base = faiss.IndexBinaryHNSW(stored_dimension, spec.hnsw_m)
+            base.hnsw.efConstruction = spec.ef_construction
+            base.hnsw.efSearch = spec.ef_search
+        else:
+            base = faiss.IndexBinaryFlat(stored_dimension)
+        if transform is not None:
+            transform.train(_training_sample(vectors, spec))
+        index = BinaryIndex(faiss.IndexBinaryIDMap(base), transform)
+    else:
+        base = _float_index(index_type, storage, stored_dimension, n, spec)
+        if transform is not None:
+            base = faiss.IndexPreTransform(transform, base)
+        if not base.is_trained:
+            base.train(_training_sample(vectors, spec))
+        index = faiss.IndexIDMap(base)
+
+    index.add_with_ids(
+        np.ascontiguousarray(vectors, dtype=np.float32),
+        np.ascontiguousarray(ids, dtype=np.int64),
+    )
+    return index
+
+
+def _searching_index(index):
+    """The index behind the id map and any PCA or binary wrapper."""
+    if isinstance(index, BinaryIndex):
+        return faiss.downcast_IndexBinary(index.index.index)
+    base = faiss.downcast_index(index.index) if hasattr(index, "index") else index
+    if isinstance(base, faiss.IndexPreTransform):
+        base = faiss.downcast_index(base.index)
+    return base
+
+
+def vector_bytes(index) -> int:
+    """Memory held by the stored vector codes, excluding graph links and
+    inverted-list overhead."""
+    base = _searching_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base = faiss.downcast_index(base.storage)
+    elif isinstance(base, faiss.IndexBinaryHNSW):
+        base = faiss.downcast_IndexBinary(base.storage)
+    return int(base.code_size) * int(index.ntotal)
+
+
+def index_type_of(index) -> str:
+    base = _searching_index(index)
+    if isinstance(base, (faiss.IndexHNSW, faiss.IndexBinaryHNSW)):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def search_parameters(
+    index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    selector: Optional[faiss.IDSelector] = None,
+    selectivity: float = 1.0,
+) -> Optional[faiss.SearchParameters]:
+    """Per-query overrides for the index behind ``index``'s id map.
+
+    ``selectivity`` is the fraction of the indexed vectors ``selector``
+    admits. nprobe and efSearch are divided by it, so a filtered search
+    visits about as many matching vectors as an unfiltered one and still
+    fills its top k. Returns None when nothing needs overriding so the
+    index defaults apply.
+    """
+    if nprobe is None and ef_search is None and selector is None:
+        return None
+
+    scale = 1.0 / max(selectivity, 1e-6) if selector is not None else 1.0
+    index_type = index_type_of(index)
+    base = _searching_index(index)
+    if index_type == "hnsw":
+        params = faiss.SearchParametersHNSW()
+        ef = ef_search or base.hnsw.efSearch
+        params.efSearch = min(math.ceil(ef * scale), max(ef, index.ntotal))
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = min(math.ceil((nprobe or base.nprobe) * scale), base.nlist)
+    else:
+        params = faiss.SearchParameters()
+    if selector is not None:
+        params.sel = selector
+    return params
@@ -0,0 +1,408 @@
+# app/embeddings/index_store.py
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from app.embeddings.catalog import (
+    CATALOG_COLUMNS,
+    NUMERIC_COLUMNS,
+    ProductCatalog,
+    StringColumn,
+)
+from app.embeddings.index_factory import BinaryIndex
+from app.embeddings.lexical import BM25Index
+from app.embeddings.neighbors import NeighborTable
+
+# Bump whenever the layout of the artifact directory changes.
+INDEX_FORMAT_VERSION = 7
+
+# INDEX_DIR holds immutable releases and a pointer file naming the current
+# one. Publishing a release only replaces the pointer, so processes that
+# mapped an older release keep reading consistent files.
+RELEASES_DIR = "releases"
+CURRENT_FILE = "CURRENT"
+
+META_FILE = "meta.json"
+INDEX_FILE = "index.faiss"
+# Binary storage replaces index.faiss with a binary index and its PCA matrix
+BINARY_INDEX_FILE = "index.binary.faiss"
+TRANSFORM_FILE = "transform.faiss"
+EMBEDDINGS_FILE = "embeddings.npy"
+PRODUCT_IDS_FILE = "product_ids.npy"
+# BM25 postings, written only when a lexical index was built
+LEXICAL_ARRAYS = ("offsets", "rows", "weights")
+# Neighbor tables can also be added to a published release by a separate job.
+# Each table is written to its own directory under neighbors/ and published
+# by replacing neighbors.json, which names it; published files never change.
+NEIGHBORS_DIR = "neighbors"
+NEIGHBORS_META_FILE = "neighbors.json"
+NEIGHBOR_ARRAYS = ("rows", "scores")
+# Tables kept per release; readers between the old and new neighbors.json
+# can still open the previous one
+KEEP_NEIGHBOR_TABLES = 2
+
+
+@dataclass
+class IndexArtifact:
+    # A faiss.Index, or a BinaryIndex for binary storage
+    index: object
+    catalog: ProductCatalog
+    fingerprint: str
+    mmapped: bool
+    lexical: Optional[BM25Index] = None
+    neighbors: Optional[NeighborTable] = None
+    # Name of the release directory the artifact was read from
+    release: Optional[str] = None
+
+
+def compute_fingerprint(rows: Iterable[Sequence], model_name: str) -> str:
+    """Hash the catalog rows that feed the index and the catalog, in id order."""
+    digest = fingerprint_digest(model_name)
+    update_fingerprint(digest, rows)
+    return digest.hexdigest()
+
+
+def fingerprint_digest(model_name: str):
+    """Hash object for a fingerprint fed one chunk of rows at a time with
+    ``update_fingerprint``; its ``hexdigest()`` equals ``compute_fingerprint``."""
+    digest = hashlib.sha256()
+    digest.update(f"v{INDEX_FORMAT_VERSION}|{model_name}".encode("utf-8"))
+    return digest
+
+
+def update_fingerprint(digest, rows: Iterable[Sequence]) -> None:
+    for row in rows:
+        digest.update(f"\x1e{row[0]}".encode("utf-8"))
+        for value in row[1:]:
+            digest.update(b"\x1f")
+            digest.update(str(value if value is not None else "").encode("utf-8"))
+
+
+def current_release(path: str) -> Optional[str]:
+    """Name of the release the pointer at ``path`` designates, if any."""
+    try:
+        with open(os.path.join(path, CURRENT_FILE), encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return name or None
+
+
+def release_path(path: str, release: str) -> str:
+    return os.path.join(path, RELEASES_DIR, release)
+
+
+def save_index(
+    path: str,
+    index,
+    catalog: ProductCatalog,
+    fingerprint: str,
+    model_name: str,
+    index_spec: str = "",
+    lexical: Optional[BM25Index] = None,
+    neighbors: Optional[NeighborTable] = None,
+    keep_releases: int = 2,
+) -> str:
+    """Write the artifact as a new release under ``path`` and publish it.
+
+    The release is written to a temp directory, renamed into place and only
+    then named by the pointer file. Returns the release name. The oldest
+    releases beyond ``keep_releases`` are removed; processes that still map
+    them keep their open files.
+
+    ``catalog`` must be freshly built (no overlay rows from incremental updates).
+    """
+    if catalog.overlay_size or len(catalog) != len(catalog.ids):
+        raise ValueError("Only a compacted catalog can be persisted")
+
+    releases = os.path.join(os.path.abspath(path), RELEASES_DIR)
+    os.makedirs(releases, exist_ok=True)
+    release = f"{_timestamped_name()}-{fingerprint[:12]}"
+    tmp_path = os.path.join(releases, f".tmp-{release}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    write_faiss_index(index, tmp_path)
+    embeddings = np.ascontiguousarray(catalog.embeddings, dtype=np.float32)
+    np.save(os.path.join(tmp_path, EMBEDDINGS_FILE), embeddings)
+    np.save(os.path.join(tmp_path, PRODUCT_IDS_FILE), catalog.ids)
+    for name, column in catalog.columns.items():
+        np.save(os.path.join(tmp_path, f"{name}.data.npy"), column.data)
+        np.save(os.path.join(tmp_path, f"{name}.offsets.npy"), column.offsets)
+    for name, values in catalog.numeric.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), values)
+    if lexical is not None:
+        np.save(os.path.join(tmp_path, "bm25.terms.data.npy"), lexical.terms.data)
+        np.save(os.path.join(tmp_path, "bm25.terms.offsets.npy"), lexical.terms.offsets)
+        for name in LEXICAL_ARRAYS:
+            np.save(os.path.join(tmp_path, f"bm25.{name}.npy"), getattr(lexical, name))
+    if neighbors is not None:
+        _write_neighbors(tmp_path, neighbors)
+
+    # meta.json is written last so a half-written directory never validates
+    meta = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "model_name": model_name,
+        "index_spec": index_spec,
+        "fingerprint": fingerprint,
+        "count": len(catalog.ids),
+        "dimension": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+        "created_at": time.time(),
+        "lexical": (
+            {"avg_length": lexical.avg_length, "k1": lexical.k1, "b": lexical.b}
+            if lexical is not None
+            else None
+        ),
+    }
+    with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    os.replace(tmp_path, os.path.join(releases, release))
+    tmp_pointer = os.path.join(path, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(release)
+    os.replace(tmp_pointer, os.path.join(path, CURRENT_FILE))
+
+    _prune(releases, keep=max(keep_releases, 1), current=release)
+    return release
+
+
+def _timestamped_name() -> str:
+    now = time.time()
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now))
+    return f"{stamp}.{int(now % 1 * 1e6):06d}-{os.getpid()}"
+
+
+def _prune(directory: str, keep: int, current: str) -> None:
+    # Release and neighbor table names start with their creation time, so
+    # they sort by age
+    names = sorted(
+        name for name in os.listdir(directory) if not name.startswith(".")
+    )
+    for name in names[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def read_meta(path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_index(
+    path: str,
+    fingerprint: Optional[str],
+    model_name: str,
+    index_spec: str = "",
+) -> Optional[IndexArtifact]:
+    """Load the current release under ``path`` if it was built from the same
+    catalog, model and index configuration.
+
+    A ``fingerprint`` of None accepts whatever catalog the release was built
+    from. Returns None when there is no release, or it is from another format
+    version or stale, in which case the caller is expected to rebuild.
+    """
+    release = current_release(path)
+    if release is None:
+        return None
+    directory = release_path(path, release)
+    meta = read_meta(directory)
+    if meta is None:
+        return None
+    if (
+        meta.get("format_version") != INDEX_FORMAT_VERSION
+        or meta.get("model_name") != model_name
+        or meta.get("index_spec", "") != index_spec
+        or (fingerprint is not None and meta.get("fingerprint") != fingerprint)
+    ):
+        return None
+
+    index, mmapped = read_faiss_index(directory)
+    catalog = load_catalog(directory)
+
+    if not (index.ntotal == len(catalog.ids) == catalog.embeddings.shape[0]):
+        return None
+
+    lexical = None
+    if meta.get("lexical"):
+        lexical = load_lexical(directory, catalog, meta["lexical"])
+
+    return IndexArtifact(
+        index=index,
+        catalog=catalog,
+        fingerprint=meta["fingerprint"],
+        mmapped=mmapped,
+        lexical=lexical,
+        neighbors=load_neighbors(directory, meta["fingerprint"], len(catalog.ids)),
+        release=release,
+    )
+
+
+def load_catalog(path: str) -> ProductCatalog:
+    """Memory-map the catalog columns and embedding matrix of an artifact."""
+    columns = {
+        name: StringColumn(
+            np.load(os.path.join(path, f"{name}.data.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, f"{name}.offsets.npy"), mmap_mode="r"),
+        )
+        for name in CATALOG_COLUMNS
+    }
+    numeric = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        for name in NUMERIC_COLUMNS
+    }
+    return ProductCatalog(
+        np.load(os.path.join(path, PRODUCT_IDS_FILE)),
+        columns,
+        np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r"),
+        numeric,
+    )
+
+
+def load_embeddings(path: str, release: str) -> np.ndarray:
+    """The full-precision vectors of a published release, memory-mapped."""
+    return np.load(os.path.join(release_path(path, release), EMBEDDINGS_FILE), mmap_mode="r")
+
+
+def load_lexical(path: str, catalog: ProductCatalog, params: dict) -> BM25Index:
+    """Memory-map the BM25 postings of an artifact."""
+    arrays = {
+        name: np.load(os.path.join(path, f"bm25.{name}.npy"), mmap_mode="r")
+        for name in LEXICAL_ARRAYS
+    }
+    terms = StringColumn(
+        np.load(os.path.join(path, "bm25.terms.data.npy"), mmap_mode="r"),
+        np.load(os.path.join(path, "bm25.terms.offsets.npy"), mmap_mode="r"),
+    )
+    return BM25Index(
+        catalog.ids,
+        terms,
+        arrays["offsets"],
+        arrays["rows"],
+        arrays["weights"],
+        params["avg_length"],
+        params["k1"],
+        params["b"],
+    )
+
+
+def save_neighbors(path: str, table: NeighborTable) -> bool:
+    """Add ``table`` to the current release under ``path``, replacing any
+    older table.
+
+    The table gets a directory of its own and is published by replacing
+    neighbors.json, so processes that mapped the older table keep reading
+    it unchanged. Returns False, writing nothing, when the current release
+    was built from another catalog than the table.
+    """
+    release = current_release(path)
+    if release is None:
+        return False
+    directory = release_path(path, release)
+    meta = read_meta(directory)
+    if meta is None or meta.get("fingerprint") != table.fingerprint:
+        return False
+
+    _write_neighbors(directory, table)
+    return True
+
+
+def _write_neighbors(directory: str, table: NeighborTable) -> None:
+    tables = os.path.join(directory, NEIGHBORS_DIR)
+    name = _timestamped_name()
+    tmp_path = os.path.join(tables, f".tmp-{name}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for array in NEIGHBOR_ARRAYS:
+        np.save(os.path.join(tmp_path, f"{array}.npy"), getattr(table, array))
+    os.replace(tmp_path, os.path.join(tables, name))
+
+    meta_path = os.path.join(directory, NEIGHBORS_META_FILE)
+    tmp_meta = f"{meta_path}.tmp-{os.getpid()}"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "table": name,
+                "fingerprint": table.fingerprint,
+                "count": int(table.rows.shape[0]),
+                "top_n": table.top_n,
+                "created_at": time.time(),
+            },
+            f,
+        )
+    os.replace(tmp_meta, meta_path)
+    _prune(tables, keep=KEEP_NEIGHBOR_TABLES, current=name)
+
+
+def load_neighbors(path: str, fingerprint: str, count: int) -> Optional[NeighborTable]:
+    """Memory-map the neighbor table in release directory ``path`` if it
+    matches the catalog."""
+    try:
+        with open(os.path.join(path, NEIGHBORS_META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("fingerprint") != fingerprint or meta.get("count") != count:
+        return None
+    table = os.path.join(path, NEIGHBORS_DIR, meta["table"])
+    try:
+        arrays = {
+            name: np.load(os.path.join(table, f"{name}.npy"), mmap_mode="r")
+            for name in NEIGHBOR_ARRAYS
+        }
+    except OSError:
+        # Pruned by a newer table published since neighbors.json was read
+        return None
+    if arrays["rows"].shape != (count, meta.get("top_n")):
+        return None
+    return NeighborTable(arrays["rows"], arrays["scores"], fingerprint)
+
+
+def write_faiss_index(index, directory: str) -> None:
+    if isinstance(index, BinaryIndex):
+        faiss.write_index_binary(index.index, os.path.join(directory, BINARY_INDEX_FILE))
+        if index.transform is not None:
+            faiss.write_VectorTransform(index.transform, os.path.join(directory, TRANSFORM_FILE))
+    else:
+        faiss.write_index(index, os.path.join(directory, INDEX_FILE))
+
+
+def read_faiss_index(directory: str, mmap: bool = True) -> Tuple[object, bool]:
+    """The index of the release in ``directory`` and whether it is mapped.
+
+    IO_FLAG_MMAP_IFC maps flat code storage straight from the file. Such an
+    index is read-only: callers must clone it before adding or removing.
+    """
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None) if mmap else None
+    binary_path = os.path.join(directory, BINARY_INDEX_FILE)
+    if os.path.exists(binary_path):
+        transform_path = os.path.join(directory, TRANSFORM_FILE)
+        transform = (
+            faiss.read_VectorTransform(transform_path)
+            if os.path.exists(transform_path)
+            else None
+        )
+        index, mmapped = _read_with_fallback(faiss.read_index_binary, binary_path, mmap_flag)
+        return BinaryIndex(index, transform), mmapped
+    return _read_with_fallback(
+        faiss.read_index, os.path.join(directory, INDEX_FILE), mmap_flag
+    )
+
+
+def _read_with_fallback(read, path: str, mmap_flag: Optional[int]) -> Tuple[object, bool]:
+    if mmap_flag is not None:
+        try:
+            return read(path, mmap_flag), True
+        except RuntimeError:
+            pass
+    return read(path), False
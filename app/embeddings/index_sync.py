@@ -0,0 +1,69 @@
+# app/embeddings/index_sync.py
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.embeddings.catalog import CATALOG_FIELDS
+from app.models.product import Product
+
+# Session.info key holding {product_id: field values, or None for deletes}
+_PENDING_KEY = "faiss_pending_changes"
+
+_registered = False
+
+
+def _pending(target) -> Optional[Dict[int, Optional[Dict]]]:
+    session = object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault(_PENDING_KEY, {})
+
+
+def _record_upsert(mapper, connection, target: Product) -> None:
+    pending = _pending(target)
+    if pending is not None:
+        pending[target.id] = {name: getattr(target, name) for name in CATALOG_FIELDS}
+
+
+def _record_delete(mapper, connection, target: Product) -> None:
+    pending = _pending(target)
+    if pending is not None:
+        pending[target.id] = None
+
+
+def _apply_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    from app.embeddings import faiss_service
+
+    upserts = {pid: fields for pid, fields in pending.items() if fields is not None}
+    deletes = [pid for pid, fields in pending.items() if fields is None]
+    try:
+        faiss_service.apply_changes(upserts, deletes)
+    except Exception as e:
+        # The commit already happened; the next full rebuild will catch up
+        print(f"Error applying product changes to FAISS index: {str(e)}")
+
+
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_index_sync() -> None:
+    """Keep the FAISS index in step with committed writes to ``products``.
+
+    Mapper events collect the affected rows per session during flush; the
+    batch is applied once the transaction commits and dropped on rollback.
+    """
+    global _registered
+    if _registered:
+        return
+    event.listen(Product, "after_insert", _record_upsert)
+    event.listen(Product, "after_update", _record_upsert)
+    event.listen(Product, "after_delete", _record_delete)
+    event.listen(Session, "after_commit", _apply_pending)
+    event.listen(Session, "after_rollback", _discard_pending)
+    _registered = True
@@ -0,0 +1,299 @@
+# app/embeddings/ingest.py
+import csv
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+
+from app.core.config import settings
+from app.embeddings.catalog import CATALOG_FIELDS
+from app.embeddings.embedding_cache import EmbeddingCache, encode_with_cache
+from app.extensions import db
+from app.models.product import Product
+
+# Catalog file columns read into each product field; the first one present
+# wins. Covers this table's own names, demo/data/products.csv and the raw
+# Myntra export.
+COLUMN_ALIASES = {
+    "id": ("id", "product_id", "ProductID"),
+    "name": ("name", "title", "ProductName"),
+    "description": ("description", "Description"),
+    "category": ("category", "Gender"),
+    "tags": ("tags", "ProductBrand"),
+    "price": ("price", "Price (INR)", "Price"),
+}
+
+# Print progress at most this often
+_PROGRESS_SECONDS = 5.0
+
+
+def resolve_columns(header: List[str]) -> Dict[str, Optional[str]]:
+    """Map each product field to the file column it is read from, or None."""
+    columns = {
+        field: next((name for name in aliases if name in header), None)
+        for field, aliases in COLUMN_ALIASES.items()
+    }
+    if columns["name"] is None:
+        raise ValueError(f"No product name column; expected one of {COLUMN_ALIASES['name']}")
+    return columns
+
+
+def parse_price(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    value = value.replace(",", "").replace("$", "").replace("₹", "").replace("INR", "").strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+# Product.id is a 32-bit integer column on most databases
+_MAX_ID = 2**31 - 1
+# Report at most this many skipped rows individually
+_SKIP_REPORT_LIMIT = 10
+# Bound on the names bound into one lookup query
+_LOOKUP_BATCH = 500
+
+
+def parse_id(value: Optional[str]) -> Optional[int]:
+    """A product id from a file value; None unless it is an integer in the
+    id column's range."""
+    try:
+        product_id = int((value or "").strip())
+    except ValueError:
+        return None
+    return product_id if 0 < product_id <= _MAX_ID else None
+
+
+def read_catalog(path: str, chunk_size: int) -> Iterator[Tuple[List[Dict], int]]:
+    """``(records, skipped)`` per ``chunk_size`` rows of a CSV file.
+
+    Rows without a name, or with an id that is not a positive integer, are
+    skipped and counted. Records carry ``id`` None when the file has no id
+    column; ``assign_ids`` fills them in. Within a chunk the last row for an
+    id (or for a name and description, without ids) wins.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        columns = resolve_columns(reader.fieldnames or [])
+        reported = 0
+        while True:
+            records: Dict = {}
+            read = skipped = 0
+            for row in islice(reader, chunk_size):
+                read += 1
+                record = {"id": None}
+                for field in CATALOG_FIELDS:
+                    value = row.get(columns[field]) if columns[field] else None
+                    if field == "price":
+                        record[field] = parse_price(value)
+                    else:
+                        record[field] = " ".join(value.split()) if value else None
+                problem = None
+                if not record["name"]:
+                    problem = "no product name"
+                elif columns["id"] is not None:
+                    record["id"] = parse_id(row.get(columns["id"]))
+                    if record["id"] is None:
+                        problem = f"invalid id {row.get(columns['id'])!r}"
+                if problem is not None:
+                    skipped += 1
+                    reported += 1
+                    if reported <= _SKIP_REPORT_LIMIT:
+                        print(f"Skipping {path} line {reader.line_num}: {problem}")
+                    continue
+                key = record["id"] if record["id"] is not None else _natural_key(record)
+                records[key] = record
+            if not read:
+                return
+            yield list(records.values()), skipped
+
+
+def _natural_key(record: Dict) -> Tuple[str, str]:
+    return record["name"], record["description"] or ""
+
+
+def assign_ids(connection, records: List[Dict], next_id: int) -> int:
+    """Give ``records`` read without ids the id of the product with the same
+    name and description, or a new one from ``next_id``. Returns the next
+    unused id.
+
+    Re-ingesting a file without ids therefore updates its products in place
+    instead of adding them again.
+    """
+    table = Product.__table__
+    names = sorted({record["name"] for record in records})
+    existing: Dict[Tuple[str, str], int] = {}
+    for start in range(0, len(names), _LOOKUP_BATCH):
+        query = select(table.c.id, table.c.name, table.c.description).where(
+            table.c.name.in_(names[start : start + _LOOKUP_BATCH])
+        )
+        for product_id, name, description in connection.execute(query):
+            existing.setdefault((name, description or ""), product_id)
+    for record in records:
+        product_id = existing.get(_natural_key(record))
+        if product_id is None:
+            product_id, next_id = next_id, next_id + 1
+        record["id"] = product_id
+    return next_id
+
+
+def _upsert_statement(table, dialect: str):
+    """Bulk insert that overwrites rows with the same id, for dialects that
+    have one; None for the rest."""
+    fields = [table.c[name] for name in CATALOG_FIELDS]
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={column.name: statement.excluded[column.name] for column in fields},
+        )
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+
+        statement = dialect_insert(table)
+        return statement.on_duplicate_key_update(
+            {column.name: statement.inserted[column.name] for column in fields}
+        )
+    return None
+
+
+def write_chunk(connection, records: List[Dict]) -> None:
+    """Upsert ``records`` into ``products`` with one executemany."""
+    table = Product.__table__
+    statement = _upsert_statement(table, connection.dialect.name)
+    if statement is None:
+        connection.execute(delete(table).where(table.c.id.in_([r["id"] for r in records])))
+        statement = insert(table)
+    connection.execute(statement, records)
+
+
+def ingest_catalog(
+    path: str, chunk_size: int = 5000, workers: int = 2, publish: bool = True
+) -> Dict:
+    """Stream ``path`` into the products table and the search index.
+
+    Rows are upserted by id. A file without an id column is keyed by name
+    and description instead, so re-ingesting it updates the same products.
+    Rows without a name or with an invalid id are skipped and counted.
+
+    Each chunk is upserted with bulk statements while earlier chunks are
+    encoded on ``workers`` threads into the embedding cache (a temporary
+    store when the cache is disabled). At most ``workers + 2`` chunks are
+    held at once, whatever the file size. With ``publish``, a release is
+    then built from the database in chunks, taking every vector from that
+    store, so serving processes load it at startup (or on their next
+    release reload) without encoding anything.
+
+    Must run inside an app context. Writes bypass the ORM, so running
+    processes pick the rows up from the published release, not from
+    incremental index updates.
+    """
+    from app.embeddings import faiss_service
+
+    store = faiss_service.embedding_cache
+    temporary_store = None
+    if store is None:
+        os.makedirs(settings.INDEX_DIR, exist_ok=True)
+        temporary_store = os.path.join(settings.INDEX_DIR, f".ingest-{os.getpid()}.sqlite3")
+        store = EmbeddingCache(temporary_store)
+
+    encoder = faiss_service.encoder
+    with db.engine.connect() as connection:
+        next_id = (connection.execute(select(func.max(Product.id))).scalar() or 0) + 1
+
+    def encode(texts: List[str]) -> Dict[str, int]:
+        # Vectors land in the store; keeping them here would grow with the file
+        _, stats = encode_with_cache(
+            encoder, faiss_service.model_name, texts, store, batch_size=settings.ENCODE_BATCH_SIZE
+        )
+        return stats
+
+    totals = {"rows": 0, "skipped": 0, "hits": 0, "misses": 0, "encoded": 0}
+    db_seconds = 0.0
+    started = last_report = time.perf_counter()
+    pending: Deque[Future] = deque()
+
+    def collect(future: Future) -> None:
+        for key, value in future.result().items():
+            totals[key] += value
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-encode") as pool:
+            for records, skipped in read_catalog(path, chunk_size):
+                totals["skipped"] += skipped
+                if not records:
+                    continue
+                pending.append(
+                    pool.submit(encode, [record["description"] or "" for record in records])
+                )
+                write_started = time.perf_counter()
+                with db.engine.begin() as connection:
+                    if records[0]["id"] is None:
+                        next_id = assign_ids(connection, records, next_id)
+                    write_chunk(connection, records)
+                db_seconds += time.perf_counter() - write_started
+                totals["rows"] += len(records)
+
+                while len(pending) > workers:
+                    collect(pending.popleft())
+                now = time.perf_counter()
+                if now - last_report >= _PROGRESS_SECONDS:
+                    last_report = now
+                    print(
+                        f"Ingested {totals['rows']} rows in {now - started:.0f}s "
+                        f"({totals['rows'] / (now - started):.0f} rows/s, "
+                        f"{totals['skipped']} skipped, "
+                        f"{totals['encoded']} texts encoded so far)"
+                    )
+            while pending:
+                collect(pending.popleft())
+        ingest_seconds = time.perf_counter() - started
+
+        result = {
+            "rows": totals["rows"],
+            "skipped": totals["skipped"],
+            "embedding_hits": totals["hits"],
+            "texts_encoded": totals["encoded"],
+            "seconds": round(ingest_seconds, 3),
+            "db_write_seconds": round(db_seconds, 3),
+            "rows_per_second": round(totals["rows"] / ingest_seconds, 1) if ingest_seconds else None,
+        }
+        print(
+            f"Ingested {totals['rows']} rows from {path} in {ingest_seconds:.1f}s, "
+            f"skipped {totals['skipped']} invalid rows "
+            f"({result['rows_per_second']} rows/s; {db_seconds:.1f}s writing to the database, "
+            f"{totals['encoded']} texts encoded, {totals['hits']} already in the embedding store)"
+        )
+
+        if publish:
+            started = time.perf_counter()
+            faiss_service.initialize_index_streamed(store, chunk_size)
+            result["index"] = {
+                "release": faiss_service.snapshot.release,
+                "products": faiss_service.snapshot.ntotal,
+                "seconds": round(time.perf_counter() - started, 3),
+                "timings": {
+                    phase: round(seconds, 3)
+                    for phase, seconds in faiss_service.last_build_timings.items()
+                },
+            }
+        return result
+    finally:
+        if temporary_store is not None:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(temporary_store + suffix)
+                except OSError:
+                    pass
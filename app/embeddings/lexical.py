@@ -0,0 +1,266 @@
+# app/embeddings/lexical.py
+import copy
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.embeddings.catalog import ProductCatalog, StringColumn
+
+# Catalog columns whose text is searchable by keyword
+LEXICAL_COLUMNS = ("name", "description", "tags")
+FUSION_METHODS = ("rrf", "weighted")
+
+# Above this many postings per row a query scores every row densely instead
+# of gathering the touched rows
+_DENSE_POSTINGS_RATIO = 0.125
+
+# Words, with joined forms such as "wh-1000xm4" or "usb-c" kept together
+_TOKEN_RE = re.compile(r"[^\W_]+(?:[-./][^\W_]+)*")
+_JOINERS_RE = re.compile(r"[-./]")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Case-folded terms of ``text``.
+
+    Joined tokens (SKUs, model numbers) are emitted whole and as their
+    parts, so "WH-1000XM4" matches both "wh-1000xm4" and "1000xm4".
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer((text or "").casefold()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_JOINERS_RE.split(token))
+    return tokens
+
+
+def _idf(doc_freqs: np.ndarray, n: int) -> np.ndarray:
+    # Lucene's BM25 idf, which stays positive for very common terms
+    return np.log1p((n - doc_freqs + 0.5) / (doc_freqs + 0.5))
+
+
+def _tf_weight(
+    freqs: np.ndarray, lengths: np.ndarray, avg_length: float, k1: float, b: float
+) -> np.ndarray:
+    norm = k1 * (1.0 - b + b * lengths / (avg_length or 1.0))
+    return freqs * (k1 + 1.0) / (freqs + norm)
+
+
+class BM25Index:
+    """Okapi BM25 over the name, description and tags of the catalog rows.
+
+    Postings are stored CSR-style: the sorted vocabulary, and per term a
+    slice of the ``rows``/``weights`` arrays given by ``offsets``. Each weight
+    is that term's precomputed BM25 contribution to that row, so a query is
+    a few slices summed into a score array. Rows changed after the build
+    are kept in a small overlay scored with the base statistics.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        terms: StringColumn,
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        weights: np.ndarray,
+        avg_length: float,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.ids = ids
+        self.terms = terms
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self.avg_length = avg_length
+        self.k1 = k1
+        self.b = b
+        # term -> [(product id, weight)] for rows in the catalog overlay
+        self._overlay: Dict[str, List[Tuple[int, float]]] = {}
+
+    @classmethod
+    def from_catalog(
+        cls, catalog: ProductCatalog, k1: float = 1.2, b: float = 0.75
+    ) -> "BM25Index":
+        n = len(catalog.ids)
+        columns = [catalog.columns[name] for name in LEXICAL_COLUMNS]
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        rows: List[int] = []
+        freqs: List[int] = []
+        lengths = np.zeros(n, dtype=np.float32)
+        for row in range(n):
+            tokens = [token for column in columns for token in tokenize(column[row])]
+            lengths[row] = len(tokens)
+            for term, count in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                rows.append(row)
+                freqs.append(count)
+
+        # Number terms in sorted order so lookups can binary search
+        terms = sorted(vocabulary)
+        renumber = np.empty(len(terms), dtype=np.int64)
+        renumber[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+        term_array = renumber[np.asarray(term_ids, dtype=np.int64)]
+        row_array = np.asarray(rows, dtype=np.int32)
+        order = np.lexsort((row_array, term_array))
+        term_array, row_array = term_array[order], row_array[order]
+        freq_array = np.asarray(freqs, dtype=np.float32)[order]
+
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_array, minlength=len(terms)), out=offsets[1:])
+        avg_length = float(lengths.mean()) if n else 0.0
+        idf = _idf(np.diff(offsets).astype(np.float64), n)
+        weights = idf[term_array] * _tf_weight(
+            freq_array, lengths[row_array], avg_length, k1, b
+        )
+        return cls(
+            catalog.ids,
+            StringColumn.from_values(terms),
+            offsets,
+            row_array,
+            weights.astype(np.float32),
+            avg_length,
+            k1,
+            b,
+        )
+
+    def _term_id(self, term: str) -> int:
+        lo, hi = 0, len(self.terms)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.terms[mid] < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.terms) and self.terms[lo] == term:
+            return lo
+        return -1
+
+    def with_overlay(self, records: List[Dict]) -> "BM25Index":
+        """A copy sharing the postings, with ``records`` as its overlay."""
+        clone = copy.copy(self)
+        clone.set_overlay(records)
+        return clone
+
+    def set_overlay(self, records: List[Dict]) -> None:
+        """Index the catalog overlay (rows changed since the build)."""
+        n = len(self.ids)
+        overlay: Dict[str, List[Tuple[int, float]]] = {}
+        for record in records:
+            tokens = [
+                token for name in LEXICAL_COLUMNS for token in tokenize(record.get(name))
+            ]
+            for term, count in Counter(tokens).items():
+                term_id = self._term_id(term)
+                doc_freq = (
+                    self.offsets[term_id + 1] - self.offsets[term_id] if term_id >= 0 else 0
+                )
+                weight = _idf(np.float64(doc_freq), n) * _tf_weight(
+                    np.float64(count), np.float64(len(tokens)), self.avg_length, self.k1, self.b
+                )
+                overlay.setdefault(term, []).append((int(record["id"]), float(weight)))
+        self._overlay = overlay
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        catalog: ProductCatalog,
+        allowed: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and scores of the ``k`` best keyword matches, best first.
+
+        Base rows the catalog has deleted or replaced are skipped. ``allowed``
+        maps an id array to a keep mask, e.g. a filter selector.
+        """
+        terms = set(tokenize(query))
+        id_parts, score_parts = [], []
+
+        slices = []
+        for term in terms:
+            term_id = self._term_id(term)
+            if term_id >= 0:
+                slices.append((self.offsets[term_id], self.offsets[term_id + 1]))
+        postings = sum(end - start for start, end in slices)
+        if postings:
+            n = len(self.ids)
+            totals = np.zeros(n, dtype=np.float32)
+            for start, end in slices:
+                np.add.at(totals, self.rows[start:end], self.weights[start:end])
+            if postings > _DENSE_POSTINGS_RATIO * n:
+                totals[~catalog.alive] = 0.0
+                if allowed is not None:
+                    totals[~allowed(self.ids)] = 0.0
+                rows = (
+                    np.argpartition(-totals, k - 1)[:k] if n > k else np.arange(n)
+                )
+                rows = rows[totals[rows] > 0]
+            else:
+                rows = np.unique(
+                    np.concatenate([self.rows[start:end] for start, end in slices])
+                )
+                rows = rows[catalog.alive[rows]]
+            id_parts.append(self.ids[rows])
+            score_parts.append(totals[rows])
+
+        overlay_scores: Dict[int, float] = {}
+        for term in terms:
+            for pid, weight in self._overlay.get(term, ()):
+                overlay_scores[pid] = overlay_scores.get(pid, 0.0) + weight
+        if overlay_scores:
+            id_parts.append(np.fromiter(overlay_scores, dtype=np.int64))
+            score_parts.append(np.fromiter(overlay_scores.values(), dtype=np.float64))
+
+        if not id_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        ids = np.concatenate(id_parts).astype(np.int64, copy=False)
+        scores = np.concatenate(score_parts)
+        if allowed is not None:
+            keep = allowed(ids)
+            ids, scores = ids[keep], scores[keep]
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return ids[order], scores[order].astype(np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return int(
+            self.terms.nbytes + self.offsets.nbytes + self.rows.nbytes + self.weights.nbytes
+        )
+
+
+def fuse(
+    vector_hits: Sequence[Tuple[int, float]],
+    lexical_hits: Sequence[Tuple[int, float]],
+    method: str = "rrf",
+    rrf_k: int = 60,
+    vector_weight: float = 0.5,
+) -> List[Tuple[int, float]]:
+    """Merge two ranked, de-duplicated ``(id, score)`` lists, best first.
+
+    ``rrf`` sums ``1 / (rrf_k + rank)`` over the lists an id appears in and
+    needs no score calibration. ``weighted`` min-max normalizes each list and
+    mixes them as ``vector_weight * vector + (1 - vector_weight) * lexical``.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method {method!r}; expected one of {FUSION_METHODS}")
+
+    fused: Dict[int, float] = {}
+    for hits, weight in ((vector_hits, vector_weight), (lexical_hits, 1.0 - vector_weight)):
+        if not hits:
+            continue
+        if method == "rrf":
+            for rank, (pid, _) in enumerate(hits, start=1):
+                fused[pid] = fused.get(pid, 0.0) + 1.0 / (rrf_k + rank)
+        else:
+            scores = [score for _, score in hits]
+            low, span = min(scores), max(scores) - min(scores)
+            for pid, score in hits:
+                normalized = (score - low) / span if span > 0 else 1.0
+                fused[pid] = fused.get(pid, 0.0) + weight * normalized
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,97 @@
+# app/embeddings/neighbors.py
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.embeddings.catalog import ProductCatalog
+
+
+class NeighborTable:
+    """Precomputed top-N similar products for every catalog base row.
+
+    ``rows[i]`` holds catalog row numbers (int32, -1 = padding) of the
+    nearest neighbors of base row ``i``, best first, and ``scores[i]`` their
+    float16 cosine similarities: six bytes per neighbor.
+    """
+
+    def __init__(self, rows: np.ndarray, scores: np.ndarray, fingerprint: Optional[str]):
+        self.rows = rows
+        self.scores = scores
+        self.fingerprint = fingerprint
+
+    @property
+    def top_n(self) -> int:
+        return int(self.rows.shape[1]) if self.rows.ndim == 2 else 0
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.rows.nbytes + self.scores.nbytes)
+
+    def lookup(
+        self, catalog: ProductCatalog, product_id: int, top_k: int
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Neighbor ids and scores of ``product_id``.
+
+        None when the table cannot answer: ``top_k`` exceeds the stored depth,
+        or the product was added, changed or removed since the table was built.
+        """
+        if top_k > self.top_n:
+            return None
+        row = catalog.base_rows(np.array([product_id], dtype=np.int64))[0]
+        if row < 0:
+            return None
+        neighbor_rows = self.rows[row]
+        present = neighbor_rows >= 0
+        return (
+            catalog.ids[neighbor_rows[present]],
+            self.scores[row][present].astype(np.float32),
+        )
+
+
+def build_neighbor_table(
+    index: faiss.Index,
+    catalog: ProductCatalog,
+    top_n: int,
+    fingerprint: Optional[str] = None,
+    block_size: int = 1024,
+    rerank: int = 0,
+) -> NeighborTable:
+    """Search every base row's stored vector against ``index``, ``block_size``
+    rows per ``index.search`` call, keeping the best ``top_n`` other products.
+
+    With ``rerank`` > 1, ``rerank`` times as many candidates are fetched and
+    ranked by their exact similarity (``ProductCatalog.rescore``).
+    """
+    n = len(catalog.ids)
+    rows = np.full((n, top_n), -1, dtype=np.int32)
+    scores = np.zeros((n, top_n), dtype=np.float16)
+    # One extra hit, since each product normally finds itself first
+    k = min((top_n + 1) * max(rerank, 1), index.ntotal)
+    if k == 0:
+        return NeighborTable(rows, scores, fingerprint)
+
+    for start in range(0, n, block_size):
+        block = np.ascontiguousarray(
+            catalog.embeddings[start : start + block_size], dtype=np.float32
+        )
+        distances, labels = index.search(block, k)
+        if rerank > 1:
+            distances = catalog.rescore(block, labels)
+            order = np.argsort(-distances, axis=1, kind="stable")[:, : top_n + 1]
+            distances = np.take_along_axis(distances, order, axis=1)
+            labels = np.take_along_axis(labels, order, axis=1)
+        hit_rows = catalog.base_rows(labels.ravel()).reshape(labels.shape)
+        own_rows = np.arange(start, start + len(block))[:, None]
+        keep = (hit_rows >= 0) & (hit_rows != own_rows)
+        # Move kept hits to the front of each row, preserving rank order
+        order = np.argsort(~keep, axis=1, kind="stable")[:, :top_n]
+        kept = np.take_along_axis(keep, order, axis=1)
+        width = order.shape[1]
+        rows[start : start + len(block), :width] = np.where(
+            kept, np.take_along_axis(hit_rows, order, axis=1), -1
+        )
+        scores[start : start + len(block), :width] = np.where(
+            kept, np.take_along_axis(distances, order, axis=1), 0.0
+        )
+    return NeighborTable(rows, scores, fingerprint)
@@ -0,0 +1,490 @@
+# app/embeddings/sharding.py
+"""Catalog partitioning and scatter-gather search over shard processes.
+
+A shard is an ordinary instance of this app started with ``SHARD_ID`` set:
+it indexes only the products ``ShardPlan`` assigns to it and answers vector
+searches on ``/shard/search``. A coordinator (``SHARD_URLS`` set) encodes
+each query once, sends the vectors to the shards in parallel and merges
+their top k by score. Shards that fail or miss the deadline are left out of
+the answer instead of failing it.
+"""
+import base64
+import bisect
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.metrics import Samples, stage
+from app.embeddings.facets import SearchFilters, facet_value
+
+SHARD_KEYS = ("id", "category")
+
+_SCATTER_SECONDS = stage("shard_scatter")
+
+
+def _timed_out(error: Exception) -> bool:
+    if isinstance(error, urllib.error.URLError):
+        error = error.reason
+    return isinstance(error, TimeoutError)
+
+
+@dataclass(frozen=True)
+class ShardPlan:
+    """Which shard owns a product.
+
+    ``id`` assigns contiguous id ranges (``id_boundaries`` holds the first id
+    of shards 1..count-1) or, without boundaries, ``id % count``.
+    ``category`` hashes the normalized category, so a category filter only
+    needs the shards that own the requested categories.
+    """
+
+    count: int = 1
+    key: str = "id"
+    id_boundaries: Tuple[int, ...] = ()
+
+    def __post_init__(self):
+        if self.count < 1:
+            raise ValueError("Shard count must be at least 1")
+        if self.key not in SHARD_KEYS:
+            raise ValueError(f"Unknown shard key {self.key!r}; expected one of {SHARD_KEYS}")
+        if self.id_boundaries:
+            if self.key != "id":
+                raise ValueError("Id boundaries only apply to id sharding")
+            if len(self.id_boundaries) != self.count - 1:
+                raise ValueError(f"{self.count} shards need {self.count - 1} id boundaries")
+            if list(self.id_boundaries) != sorted(set(self.id_boundaries)):
+                raise ValueError("Id boundaries must be strictly increasing")
+
+    @classmethod
+    def from_settings(cls, settings) -> "ShardPlan":
+        return cls(
+            count=settings.SHARD_COUNT,
+            key=settings.SHARD_KEY,
+            id_boundaries=tuple(settings.SHARD_ID_BOUNDARIES),
+        )
+
+    def describe(self) -> str:
+        boundaries = ":".join(str(b) for b in self.id_boundaries)
+        return f"{self.key}/{self.count}" + (f"/{boundaries}" if boundaries else "")
+
+    def _category_shard(self, category: Optional[str]) -> int:
+        return zlib.crc32(facet_value(category or "").encode("utf-8")) % self.count
+
+    def shard_of(self, product_id: int, category: Optional[str]) -> int:
+        if self.key == "category":
+            return self._category_shard(category)
+        if self.id_boundaries:
+            return bisect.bisect_right(self.id_boundaries, product_id)
+        return int(product_id) % self.count
+
+    def id_range(self, shard: int) -> Tuple[Optional[int], Optional[int]]:
+        """Inclusive lower and exclusive upper id bound of ``shard``, for
+        narrowing the database query; (None, None) when ids do not decide."""
+        if self.key != "id" or not self.id_boundaries:
+            return None, None
+        bounds = (None,) + tuple(self.id_boundaries) + (None,)
+        return bounds[shard], bounds[shard + 1]
+
+    def owner(self, product_id: int) -> Optional[int]:
+        """The shard holding ``product_id`` if the id alone decides it."""
+        return self.shard_of(product_id, None) if self.key == "id" else None
+
+    def shards_for(self, filters: Optional[SearchFilters]) -> List[int]:
+        """Shards that can hold products matching ``filters``."""
+        if self.key == "category" and filters is not None and filters.categories:
+            return sorted({self._category_shard(c) for c in filters.categories})
+        return list(range(self.count))
+
+
+def encode_vectors(vectors: np.ndarray) -> Dict:
+    vectors = np.ascontiguousarray(vectors, dtype="<f4")
+    return {
+        "shape": list(vectors.shape),
+        "data": base64.b64encode(vectors.tobytes()).decode("ascii"),
+    }
+
+
+def decode_vectors(payload: Dict) -> np.ndarray:
+    if not isinstance(payload, dict) or "shape" not in payload or "data" not in payload:
+        raise ValueError("vectors must be an object with shape and data")
+    raw = base64.b64decode(payload["data"])
+    return np.frombuffer(raw, dtype="<f4").reshape(payload["shape"]).astype(np.float32)
+
+
+class ShardError(Exception):
+    """A shard answered with an error status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def merge_results(per_shard: Sequence[List[Dict]], top_k: int) -> List[Dict]:
+    """Best ``top_k`` hits of several shards by ``similarity_score``."""
+    merged = sorted(
+        (result for results in per_shard for result in results),
+        key=lambda result: result["similarity_score"],
+        reverse=True,
+    )
+    seen = set()
+    top = []
+    for result in merged:
+        if result["product_id"] in seen:
+            continue
+        seen.add(result["product_id"])
+        top.append(result)
+        if len(top) == top_k:
+            break
+    return top
+
+
+class ShardCoordinator:
+    """Scatter-gather search over shard processes, one base URL per shard.
+
+    Offers the search methods of FaissService so the product service and the
+    batcher can use either. ``service`` is the local FaissService, used only
+    to encode queries with its model and query embedding cache.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        plan: ShardPlan,
+        service,
+        deadline_ms: float = 250,
+        api_key: Optional[str] = None,
+    ):
+        if len(urls) != plan.count:
+            raise ValueError(f"Expected {plan.count} shard URLs, got {len(urls)}")
+        self.urls = [url.rstrip("/") for url in urls]
+        self.plan = plan
+        self.service = service
+        self.deadline = deadline_ms / 1000.0
+        self.api_key = api_key
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_pid: Optional[int] = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = [
+            {"requests": 0, "errors": 0, "timeouts": 0, "last_error": None}
+            for _ in self.urls
+        ]
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # A forked worker inherits the pool object but none of its threads
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(
+                    max_workers=4 * len(self.urls), thread_name_prefix="shard-client"
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _record(self, shard: int, outcome: str, error: Optional[str] = None) -> None:
+        with self._stats_lock:
+            stats = self._stats[shard]
+            stats["requests"] += 1
+            if outcome != "ok":
+                stats[outcome] += 1
+                stats["last_error"] = error
+
+    def _post(self, shard: int, path: str, payload: Dict) -> Dict:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["X-API-Key"] = self.api_key
+        request = urllib.request.Request(
+            self.urls[shard] + path,
+            data=json.dumps(payload).encode("utf-8"),
+            headers=headers,
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.deadline) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("message", str(e))
+            except ValueError:
+                message = str(e)
+            raise ShardError(e.code, message)
+
+    def _scatter(self, shards: Sequence[int], path: str, payload: Dict) -> Dict[int, Dict]:
+        """POST ``payload`` to every shard in ``shards`` and collect the
+        answers that arrive within the deadline.
+
+        Raises ValueError when every shard rejected the request as invalid,
+        RuntimeError when none answered.
+        """
+        with _SCATTER_SECONDS.time():
+            futures = {
+                self._executor().submit(self._post, shard, path, payload): shard
+                for shard in shards
+            }
+            done, not_done = wait(futures, timeout=self.deadline)
+        responses: Dict[int, Dict] = {}
+        rejected: List[str] = []
+        for future in done:
+            shard = futures[future]
+            try:
+                responses[shard] = future.result()
+                self._record(shard, "ok")
+            except ShardError as e:
+                if e.status == 400:
+                    rejected.append(str(e))
+                elif e.status == 404:
+                    # The shard does not hold what was asked for
+                    responses[shard] = {}
+                    self._record(shard, "ok")
+                    continue
+                self._record(shard, "errors", f"{e.status}: {e}")
+            except Exception as e:
+                # The socket timeout equals the deadline, so a silent shard
+                # can fail here just before the wait gives up on it
+                if _timed_out(e):
+                    self._record(shard, "timeouts", "Deadline exceeded")
+                else:
+                    self._record(shard, "errors", str(e))
+        for future in not_done:
+            future.cancel()
+            self._record(futures[future], "timeouts", "Deadline exceeded")
+
+        if not responses:
+            if rejected and len(rejected) == len(shards):
+                raise ValueError(rejected[0])
+            raise RuntimeError("No search shard answered in time")
+        if len(responses) < len(shards):
+            missing = sorted(set(shards) - set(responses))
+            print(f"Search answered without shards {missing}")
+        return responses
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilters] = None,
+        mode: str = "vector",
+    ) -> List[Dict]:
+        if not query.strip():
+            raise ValueError("Search query cannot be empty")
+        return self.search_batch(
+            [query], [top_k], nprobe=nprobe, ef_search=ef_search, filters=filters, mode=mode
+        )[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        top_ks: List[int],
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilters] = None,
+        mode: str = "vector",
+    ) -> List[List[Dict]]:
+        """Encode ``queries`` once and merge every shard's top k per query.
+
+        In ``hybrid`` mode each shard fuses its own BM25 and vector hits, so
+        the merged order approximates a single index's.
+        """
+        if len(queries) != len(top_ks):
+            raise ValueError("queries and top_ks must have the same length")
+        if not queries:
+            return []
+        if any(not query.strip() for query in queries):
+            raise ValueError("Search query cannot be empty")
+
+        payload = {
+            "queries": list(queries),
+            "vectors": encode_vectors(self.service.encode_queries(queries)),
+            "top_ks": [int(top_k) for top_k in top_ks],
+            "filters": filters.to_dict() if filters is not None else None,
+            "mode": mode,
+            "nprobe": nprobe,
+            "ef_search": ef_search,
+        }
+        responses = self._scatter(self.plan.shards_for(filters), "/shard/search", payload)
+        answered = [responses[shard] for shard in sorted(responses) if responses[shard]]
+        return [
+            merge_results([response["results"][pos] for response in answered], top_k)
+            for pos, top_k in enumerate(top_ks)
+        ]
+
+    def similar_to_product(self, product_id: int, top_k: int = 5) -> List[Dict]:
+        """Search every shard with the stored vector of ``product_id``."""
+        owner = self.plan.owner(product_id)
+        shards = [owner] if owner is not None else range(len(self.urls))
+        responses = self._scatter(shards, "/shard/vector", {"product_id": product_id})
+        found = [response for response in responses.values() if response.get("vector")]
+        if not found:
+            raise LookupError(f"Product {product_id} is not indexed")
+
+        payload = {
+            "vectors": found[0]["vector"],
+            "top_ks": [top_k + 1],
+        }
+        responses = self._scatter(range(len(self.urls)), "/shard/search", payload)
+        results = [
+            [result for result in responses[shard]["results"][0] if result["product_id"] != product_id]
+            for shard in sorted(responses)
+            if responses[shard]
+        ]
+        return merge_results(results, top_k)
+
+    def readiness(self) -> Dict:
+        """``ready`` once the local encoder has loaded and while any shard is
+        ready. Shards are probed in parallel under one overall deadline."""
+        local = self.service.warmup_status["state"]
+        if local == "warming":
+            return {"status": "warming"}
+        if local == "failed":
+            return {"status": "unavailable", "error": self.service.warmup_status.get("error")}
+        futures = [self._executor().submit(self._shard_status, url) for url in self.urls]
+        wait(futures, timeout=self.deadline)
+        shards = []
+        for future in futures:
+            if future.done():
+                shards.append(future.result())
+            else:
+                future.cancel()
+                shards.append("unreachable")
+        status = "ready" if "ready" in shards else "unavailable"
+        return {"status": status, "shards": shards}
+
+    def _shard_status(self, url: str) -> str:
+        try:
+            with urllib.request.urlopen(url + "/ready", timeout=self.deadline) as response:
+                return json.loads(response.read()).get("status", "unknown")
+        except urllib.error.HTTPError as e:
+            try:
+                return json.loads(e.read()).get("status", "unavailable")
+            except ValueError:
+                return "unavailable"
+        except Exception:
+            return "unreachable"
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            shards = [
+                {"shard": shard, "url": url, **dict(stats)}
+                for shard, (url, stats) in enumerate(zip(self.urls, self._stats))
+            ]
+        return {
+            "plan": self.plan.describe(),
+            "deadline_ms": self.deadline * 1000.0,
+            "shards": shards,
+        }
+
+    def metrics(self) -> Dict[str, Tuple[str, Samples]]:
+        """Per-shard request totals for ``/metrics``."""
+        with self._stats_lock:
+            stats = [dict(shard_stats) for shard_stats in self._stats]
+        return {
+            f"search_shard_{outcome}_total": (
+                f"Shard {outcome} seen by this coordinator",
+                [
+                    ({"shard": str(shard)}, shard_stats[outcome])
+                    for shard, shard_stats in enumerate(stats)
+                ],
+            )
+            for outcome in ("requests", "errors", "timeouts")
+        }
+
+
+class LocalShardCluster:
+    """Runs ``count`` shard processes of this app on consecutive local ports.
+
+    A stand-in for separate machines: each process gets its own ``SHARD_ID``
+    and ``INDEX_DIR`` and shares the database and embedding cache.
+    """
+
+    def __init__(
+        self,
+        count: int,
+        base_port: int = 5101,
+        index_root: str = "data/shards",
+        key: str = "id",
+        id_boundaries: Sequence[int] = (),
+        host: str = "127.0.0.1",
+    ):
+        self.plan = ShardPlan(count, key, tuple(id_boundaries))
+        self.ports = [base_port + shard for shard in range(count)]
+        self.index_root = index_root
+        self.host = host
+        self.processes: List[subprocess.Popen] = []
+
+    @property
+    def urls(self) -> List[str]:
+        return [f"http://{self.host}:{port}" for port in self.ports]
+
+    def start(self) -> None:
+        for shard, port in enumerate(self.ports):
+            env = dict(
+                os.environ,
+                SHARD_ID=str(shard),
+                SHARD_COUNT=str(self.plan.count),
+                SHARD_KEY=self.plan.key,
+                SHARD_ID_BOUNDARIES=json.dumps(list(self.plan.id_boundaries)),
+                SHARD_URLS="[]",
+                INDEX_DIR=os.path.join(self.index_root, f"shard-{shard}"),
+            )
+            self.processes.append(
+                subprocess.Popen(
+                    [
+                        sys.executable,
+                        "-m",
+                        "flask",
+                        "--app",
+                        "app:create_app",
+                        "run",
+                        "--host",
+                        self.host,
+                        "--port",
+                        str(port),
+                    ],
+                    env=env,
+                )
+            )
+
+    def wait_until_ready(self, timeout: float = 300) -> bool:
+        deadline = time.monotonic() + timeout
+        pending = set(self.urls)
+        while pending and time.monotonic() < deadline:
+            for url in sorted(pending):
+                try:
+                    with urllib.request.urlopen(url + "/ready", timeout=1) as response:
+                        if response.status == 200:
+                            pending.discard(url)
+                except Exception:
+                    pass
+            if any(process.poll() is not None for process in self.processes):
+                return False
+            if pending:
+                time.sleep(0.5)
+        return not pending
+
+    def stop(self) -> None:
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+
+    def __enter__(self) -> "LocalShardCluster":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
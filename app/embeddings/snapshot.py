@@ -0,0 +1,190 @@
+# app/embeddings/snapshot.py
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.embeddings.catalog import ProductCatalog
+from app.embeddings.facets import FacetIndex, IdBitmapSelector
+from app.embeddings.index_factory import index_type_of, search_parameters
+from app.embeddings.lexical import BM25Index
+from app.embeddings.neighbors import NeighborTable
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """One consistent generation of everything a search reads.
+
+    Never modified after it is published. Incremental changes derive a new
+    snapshot that shares the base index and catalog arrays: changed rows go
+    to a small flat ``delta`` index and the base vectors they replace are
+    excluded through ``tombstones``.
+    """
+
+    index: faiss.Index
+    catalog: ProductCatalog
+    facets: FacetIndex
+    lexical: Optional[BM25Index] = None
+    neighbors: Optional[NeighborTable] = None
+    # None once incremental changes make the catalog differ from the artifact
+    fingerprint: Optional[str] = None
+    version: int = 0
+    mmapped: bool = False
+    # Published release the snapshot was loaded from, saved as or derives from
+    release: Optional[str] = None
+    delta: Optional[faiss.Index] = None
+    tombstones: Optional[IdBitmapSelector] = None
+    built_at: float = field(default_factory=time.time)
+
+    @property
+    def index_type(self) -> str:
+        return index_type_of(self.index)
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal + (self.delta.ntotal if self.delta is not None else 0)
+
+    def with_changes(
+        self,
+        removed_ids: Iterable[int],
+        records: List[Dict],
+        embeddings: np.ndarray,
+    ) -> "IndexSnapshot":
+        """A new snapshot with ``removed_ids`` dropped and ``records`` upserted.
+
+        ``embeddings`` are the normalized vectors of ``records``.
+        """
+        catalog = self.catalog.copy()
+        catalog.remove(removed_ids)
+        if records:
+            catalog.upsert(records, embeddings)
+
+        overlay_ids, overlay_vectors = catalog.overlay_vectors()
+        delta = None
+        if len(overlay_ids):
+            delta = faiss.IndexIDMap(faiss.IndexFlatIP(overlay_vectors.shape[1]))
+            delta.add_with_ids(np.ascontiguousarray(overlay_vectors), overlay_ids)
+        dead_ids = catalog.ids[~catalog.alive]
+
+        return replace(
+            self,
+            catalog=catalog,
+            lexical=(
+                self.lexical.with_overlay(catalog.overlay_records())
+                if self.lexical is not None
+                else None
+            ),
+            fingerprint=None,
+            delta=delta,
+            tombstones=IdBitmapSelector(dead_ids) if len(dead_ids) else None,
+        )
+
+    def search(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        selector: Optional[IdBitmapSelector] = None,
+        rerank: int = 0,
+        exact_limit: int = 0,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top ``k`` (scores, ids) per query over the base and delta indexes.
+
+        Replaced and deleted base vectors are skipped inside FAISS, as are ids
+        ``selector`` does not admit; nprobe and efSearch grow with how few ids
+        that is. A selector admitting at most ``exact_limit`` ids is instead
+        answered by scoring those ids' stored vectors exactly. With ``rerank``
+        > 1 the base index returns ``k * rerank`` candidates, which are
+        re-scored against the catalog's full-precision vectors before the top
+        ``k`` are kept.
+        """
+        if selector is not None and selector.count <= exact_limit:
+            distances, ids = self._exact_search(query_embeddings, k, selector.ids)
+            depth = k
+        else:
+            depth = k * rerank if rerank > 1 else k
+            distances, ids = self._index_search(
+                query_embeddings, depth, nprobe, ef_search, selector
+            )
+        if self.delta is None and depth == k:
+            return distances, ids
+        if depth > k:
+            distances = self.catalog.rescore(query_embeddings, ids)
+        if self.delta is None:
+            return _top_k(distances, ids, k)
+
+        delta_params = search_parameters(
+            self.delta, selector=selector.selector if selector is not None else None
+        )
+        delta_distances, delta_ids = self.delta.search(
+            query_embeddings, min(k, self.delta.ntotal), params=delta_params
+        )
+        return _top_k(
+            np.hstack([distances, delta_distances]), np.hstack([ids, delta_ids]), k
+        )
+
+    def _index_search(
+        self,
+        query_embeddings: np.ndarray,
+        depth: int,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        selector: Optional[IdBitmapSelector],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # Keep every selector object referenced until the search returns
+        keep_alive = []
+        base_selector = selector.selector if selector is not None else None
+        if self.tombstones is not None:
+            live = faiss.IDSelectorNot(self.tombstones.selector)
+            keep_alive.append(live)
+            if base_selector is not None:
+                base_selector = faiss.IDSelectorAnd(base_selector, live)
+            else:
+                base_selector = live
+        keep_alive.append(base_selector)
+
+        selectivity = 1.0
+        if selector is not None:
+            selectivity = selector.count / max(self.index.ntotal, 1)
+        params = search_parameters(
+            self.index,
+            nprobe=nprobe,
+            ef_search=ef_search,
+            selector=base_selector,
+            selectivity=selectivity,
+        )
+        return self.index.search(
+            query_embeddings, max(1, min(depth, self.index.ntotal)), params=params
+        )
+
+    def _exact_search(
+        self, query_embeddings: np.ndarray, k: int, product_ids: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force top ``k`` among the live base rows of ``product_ids``,
+        padded with -1 ids like a FAISS search."""
+        rows = self.catalog.base_rows(product_ids)
+        live = rows >= 0
+        product_ids, rows = product_ids[live], rows[live]
+        width = max(1, min(k, self.index.ntotal))
+        distances = np.full((len(query_embeddings), width), -np.inf, dtype=np.float32)
+        ids = np.full((len(query_embeddings), width), -1, dtype=np.int64)
+        if len(rows):
+            vectors = np.asarray(self.catalog.embeddings[rows], dtype=np.float32)
+            scores = query_embeddings @ vectors.T
+            top_scores, top_ids = _top_k(
+                scores, np.broadcast_to(product_ids, scores.shape), width
+            )
+            distances[:, : top_scores.shape[1]] = top_scores
+            ids[:, : top_ids.shape[1]] = top_ids
+        return distances, ids
+
+
+def _top_k(distances: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(-distances, axis=1, kind="stable")[:, :k]
+    return (
+        np.take_along_axis(distances, order, axis=1),
+        np.take_along_axis(ids, order, axis=1),
+    )
@@ -1,31 +1,73 @@
-from fastapi import FastAPI, Depends
-from sqlalchemy.orm import Session
+"""Async entry point: ``uvicorn app.main:app``.
+
+Serves the product search routes from one event loop. Encoding and search
+run on a bounded thread pool and search hits are hydrated with async
+SQLAlchemy, so a worker keeps many requests in flight instead of one.
+"""
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import create_app
 from app.api.endpoints import products
 from app.core.config import settings
-from app.db.base import Base
-from app.db.session import engine, SessionLocal
-from app.core.security import get_api_key
-from app.models.product import Product
-from app.mock_data import create_mock_data
-
-app = FastAPI(title=settings.PROJECT_NAME)
+from app.core.metrics import CONTENT_TYPE, REGISTRY, REQUEST_SECONDS
+from app.db.session import async_database_url
+from app.embeddings import search_backend
+from app.extensions import db
+from app.services.async_product_service import SearchPool
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Creates the tables and mock data and starts the index warm-up exactly as
+# the Flask app does; searches run inside its app context
+flask_app = create_app()
 
-# Include routers
-app.include_router(products.router, prefix="/api/v1")
 
-@app.on_event("startup")
-def startup_event():  # Removed async
-    """Initialize database and vector store on startup."""
-    db = SessionLocal()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with flask_app.app_context():
+        # The URL Flask-SQLAlchemy resolved, so relative SQLite paths match
+        url = settings.ASYNC_DATABASE_URL or async_database_url(db.engine.url)
+    engine = create_async_engine(url)
+    app.state.async_session = async_sessionmaker(engine, expire_on_commit=False)
+    app.state.search_pool = SearchPool(
+        flask_app, settings.ASYNC_SEARCH_WORKERS, settings.ASYNC_MAX_PENDING_SEARCHES
+    )
     try:
-        # Create mock data and initialize vector store
-        create_mock_data(db)  # Removed await
+        yield
     finally:
-        db.close()
+        app.state.search_pool.shutdown()
+        await engine.dispose()
+
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
+app.include_router(products.router)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_SECONDS.labels(
+        request.method, route.path if route is not None else "unmatched", str(response.status_code)
+    ).observe(time.perf_counter() - started)
+    return response
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/ready")
+async def ready():
+    status = search_backend.readiness()
+    return JSONResponse(status, status_code=200 if status["status"] == "ready" else 503)
+
 
 @app.get("/")
 async def read_root():
-    return {"message": "Root endpoint (unprotected)"}
\ No newline at end of file
+    return {"message": "Root endpoint (unprotected)"}
@@ -18,12 +18,14 @@ def create_mock_data(dbsession: Session):
             "description": "Experience immersive audio with these premium noise-cancelling headphones. Crystal-clear sound, comfortable over-ear design, and long battery life.",
             "category": "Electronics",
             "tags": "headphones,audio,noise-cancelling",
+            "price": 199.99,
         },
         {
             "name": "The Art of War",
             "description": "A timeless classic on military strategy. Explore ancient wisdom and learn the principles of warfare.",
             "category": "Books",
             "tags": "strategy,military,classic",
+            "price": 9.99,
         },
     ]
 
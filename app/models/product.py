@@ -1,5 +1,5 @@
 # app/models/product.py
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Float, Integer, String
 from app.extensions import db
 
 
@@ -9,4 +9,5 @@ class Product(db.Model):
     name = Column(String, nullable=False)
     description = Column(String)
     category = Column(String)
-    tags = Column(String)
\ No newline at end of file
+    tags = Column(String)
+    price = Column(Float)
\ No newline at end of file
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class ProductBase(BaseModel):
@@ -5,6 +6,7 @@ class ProductBase(BaseModel):
     description: str
     category: str
     tags: str
+    price: Optional[float] = None
 
 class ProductCreate(ProductBase):
     pass
@@ -0,0 +1,126 @@
+# app/services/async_product_service.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import stage
+from app.embeddings import search_backend
+from app.embeddings.facets import SearchFilters
+from app.models.product import Product
+from app.schemas.product import ProductSchema
+from app.services import product_service
+
+_HYDRATE_SECONDS = stage("hydrate")
+_DB_QUERY_SECONDS = stage("db_query")
+
+
+class SearchPool:
+    """Bounded thread pool for the blocking encode and search calls of the
+    async app.
+
+    The encoders and FAISS release the GIL for most of their work, so a few
+    threads keep searches running while the event loop serves other
+    requests. Calls run inside ``flask_app``'s context, as they do under
+    Flask. Once ``max_pending`` calls are queued or running, new ones fail
+    with RuntimeError instead of queueing without bound.
+    """
+
+    def __init__(self, flask_app, max_workers: int, max_pending: int = 0):
+        self.flask_app = flask_app
+        self.max_pending = max_pending
+        # Only touched from the event loop thread
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="async-search"
+        )
+
+    def _call(self, fn, args, kwargs):
+        with self.flask_app.app_context():
+            return fn(*args, **kwargs)
+
+    async def run(self, fn, *args, **kwargs):
+        if self.max_pending and self.pending >= self.max_pending:
+            raise RuntimeError(f"{self.pending} searches already in flight")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._call, fn, args, kwargs)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _load_products(
+    session: AsyncSession, product_ids: Iterable[int]
+) -> Dict[int, Product]:
+    """Fetch products with a single ``IN (...)`` query."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    with _DB_QUERY_SECONDS.time():
+        result = await session.execute(select(Product).where(Product.id.in_(product_ids)))
+        return {product.id: product for product in result.scalars()}
+
+
+async def _hydrate(
+    session: AsyncSession, result_lists: List[List[Dict]]
+) -> List[List[ProductSchema]]:
+    """``product_service._hydrate`` without blocking on the database."""
+    # Wall time, including turns other requests take on the event loop
+    with _HYDRATE_SECONDS.time():
+        db_products = await _load_products(session, product_service.ids_to_load(result_lists))
+        return product_service.to_schemas(result_lists, db_products)
+
+
+async def get_similar_products(
+    session: AsyncSession,
+    pool: SearchPool,
+    query: str,
+    top_k: int = 5,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filters: Optional[SearchFilters] = None,
+    mode: str = "vector",
+) -> List[ProductSchema]:
+    results = await pool.run(
+        product_service.search, query, top_k, nprobe, ef_search, filters, mode
+    )
+    return (await _hydrate(session, [results]))[0]
+
+
+async def get_related_products(
+    session: AsyncSession, pool: SearchPool, product_id: int, top_k: int = 5
+) -> List[ProductSchema]:
+    results = await pool.run(search_backend.similar_to_product, product_id, top_k)
+    return (await _hydrate(session, [results]))[0]
+
+
+async def get_similar_products_batch(
+    session: AsyncSession,
+    pool: SearchPool,
+    items: List[Dict],
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filters: Optional[SearchFilters] = None,
+    mode: str = "vector",
+) -> List[Dict]:
+    """See ``product_service.get_similar_products_batch``."""
+    outcomes, queries, top_ks, positions = product_service.split_batch_items(items)
+    if queries:
+        results = await pool.run(
+            search_backend.search_batch,
+            queries,
+            top_ks,
+            nprobe=nprobe,
+            ef_search=ef_search,
+            filters=filters,
+            mode=mode,
+        )
+        for pos, products in zip(positions, await _hydrate(session, results)):
+            outcomes[pos] = {"products": products}
+    return product_service.batch_outcomes(items, outcomes)
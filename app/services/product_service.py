@@ -1,30 +1,167 @@
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.metrics import stage
 from app.schemas.product import ProductSchema
-from app.embeddings import faiss_service
+from app.embeddings import search_backend, search_batcher
+from app.embeddings.facets import SearchFilters
 from app.extensions import db  # Import db from extensions.py
 from app.models.product import Product
 
+_HYDRATE_SECONDS = stage("hydrate")
+_DB_QUERY_SECONDS = stage("db_query")
 
-def get_similar_products(query: str, top_k: int = 5) -> List[ProductSchema]:
+
+def _load_products(product_ids: Iterable[int]) -> Dict[int, Product]:
+    """Fetch products with a single ``IN (...)`` query."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    with _DB_QUERY_SECONDS.time():
+        products = (
+            db.session.query(Product).filter(Product.id.in_(product_ids)).all()
+        )
+    return {product.id: product for product in products}
+
+
+def ids_to_load(result_lists: List[List[Dict]]) -> Set[int]:
+    """Ids of hits that must be read from the database to hydrate them."""
+    if settings.CATALOG_HYDRATE_FROM_DB:
+        return {r["product_id"] for results in result_lists for r in results}
+    return {
+        r["product_id"]
+        for results in result_lists
+        for r in results
+        if r.get("product") is None
+    }
+
+
+def to_schemas(
+    result_lists: List[List[Dict]], db_products: Dict[int, Product]
+) -> List[List[ProductSchema]]:
+    hydrated = []
+    for results in result_lists:
+        similar_products = []
+        for result in results:
+            product = db_products.get(result["product_id"]) or result.get("product")
+            if product is not None:
+                similar_products.append(ProductSchema.model_validate(product))
+        hydrated.append(similar_products)
+    return hydrated
+
+
+def _hydrate(result_lists: List[List[Dict]]) -> List[List[ProductSchema]]:
+    """Turn raw search hits into ProductSchema lists.
+
+    Hits carry the in-memory catalog record; the database is only consulted
+    when configured to, or for rows the catalog does not hold, and then with
+    one query for all lists together.
+    """
+    with _HYDRATE_SECONDS.time():
+        return to_schemas(result_lists, _load_products(ids_to_load(result_lists)))
+
+
+def search(
+    query: str,
+    top_k: int = 5,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filters: Optional[SearchFilters] = None,
+    mode: str = "vector",
+) -> List[Dict]:
+    """Raw search hits for one query, coalesced with concurrent ones when enabled."""
+    plain = nprobe is None and ef_search is None and filters is None
+    if settings.SEARCH_BATCHING_ENABLED and plain and mode == "vector":
+        return search_batcher.search(query, top_k)
+    return search_backend.search(
+        query,
+        top_k,
+        nprobe=nprobe,
+        ef_search=ef_search,
+        filters=filters,
+        mode=mode,
+    )
+
+
+def get_similar_products(
+    query: str,
+    top_k: int = 5,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filters: Optional[SearchFilters] = None,
+    mode: str = "vector",
+) -> List[ProductSchema]:
     """Get similar products using FAISS."""
-    results = faiss_service.search(query, top_k)
-    similar_products = []
-    for result in results:
-        # Use db.session to create a new session
-        with db.session() as session:
-            product = (
-                session.query(Product)
-                .filter(Product.id == result["product_id"])
-                .first()
+    return _hydrate([search(query, top_k, nprobe, ef_search, filters, mode)])[0]
+
+
+def get_related_products(product_id: int, top_k: int = 5) -> List[ProductSchema]:
+    """Products similar to an already indexed product ("more like this")."""
+    return _hydrate([search_backend.similar_to_product(product_id, top_k)])[0]
+
+
+def get_similar_products_batch(
+    items: List[Dict],
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filters: Optional[SearchFilters] = None,
+    mode: str = "vector",
+) -> List[Dict]:
+    """Run many ``{query, top_k}`` searches as one batch.
+
+    Returns one entry per item, in order, holding either ``products`` or an
+    ``error`` message. An invalid item does not fail the others. ``filters``
+    and ``mode`` apply to every query in the batch.
+    """
+    outcomes, queries, top_ks, positions = split_batch_items(items)
+    if queries:
+        hydrated = _hydrate(
+            search_backend.search_batch(
+                queries,
+                top_ks,
+                nprobe=nprobe,
+                ef_search=ef_search,
+                filters=filters,
+                mode=mode,
             )
-            if product:
-                similar_products.append(
-                    ProductSchema(
-                        id=product.id,
-                        name=product.name,
-                        description=product.description,
-                        category=product.category,
-                        tags=product.tags,
-                    )
-                )
-    return similar_products
\ No newline at end of file
+        )
+        for pos, products in zip(positions, hydrated):
+            outcomes[pos] = {"products": products}
+    return batch_outcomes(items, outcomes)
+
+
+def top_k_error(top_k) -> Optional[str]:
+    """Why ``top_k`` is not an acceptable result count, or None if it is."""
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1:
+        return "top_k must be a positive integer"
+    if top_k > settings.MAX_TOP_K:
+        return f"top_k must be at most {settings.MAX_TOP_K}"
+    return None
+
+
+def split_batch_items(
+    items: List[Dict],
+) -> Tuple[List[Dict], List[str], List[int], List[int]]:
+    """Validate batch items: per-item outcomes (errors filled in) plus the
+    queries, top_ks and item positions of the valid ones."""
+    outcomes: List[Dict] = [{} for _ in items]
+    queries, top_ks, positions = [], [], []
+    for pos, item in enumerate(items):
+        query = item.get("query") if isinstance(item, dict) else None
+        top_k = item.get("top_k", 5) if isinstance(item, dict) else None
+        error = top_k_error(top_k)
+        if not isinstance(query, str) or not query.strip():
+            outcomes[pos] = {"error": "Query parameter is required"}
+        elif error is not None:
+            outcomes[pos] = {"error": error}
+        else:
+            queries.append(query)
+            top_ks.append(top_k)
+            positions.append(pos)
+    return outcomes, queries, top_ks, positions
+
+
+def batch_outcomes(items: List[Dict], outcomes: List[Dict]) -> List[Dict]:
+    return [
+        {"query": item.get("query") if isinstance(item, dict) else None, **outcome}
+        for item, outcome in zip(items, outcomes)
+    ]
@@ -0,0 +1,98 @@
+# benchmarks/common.py
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Importing the app package reads settings; benchmarks do not need a real DB
+os.environ.setdefault("API_KEYS", "[]")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+DEFAULT_CSV = "demo/data/myntra_products_catalog.csv"
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL)
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata() -> Dict:
+    return {
+        "git_revision": git_revision(),
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def percentiles(samples_seconds: List[float]) -> Dict[str, float]:
+    samples = np.asarray(samples_seconds) * 1000.0
+    return {
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "mean_ms": float(samples.mean()),
+    }
+
+
+def read_csv_texts(path: str, column: str = "description", limit: Optional[int] = None) -> List[str]:
+    texts = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            texts.append(row.get(column) or "")
+            if limit is not None and len(texts) >= limit:
+                break
+    return texts
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def synthetic_vectors(
+    n: int, dimension: int, clusters: int = 256, spread: float = 1.4, seed: int = 0
+) -> np.ndarray:
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((clusters, dimension)))
+    assignment = rng.integers(0, clusters, n)
+    noise = rng.standard_normal((n, dimension)) * spread / np.sqrt(dimension)
+    return normalize(centers[assignment] + noise)
+
+
+def scale_up(vectors: np.ndarray, factor: int, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """Grow a catalog by adding jittered copies of every vector."""
+    if factor <= 1:
+        return normalize(vectors)
+    rng = np.random.default_rng(seed)
+    copies = [vectors]
+    for _ in range(factor - 1):
+        copies.append(vectors + noise * rng.standard_normal(vectors.shape) / np.sqrt(vectors.shape[1]))
+    return normalize(np.vstack(copies))
+
+
+def write_output(result: Dict, output: Optional[str]) -> None:
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Results written to {output}")
+    else:
+        print(text)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Measure demo/data/data_processor.py on a scaled-up catalog.
+
+Writes ``--scale`` copies of the Myntra demo catalog, with fresh product
+ids, to a temporary directory. It then processes the copy with the
+``ProductDataProcessor`` the script used to have: the whole file read at
+once, per-row ``.apply`` cleaning and CSV output. It compares that with the
+current vectorized processor, whole and chunked, writing CSV, Parquet and
+Arrow. Each run happens in a fresh process and reports wall time, rows/s,
+peak resident memory and output size. It also measures how long the output
+takes to load, and how much memory that costs, the way demo/app.py loads it.
+
+Examples:
+  python -m benchmarks.data_processor_benchmark
+  python -m benchmarks.data_processor_benchmark --scale 5000 --chunk-size 100000 -o bench/data_processor.json
+"""
+import argparse
+import csv
+import importlib.util
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+from typing import Dict
+
+from benchmarks.common import DEFAULT_CSV, run_metadata, write_output
+
+PROCESSOR_PATH = "demo/data/data_processor.py"
+
+
+def scale_catalog(source: str, target: str, scale: int) -> int:
+    with open(source, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    id_column = header.index("product_id")
+    with open(target, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        product_id = 1
+        for _ in range(scale):
+            for row in rows:
+                row = list(row)
+                row[id_column] = product_id
+                writer.writerow(row)
+                product_id += 1
+    return product_id - 1
+
+
+def legacy_process(input_file: str, output_dir: str) -> str:
+    """ProductDataProcessor.process as it was, without image generation."""
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(input_file)
+    total_rows = len(df)
+    if "product_id" not in df.columns:
+        df["product_id"] = range(1, total_rows + 1)
+    for col in ("product_id", "title", "description", "price", "image_path"):
+        if col not in df.columns:
+            if col == "image_path":
+                df[col] = ""
+            elif col == "price":
+                df[col] = np.random.uniform(10, 100, total_rows).round(2)
+            else:
+                raise ValueError(f"Missing required column: {col}")
+    df["description"] = (
+        df["description"].fillna("").astype(str).apply(lambda x: x.replace("\n", " ").strip())
+    )
+    df["title"] = (
+        df["title"]
+        .fillna("Untitled Product")
+        .astype(str)
+        .apply(lambda x: x.replace("\n", " ").strip())
+    )
+
+    price_col = next(col for col in ("price", "Price", "Price (INR)", "price_inr") if col in df.columns)
+    df[price_col] = (
+        df[price_col]
+        .astype(str)
+        .apply(
+            lambda x: float(
+                x.replace(",", "").replace("$", "").replace("₹", "").replace("INR", "").strip()
+            )
+            if x.strip()
+            else 0.0
+        )
+    )
+    if "INR" in price_col:
+        df[price_col] = (df[price_col] * 0.012).round(2)
+    if price_col != "price":
+        df["price"] = df[price_col]
+        df = df.drop(columns=[price_col])
+
+    df = df[["product_id", "title", "description", "price", "image_path"]]
+    output_file = os.path.join(output_dir, "products.csv")
+    df.to_csv(output_file, index=False)
+    # The old process() also summarized the frame
+    df["price"].min(), df["price"].max(), df["price"].mean(), (df["image_path"] != "").sum()
+    return output_file
+
+
+def load_processor_class():
+    spec = importlib.util.spec_from_file_location("data_processor", PROCESSOR_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.ProductDataProcessor
+
+
+def load_output(path: str):
+    """Read processed products the way demo/app.py does."""
+    import pandas as pd
+
+    if path.endswith(".arrow"):
+        import pyarrow as pa
+
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, memory_map=True)
+    return pd.read_csv(path)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _process_in_child(mode: str, input_file: str, output_dir: str, chunk_size, output_format, queue):
+    import logging
+
+    # The processor logs every chunk; keep the benchmark output readable
+    logging.disable(logging.INFO)
+    baseline = _peak_rss_mb()
+    began = time.perf_counter()
+    if mode == "before":
+        output_file = legacy_process(input_file, output_dir)
+    else:
+        processor = load_processor_class()(
+            input_file, output_dir, chunk_size=chunk_size, output_format=output_format
+        )
+        output_file = processor.process()
+    queue.put(
+        {
+            "seconds": time.perf_counter() - began,
+            "peak_rss_mb": _peak_rss_mb(),
+            "baseline_rss_mb": baseline,
+            "output_file": output_file,
+        }
+    )
+
+
+def _load_in_child(path: str, queue):
+    import pandas as pd  # noqa: F401  (imported before the baseline)
+    import pyarrow  # noqa: F401
+
+    baseline = _peak_rss_mb()
+    began = time.perf_counter()
+    df = load_output(path)
+    rows = len(df)
+    queue.put(
+        {
+            "seconds": time.perf_counter() - began,
+            "rss_increase_mb": _peak_rss_mb() - baseline,
+            "rows": rows,
+        }
+    )
+
+
+def in_child(target, *args) -> Dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=target, args=(*args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def run(args) -> Dict:
+    workdir = tempfile.mkdtemp(prefix="data-processor-bench-")
+    try:
+        input_file = os.path.join(workdir, "catalog.csv")
+        rows = scale_catalog(args.csv, input_file, args.scale)
+        size_mb = os.path.getsize(input_file) / 2**20
+        print(f"Processing {rows} rows ({size_mb:.1f} MiB) from {args.scale} copies of {args.csv}")
+
+        runs = {
+            "before": ("before", None, "csv"),
+            "after": ("after", None, "csv"),
+            "after_chunked_csv": ("after", args.chunk_size, "csv"),
+            "after_chunked_parquet": ("after", args.chunk_size, "parquet"),
+            "after_chunked_arrow": ("after", args.chunk_size, "arrow"),
+        }
+        results = {}
+        for label, (mode, chunk_size, output_format) in runs.items():
+            output_dir = os.path.join(workdir, label)
+            os.makedirs(output_dir)
+            result = in_child(
+                _process_in_child, mode, input_file, output_dir, chunk_size, output_format
+            )
+            output_file = result.pop("output_file")
+            if output_file is None:
+                raise SystemExit(f"{label} failed; run the processor directly to see why")
+            result["rows_per_second"] = rows / result["seconds"]
+            result["output_mb"] = os.path.getsize(output_file) / 2**20
+            result["load"] = in_child(_load_in_child, output_file)
+            results[label] = result
+            print(
+                f"{label:>22}: {result['seconds']:.2f}s ({result['rows_per_second']:.0f} rows/s), "
+                f"peak RSS {result['peak_rss_mb']:.0f} MiB, output {result['output_mb']:.1f} MiB, "
+                f"load {result['load']['seconds']:.3f}s +{result['load']['rss_increase_mb']:.0f} MiB"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "benchmark": "data_processor",
+        "meta": run_metadata(),
+        "rows": rows,
+        "input_mb": size_mb,
+        "chunk_size": args.chunk_size,
+        "speedup": results["before"]["seconds"] / results["after"]["seconds"],
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--scale", type=int, default=2000, help="Copies of the catalog to process")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("-o", "--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    write_output(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
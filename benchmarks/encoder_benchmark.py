@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Compare embedding backends against the reference sentence-transformers model.
+
+Encodes catalog descriptions (the corpus) and product titles (the queries)
+with every backend created by app.embeddings.encoders and reports, per
+backend: load time, corpus throughput, single-query latency percentiles,
+cosine agreement with the reference vectors, and how many of the
+reference's exact top-k neighbors each query still retrieves (recall@k).
+
+The ONNX backends need a prior `flask export-encoder`.
+
+Examples:
+  python -m benchmarks.encoder_benchmark --limit 2000
+  python -m benchmarks.encoder_benchmark --backends sentence_transformers onnx_int8 --threads 4 -o bench/encoders.json
+"""
+import argparse
+import time
+from typing import Dict
+
+import numpy as np
+
+from benchmarks.common import (
+    DEFAULT_CSV,
+    normalize,
+    percentiles,
+    read_csv_texts,
+    run_metadata,
+    write_output,
+)
+
+from app.core.config import settings  # noqa: E402
+from app.embeddings.encoders import (  # noqa: E402
+    ENCODER_BACKENDS,
+    agreement,
+    create_encoder,
+)
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = normalize(queries) @ normalize(corpus).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / float(truth.size)
+
+
+def run(args) -> Dict:
+    corpus = read_csv_texts(args.csv, column="description", limit=args.limit)
+    queries = read_csv_texts(args.csv, column="title", limit=args.queries)
+    print(f"Corpus: {len(corpus)} descriptions, {len(queries)} title queries")
+
+    reference = None
+    results = []
+    # The reference runs first so every other backend can be compared with it
+    backends = ["sentence_transformers"] + [
+        backend for backend in args.backends if backend != "sentence_transformers"
+    ]
+    for backend in backends:
+        began = time.perf_counter()
+        encoder = create_encoder(
+            backend, args.model, onnx_dir=args.onnx_dir, threads=args.threads
+        )
+        load_seconds = time.perf_counter() - began
+
+        encoder.encode(queries[:8])  # warm-up
+        began = time.perf_counter()
+        corpus_vectors = encoder.encode(corpus, batch_size=args.batch_size)
+        encode_seconds = time.perf_counter() - began
+
+        samples = []
+        query_vectors = []
+        for query in queries:
+            began = time.perf_counter()
+            query_vectors.append(encoder.encode([query])[0])
+            samples.append(time.perf_counter() - began)
+        query_vectors = np.vstack(query_vectors)
+
+        entry = {
+            "backend": backend,
+            "load_seconds": load_seconds,
+            "corpus_texts_per_second": len(corpus) / encode_seconds,
+            "query_latency": percentiles(samples),
+        }
+        if reference is None:
+            reference = (corpus_vectors, query_vectors, top_k(corpus_vectors, query_vectors, args.k))
+        else:
+            entry["agreement"] = agreement(
+                np.vstack([reference[0], reference[1]]),
+                np.vstack([corpus_vectors, query_vectors]),
+            )
+            entry[f"recall_at_{args.k}"] = recall_at_k(
+                top_k(corpus_vectors, query_vectors, args.k), reference[2]
+            )
+
+        summary = (
+            f"{backend:>22}: {entry['corpus_texts_per_second']:.0f} texts/s, "
+            f"query p50={entry['query_latency']['p50_ms']:.2f}ms "
+            f"p99={entry['query_latency']['p99_ms']:.2f}ms"
+        )
+        if "agreement" in entry:
+            summary += (
+                f", min cosine={entry['agreement']['min_cosine']:.4f} "
+                f"recall@{args.k}={entry[f'recall_at_{args.k}']:.3f}"
+            )
+        print(summary)
+        results.append(entry)
+
+    return {
+        "benchmark": "encoders",
+        "meta": run_metadata(),
+        "model": args.model,
+        "corpus": {"source": args.csv, "texts": len(corpus), "queries": len(queries)},
+        "batch_size": args.batch_size,
+        "threads": args.threads,
+        "k": args.k,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--limit", type=int, default=2000, help="Corpus size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--onnx-dir", default=settings.EMBEDDING_ONNX_DIR)
+    parser.add_argument(
+        "--backends", nargs="+", choices=ENCODER_BACKENDS, default=list(ENCODER_BACKENDS)
+    )
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("-o", "--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    write_output(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Bulk-insert a synthetic product catalog for scale testing.
+
+Products are composed from per-category vocabularies, so names, descriptions
+and tags share words the way a real catalog does and both vector and BM25
+search have something to find. Rows go in through executemany on the
+``products`` table in batches of ``--batch-size``, one transaction per batch,
+never through ``session.add``. Generation is deterministic for a given
+``--seed`` and starting id, so a catalog can be rebuilt identically.
+
+create_mock_data leaves a non-empty table alone, so the app serves the
+generated catalog as is. Point DATABASE_URL at the same database and start
+it (or use benchmarks.load_test --spawn).
+
+Examples:
+  python -m benchmarks.generate_catalog --database-url sqlite:///data/scale.db --count 100000
+  python -m benchmarks.generate_catalog --database-url sqlite:///data/scale.db --count 1000000 --replace
+"""
+import argparse
+import random
+import time
+from typing import Dict, Iterator, List
+
+from benchmarks.common import run_metadata, write_output
+
+from sqlalchemy import create_engine, func, insert, select  # noqa: E402
+
+from app.models.product import Product  # noqa: E402
+
+# category -> (product nouns, materials or features)
+VOCABULARY = {
+    "Electronics": (
+        ["headphones", "speaker", "smartwatch", "charger", "keyboard", "webcam", "earbuds", "monitor"],
+        ["wireless", "bluetooth", "noise-cancelling", "usb-c", "rechargeable", "4k", "ergonomic"],
+    ),
+    "Books": (
+        ["novel", "cookbook", "biography", "guide", "anthology", "atlas", "workbook", "memoir"],
+        ["hardcover", "paperback", "illustrated", "annotated", "bestselling", "classic"],
+    ),
+    "Men": (
+        ["shirt", "jeans", "jacket", "sneakers", "belt", "kurta", "trousers", "hoodie"],
+        ["cotton", "denim", "leather", "linen", "slim-fit", "relaxed-fit", "wool"],
+    ),
+    "Women": (
+        ["dress", "top", "saree", "handbag", "sandals", "skirt", "cardigan", "kurti"],
+        ["silk", "chiffon", "cotton", "embroidered", "floral", "pleated", "rayon"],
+    ),
+    "Home": (
+        ["lamp", "rug", "cushion", "curtains", "vase", "bedsheet", "clock", "shelf"],
+        ["handwoven", "ceramic", "wooden", "velvet", "minimalist", "vintage", "bamboo"],
+    ),
+    "Kitchen": (
+        ["pan", "knife set", "blender", "kettle", "mug", "cutting board", "pressure cooker"],
+        ["non-stick", "stainless steel", "cast iron", "electric", "dishwasher-safe", "glass"],
+    ),
+    "Sports": (
+        ["yoga mat", "dumbbells", "football", "racket", "running shoes", "water bottle", "backpack"],
+        ["lightweight", "waterproof", "anti-slip", "breathable", "insulated", "adjustable"],
+    ),
+    "Beauty": (
+        ["moisturizer", "lipstick", "perfume", "serum", "shampoo", "sunscreen", "face wash"],
+        ["organic", "vegan", "fragrance-free", "matte", "hydrating", "spf 50", "herbal"],
+    ),
+    "Toys": (
+        ["puzzle", "building blocks", "doll", "board game", "remote car", "plush toy", "kite"],
+        ["educational", "wooden", "battery-powered", "colourful", "magnetic", "durable"],
+    ),
+}
+COLORS = ["black", "white", "navy", "red", "green", "beige", "grey", "pink", "blue", "olive"]
+BRANDS = ["Aurora", "Northwind", "Kestrel", "Lumen", "Saffron", "Everest", "Tidal", "Maple"]
+OPENINGS = [
+    "Designed for everyday use, this",
+    "A customer favourite, the",
+    "Built to last, this",
+    "Our best-selling",
+    "Thoughtfully made, this",
+]
+CLOSINGS = [
+    "Makes a great gift.",
+    "Easy to care for.",
+    "Backed by a one-year warranty.",
+    "Pairs well with the rest of the collection.",
+    "Available while stocks last.",
+]
+QUERY_TEMPLATES = ["{color} {noun}", "{feature} {noun}", "{noun} for {category}", "{brand} {noun}"]
+CATEGORIES = sorted(VOCABULARY)
+
+
+def generate_products(count: int, start_id: int = 1, seed: int = 0) -> Iterator[Dict]:
+    """``count`` product rows with ids from ``start_id``."""
+    rng = random.Random(f"{seed}:{start_id}")
+    for product_id in range(start_id, start_id + count):
+        category = rng.choice(CATEGORIES)
+        nouns, features = VOCABULARY[category]
+        noun = rng.choice(nouns)
+        color = rng.choice(COLORS)
+        brand = rng.choice(BRANDS)
+        picked = rng.sample(features, 2)
+        yield {
+            "id": product_id,
+            "name": f"{brand} {picked[0].title()} {color.title()} {noun.title()}",
+            "description": (
+                f"{rng.choice(OPENINGS)} {color} {noun} is {picked[0]} and {picked[1]}. "
+                f"Part of the {brand} {category.lower()} range. {rng.choice(CLOSINGS)}"
+            ),
+            "category": category,
+            "tags": ",".join([noun, color, *picked]),
+            "price": round(rng.lognormvariate(3.5, 0.9), 2),
+        }
+
+
+def sample_queries(count: int, seed: int = 0) -> List[str]:
+    """Search texts drawn from the same vocabulary as the products."""
+    rng = random.Random(f"queries:{seed}")
+    queries = []
+    for _ in range(count):
+        category = rng.choice(CATEGORIES)
+        nouns, features = VOCABULARY[category]
+        queries.append(
+            rng.choice(QUERY_TEMPLATES).format(
+                color=rng.choice(COLORS),
+                feature=rng.choice(features),
+                noun=rng.choice(nouns),
+                category=category.lower(),
+                brand=rng.choice(BRANDS),
+            )
+        )
+    return queries
+
+
+def seed_catalog(
+    database_url: str, count: int, batch_size: int = 10_000, seed: int = 0, replace: bool = False
+) -> Dict:
+    """Insert ``count`` products after the highest existing id (or into an
+    emptied table with ``replace``) and return timings."""
+    engine = create_engine(database_url)
+    table = Product.__table__
+    table.create(engine, checkfirst=True)
+    try:
+        with engine.begin() as conn:
+            if replace:
+                conn.execute(table.delete())
+            start_id = (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+        began = time.perf_counter()
+        inserted = 0
+        rows = generate_products(count, start_id, seed)
+        while inserted < count:
+            batch = [row for _, row in zip(range(batch_size), rows)]
+            # A list of parameter sets runs as one executemany
+            with engine.begin() as conn:
+                conn.execute(insert(table), batch)
+            inserted += len(batch)
+            if inserted % (batch_size * 10) == 0 or inserted == count:
+                print(f"Inserted {inserted}/{count} products")
+        seconds = time.perf_counter() - began
+
+        with engine.connect() as conn:
+            total = conn.execute(select(func.count()).select_from(table)).scalar()
+    finally:
+        engine.dispose()
+    return {
+        "inserted": inserted,
+        "first_id": start_id,
+        "total_products": total,
+        "seconds": seconds,
+        "rows_per_second": inserted / seconds if seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replace", action="store_true", help="Delete existing products first")
+    parser.add_argument("-o", "--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    result = seed_catalog(args.database_url, args.count, args.batch_size, args.seed, args.replace)
+    print(
+        f"Inserted {result['inserted']} products in {result['seconds']:.1f}s "
+        f"({result['rows_per_second']:.0f} rows/s); table now holds {result['total_products']}"
+    )
+    write_output(
+        {"benchmark": "generate_catalog", "meta": run_metadata(), "count": args.count, **result},
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
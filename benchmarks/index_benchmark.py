@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Compare FAISS index configurations against exact IndexFlatIP search.
+
+Builds every configuration with the same code path FaissService uses
+(app.embeddings.index_factory) and reports recall@k against the flat
+ground truth, build time, serialized index size and query latency
+percentiles at several batch sizes, as JSON.
+
+Compressed storage modes (float16, sq8, PCA, binary) also report the
+memory they save against the float32 flat index and the recall they lose,
+with and without an exact re-rank ("rerank": candidates per result, scored
+against the full-precision vectors as FaissService does).
+
+Examples:
+  python -m benchmarks.index_benchmark --synthetic 200000
+  python -m benchmarks.index_benchmark --csv demo/data/myntra_products_catalog.csv --scale 20
+  python -m benchmarks.index_benchmark --synthetic 100000 --output bench/index.json
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from benchmarks.common import (
+    DEFAULT_CSV,
+    normalize,
+    percentiles,
+    read_csv_texts,
+    run_metadata,
+    scale_up,
+    synthetic_vectors,
+    write_output,
+)
+
+from app.embeddings.catalog import ProductCatalog  # noqa: E402
+from app.embeddings.index_factory import (  # noqa: E402
+    IndexSpec,
+    build_index,
+    index_type_of,
+    search_parameters,
+)
+from app.embeddings.index_store import write_faiss_index  # noqa: E402
+
+# Stands in for a PCA size derived from the vector dimension (pca_dim_for)
+PCA_AUTO = -1
+
+# (label, build spec, per-query search overrides)
+CONFIGURATIONS: List[Tuple[str, IndexSpec, Dict]] = [
+    ("flat", IndexSpec("flat"), {}),
+    ("hnsw_ef32", IndexSpec("hnsw"), {"ef_search": 32}),
+    ("hnsw_ef64", IndexSpec("hnsw"), {"ef_search": 64}),
+    ("hnsw_ef128", IndexSpec("hnsw"), {"ef_search": 128}),
+    ("ivf_flat_np4", IndexSpec("ivf_flat"), {"nprobe": 4}),
+    ("ivf_flat_np16", IndexSpec("ivf_flat"), {"nprobe": 16}),
+    ("ivf_flat_np64", IndexSpec("ivf_flat"), {"nprobe": 64}),
+    ("ivf_pq_np16", IndexSpec("ivf_pq"), {"nprobe": 16}),
+    ("ivf_pq_np64", IndexSpec("ivf_pq"), {"nprobe": 64}),
+    ("flat_fp16", IndexSpec("flat", storage="float16"), {}),
+    ("flat_sq8", IndexSpec("flat", storage="sq8"), {}),
+    ("flat_sq8_rerank4", IndexSpec("flat", storage="sq8"), {"rerank": 4}),
+    ("flat_pca", IndexSpec("flat", pca_dim=PCA_AUTO), {}),
+    ("flat_pca_rerank4", IndexSpec("flat", pca_dim=PCA_AUTO), {"rerank": 4}),
+    ("flat_binary", IndexSpec("flat", storage="binary"), {}),
+    ("flat_binary_rerank10", IndexSpec("flat", storage="binary"), {"rerank": 10}),
+    ("hnsw_sq8_ef64", IndexSpec("hnsw", storage="sq8"), {"ef_search": 64}),
+    ("hnsw_sq8_ef64_rerank4", IndexSpec("hnsw", storage="sq8"), {"ef_search": 64, "rerank": 4}),
+    (
+        "hnsw_binary_ef128_rerank10",
+        IndexSpec("hnsw", storage="binary"),
+        {"ef_search": 128, "rerank": 10},
+    ),
+]
+
+
+def pca_dim_for(dimension: int) -> int:
+    """A third of ``dimension``, rounded down to a multiple of 8 (128 for
+    MiniLM's 384)."""
+    return max(8, dimension // 3 // 8 * 8)
+
+
+def load_vectors(args) -> np.ndarray:
+    if args.csv:
+        from app.core.config import settings
+        from sentence_transformers import SentenceTransformer
+
+        texts = read_csv_texts(args.csv, limit=args.limit)
+        model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        base = model.encode(texts, batch_size=256)
+        return scale_up(np.asarray(base, dtype=np.float32), args.scale)
+    return synthetic_vectors(args.synthetic, args.dimension)
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    # Perturbed catalog vectors: queries land near, not on, indexed items
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(vectors.shape[0], count, replace=vectors.shape[0] < count)
+    noise = 0.3 * rng.standard_normal((count, vectors.shape[1])) / np.sqrt(vectors.shape[1])
+    return normalize(vectors[rows] + noise)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / float(truth.shape[0] * k)
+
+
+def index_bytes(index) -> int:
+    """Size of the index as a published release stores it."""
+    directory = tempfile.mkdtemp(prefix="index-benchmark-")
+    try:
+        write_faiss_index(index, directory)
+        return sum(
+            os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def make_search(index, catalog: ProductCatalog, overrides: Dict, k: int):
+    rerank = overrides.get("rerank", 0)
+    params = search_parameters(
+        index, **{name: value for name, value in overrides.items() if name != "rerank"}
+    )
+
+    def search(batch: np.ndarray) -> np.ndarray:
+        if rerank <= 1:
+            return index.search(batch, k, params=params)[1]
+        _, ids = index.search(batch, k * rerank, params=params)
+        order = np.argsort(-catalog.rescore(batch, ids), axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(ids, order, axis=1)
+
+    return search
+
+
+def measure_latency(search, queries: np.ndarray, batch_size: int, repeats: int) -> Dict:
+    samples = []
+    for _ in range(repeats):
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start : start + batch_size]
+            began = time.perf_counter()
+            search(batch)
+            samples.append(time.perf_counter() - began)
+    stats = percentiles(samples)
+    stats["queries_per_second"] = len(queries) * repeats / sum(samples)
+    return stats
+
+
+def run(args) -> Dict:
+    vectors = load_vectors(args)
+    n, dimension = vectors.shape
+    ids = np.arange(n, dtype=np.int64)
+    queries = make_queries(vectors, args.queries)
+    print(f"Catalog: {n} vectors x {dimension} dims, {len(queries)} queries")
+
+    truth_index = build_index(vectors, ids, IndexSpec("flat"))
+    _, truth = truth_index.search(queries, args.k)
+    float32_bytes = index_bytes(truth_index)
+    catalog = ProductCatalog(ids, {}, vectors)
+
+    wanted = set(args.configs) if args.configs else None
+    results = []
+    built: Dict[IndexSpec, Tuple[object, float]] = {}
+    for label, spec, overrides in CONFIGURATIONS:
+        if wanted and label not in wanted:
+            continue
+        spec = IndexSpec(**{**spec.__dict__, "train_sample": args.train_sample})
+        if spec.pca_dim == PCA_AUTO:
+            spec = IndexSpec(**{**spec.__dict__, "pca_dim": pca_dim_for(dimension)})
+        if spec not in built:
+            began = time.perf_counter()
+            try:
+                index = build_index(vectors, ids, spec)
+            except ValueError as e:
+                # e.g. binary codes of a dimension that is not a multiple of 8
+                print(f"{label:>26}: skipped, {e}")
+                results.append({"label": label, "skipped": str(e)})
+                continue
+            built[spec] = (index, time.perf_counter() - began)
+        index, build_seconds = built[spec]
+
+        search = make_search(index, catalog, overrides, args.k)
+        recall = recall_at_k(search(queries), truth)
+        size = index_bytes(index)
+        entry = {
+            "label": label,
+            "index_type": index_type_of(index),
+            "storage": spec.storage,
+            "pca_dim": spec.pca_dim,
+            "search_params": overrides,
+            "build_seconds": build_seconds,
+            "index_bytes": size,
+            "vector_bytes_float32": int(vectors.nbytes),
+            # Against the float32 flat index and exact search
+            "memory_saved": 1.0 - size / float32_bytes,
+            f"recall_at_{args.k}": recall,
+            "recall_lost": 1.0 - recall,
+            "latency": {
+                str(batch_size): measure_latency(search, queries, batch_size, args.repeats)
+                for batch_size in args.batch_sizes
+            },
+        }
+        print(
+            f"{label:>26}: recall@{args.k}={recall:.3f} "
+            f"build={build_seconds:.2f}s size={size / 2**20:.1f}MiB "
+            f"saved={entry['memory_saved']:.0%} "
+            f"p50(b=1)={entry['latency'][str(args.batch_sizes[0])]['p50_ms']:.3f}ms"
+        )
+        results.append(entry)
+
+    return {
+        "benchmark": "index",
+        "meta": run_metadata(),
+        "catalog": {
+            "source": args.csv or "synthetic",
+            "rows": n,
+            "dimension": dimension,
+            "scale": args.scale if args.csv else None,
+        },
+        "k": args.k,
+        "queries": len(queries),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--synthetic", type=int, default=100_000, help="Synthetic catalog size")
+    source.add_argument("--csv", nargs="?", const=DEFAULT_CSV, help="Encode a CSV catalog")
+    parser.add_argument("--scale", type=int, default=1, help="Jittered copies of the CSV catalog")
+    parser.add_argument("--limit", type=int, help="Read at most this many CSV rows")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--train-sample", type=int, default=100_000)
+    parser.add_argument("--configs", nargs="+", help="Only run these configuration labels")
+    parser.add_argument("-o", "--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    write_output(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""Drive the recommendation endpoints over HTTP and report throughput and
+latency percentiles.
+
+Load is either closed-loop, where ``--concurrency`` workers each send their
+next request as soon as the previous one answers, or open-loop, where
+requests start at ``--rate`` per second whether or not earlier ones have
+answered. Open-loop latency is measured from each request's scheduled start,
+so a server that falls behind shows it in the percentiles rather than
+quietly slowing the senders down. Requests that would exceed
+``--max-in-flight`` are counted as dropped.
+
+With ``--spawn`` the script starts the server itself: it optionally seeds
+``--seed-count`` synthetic products (benchmarks.generate_catalog), builds
+the index into a fresh ``--index-dir``, and records the time until /ready
+answers plus the startup breakdown the server logs, index build included.
+Otherwise it loads a server already running at ``--url``.
+
+Every run can be appended as one JSON line to ``--history``, so startup,
+index build and serving latency can be compared across revisions.
+
+Examples:
+  python -m benchmarks.load_test --url http://localhost:5000 --concurrency 8 --duration 30
+  python -m benchmarks.load_test --spawn --database-url sqlite:///data/scale.db \\
+      --seed-count 100000 --rate 50 --duration 60 --history bench/load_history.jsonl
+  python -m benchmarks.load_test --spawn --server uvicorn --database-url sqlite:///data/scale.db \\
+      --endpoint similar --concurrency 16
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from benchmarks.common import percentiles, run_metadata, write_output
+from benchmarks.generate_catalog import sample_queries, seed_catalog
+
+ENDPOINTS = ("search", "similar", "batch")
+SERVERS = ("flask", "uvicorn")
+
+
+class Client:
+    """One keep-alive connection per thread; http.client reconnects when
+    the server closes it."""
+
+    def __init__(self, url: str, headers: Dict[str, str], timeout: float):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.prefix = parsed.path.rstrip("/")
+        self.headers = headers
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> int:
+        """Send one request, read the whole body, return the status (0 on a
+        connection error or timeout)."""
+        headers = dict(self.headers)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        connection = self._connection()
+        try:
+            connection.request(method, self.prefix + path, payload, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            return 0
+
+
+class RequestMaker:
+    """Builds the next request for ``endpoint`` from a fixed pool of
+    queries or product ids."""
+
+    def __init__(self, endpoint: str, top_k: int, batch_size: int, max_product_id: int, seed: int):
+        self.endpoint = endpoint
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.max_product_id = max_product_id
+        self.queries = sample_queries(1000, seed)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next(self) -> Tuple[str, str, Optional[Dict]]:
+        with self._lock:
+            if self.endpoint == "similar":
+                product_id = self._rng.randint(1, self.max_product_id)
+                return "GET", f"/products/{product_id}/similar?top_k={self.top_k}", None
+            if self.endpoint == "batch":
+                items = [
+                    {"query": self._rng.choice(self.queries), "top_k": self.top_k}
+                    for _ in range(self.batch_size)
+                ]
+                return "POST", "/products/batch", {"queries": items}
+            return "POST", "/products/", {"query": self._rng.choice(self.queries), "top_k": self.top_k}
+
+
+class Recorder:
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def record(self, scheduled: float, status: int) -> None:
+        finished = time.perf_counter()
+        if scheduled < self.measure_from:
+            return  # warm-up
+        with self._lock:
+            self.statuses[status] += 1
+            if 200 <= status < 300:
+                self.latencies.append(finished - scheduled)
+
+    def drop(self, scheduled: float) -> None:
+        if scheduled >= self.measure_from:
+            with self._lock:
+                self.dropped += 1
+
+
+def closed_loop(client, maker, recorder, concurrency: int, stop_at: float) -> None:
+    def worker():
+        while time.perf_counter() < stop_at:
+            method, path, body = maker.next()
+            started = time.perf_counter()
+            recorder.record(started, client.request(method, path, body))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def open_loop(client, maker, recorder, rate: float, max_in_flight: int, poisson: bool, stop_at: float) -> None:
+    rng = random.Random(1)
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def send(scheduled, method, path, body):
+        try:
+            recorder.record(scheduled, client.request(method, path, body))
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        scheduled = time.perf_counter()
+        while scheduled < stop_at:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if in_flight.acquire(blocking=False):
+                executor.submit(send, scheduled, *maker.next())
+            else:
+                recorder.drop(scheduled)
+            scheduled += rng.expovariate(rate) if poisson else 1.0 / rate
+
+
+class SpawnedServer:
+    """The app in a child process, with its log captured for the startup
+    breakdown."""
+
+    def __init__(self, server: str, port: int, env: Dict[str, str]):
+        if server == "uvicorn":
+            command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)]
+        else:
+            command = [
+                sys.executable, "-m", "flask", "--app", "app:create_app",
+                "run", "--port", str(port), "--with-threads",
+            ]
+        self.url = f"http://127.0.0.1:{port}"
+        # The tail for error reports; request logs would grow without bound
+        self.log: Deque[str] = deque(maxlen=200)
+        self.timings_line: Optional[str] = None
+        self.started = time.perf_counter()
+        self.process = subprocess.Popen(
+            command,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
+        # Drained continuously so a chatty server never blocks on a full pipe
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self) -> None:
+        for line in self.process.stdout:
+            if "Startup timings:" in line:
+                self.timings_line = line
+            self.log.append(line.rstrip("\n"))
+
+    def wait_until_ready(self, timeout: float) -> float:
+        """Seconds from process start until /ready answers 200."""
+        client = Client(self.url, {}, timeout=2)
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if self.process.poll() is not None:
+                break
+            if client.request("GET", "/ready") == 200:
+                return time.perf_counter() - self.started
+            time.sleep(0.1)
+        print("\n".join(self.log[-40:]))
+        raise SystemExit("Server exited or did not become ready; its log tail is above")
+
+    def startup_timings(self, timeout: float = 10) -> Dict[str, float]:
+        """Phases from the server's "Startup timings:" log line."""
+        deadline = time.perf_counter() + timeout
+        while self.timings_line is None and time.perf_counter() < deadline:
+            time.sleep(0.1)
+        if self.timings_line is None:
+            return {}
+        return {
+            phase: float(seconds)
+            for phase, seconds in re.findall(r"(\w+)=([\d.]+)s", self.timings_line)
+        }
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def spawn(args) -> Tuple[SpawnedServer, Dict]:
+    setup: Dict = {"server": args.server}
+    if args.seed_count:
+        setup["seed"] = seed_catalog(
+            args.database_url, args.seed_count, seed=args.seed, replace=args.replace
+        )
+        print(f"Seeded {args.seed_count} products in {setup['seed']['seconds']:.1f}s")
+
+    index_dir = args.index_dir or tempfile.mkdtemp(prefix="load-test-index-")
+    if args.fresh_index and os.path.isdir(index_dir):
+        shutil.rmtree(index_dir)
+    env = dict(
+        os.environ, DATABASE_URL=args.database_url, INDEX_DIR=index_dir, PYTHONUNBUFFERED="1"
+    )
+    if args.fresh_index:
+        # Nothing to load and no cached embeddings: startup times a full build
+        env["EMBEDDING_CACHE_ENABLED"] = "false"
+    server = SpawnedServer(args.server, args.port, env)
+    setup["time_to_ready_s"] = server.wait_until_ready(args.ready_timeout)
+    setup["startup_timings"] = server.startup_timings()
+    setup["index_dir"] = index_dir
+    print(
+        f"Ready after {setup['time_to_ready_s']:.1f}s: "
+        + " ".join(f"{phase}={seconds:.2f}s" for phase, seconds in setup["startup_timings"].items())
+    )
+    return server, setup
+
+
+def run_load(args, url: str) -> Dict:
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+    client = Client(url, headers, args.timeout)
+    maker = RequestMaker(args.endpoint, args.top_k, args.batch_size, args.max_product_id, args.seed)
+
+    began = time.perf_counter()
+    recorder = Recorder(began + args.warmup)
+    stop_at = began + args.warmup + args.duration
+    if args.rate:
+        open_loop(client, maker, recorder, args.rate, args.max_in_flight, args.poisson, stop_at)
+    else:
+        closed_loop(client, maker, recorder, args.concurrency, stop_at)
+    # Requests still answering after stop_at count, so measure to the last one
+    measured = time.perf_counter() - recorder.measure_from
+
+    ok = len(recorder.latencies)
+    sent = sum(recorder.statuses.values())
+    result = {
+        "url": url,
+        "endpoint": args.endpoint,
+        "top_k": args.top_k,
+        "mode": "open" if args.rate else "closed",
+        "concurrency": None if args.rate else args.concurrency,
+        "target_rate": args.rate,
+        "duration_s": measured,
+        "requests": sent,
+        "ok": ok,
+        "errors": sent - ok,
+        "dropped": recorder.dropped,
+        "statuses": {str(status): count for status, count in sorted(recorder.statuses.items())},
+        "throughput_rps": ok / measured if measured else 0.0,
+        "latency": {**percentiles(recorder.latencies), "max_ms": max(recorder.latencies) * 1000.0}
+        if ok
+        else None,
+    }
+    latency = result["latency"] or {}
+    print(
+        f"{args.endpoint} {result['mode']}-loop: {ok}/{sent} ok, {recorder.dropped} dropped, "
+        f"{result['throughput_rps']:.1f} req/s, p50={latency.get('p50_ms', 0):.1f}ms "
+        f"p95={latency.get('p95_ms', 0):.1f}ms p99={latency.get('p99_ms', 0):.1f}ms"
+    )
+    return result
+
+
+def append_history(path: str, result: Dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result, sort_keys=True) + "\n")
+    print(f"Appended run to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="Server to load")
+    parser.add_argument("--api-key", default=None, help="Sent as X-API-Key")
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="search")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=8, help="Queries per batch request")
+    parser.add_argument("--max-product-id", type=int, default=None,
+                        help="Similar endpoint: ids drawn from 1..N (default: --seed-count or 100)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop workers")
+    parser.add_argument("--rate", type=float, default=0, help="Open-loop requests/s (0 = closed loop)")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds first")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout")
+    parser.add_argument("--seed", type=int, default=0)
+
+    spawn_group = parser.add_argument_group("spawned server")
+    spawn_group.add_argument("--spawn", action="store_true", help="Start the server and time its startup")
+    spawn_group.add_argument("--server", choices=SERVERS, default="flask")
+    spawn_group.add_argument("--port", type=int, default=5099)
+    spawn_group.add_argument("--database-url", help="Required with --spawn")
+    spawn_group.add_argument("--seed-count", type=int, default=0, help="Insert this many products first")
+    spawn_group.add_argument("--replace", action="store_true", help="Empty the products table before seeding")
+    spawn_group.add_argument("--index-dir", help="Defaults to a new temporary directory")
+    spawn_group.add_argument("--fresh-index", action="store_true",
+                             help="Delete --index-dir and skip the embedding cache, timing a full build")
+    spawn_group.add_argument("--ready-timeout", type=float, default=3600)
+
+    parser.add_argument("-o", "--output", help="Write JSON results here instead of stdout")
+    parser.add_argument("--history", help="Append this run as one JSON line to this file")
+    args = parser.parse_args()
+    if args.max_product_id is None:
+        args.max_product_id = args.seed_count or 100
+
+    result = {"benchmark": "load_test", "meta": run_metadata()}
+    server = None
+    if args.spawn:
+        if not args.database_url:
+            parser.error("--spawn needs --database-url")
+        server, result["startup"] = spawn(args)
+    try:
+        result["load"] = run_load(args, server.url if server else args.url)
+    finally:
+        if server is not None:
+            server.stop()
+
+    write_output(result, args.output)
+    if args.history:
+        append_history(args.history, result)
+
+
+if __name__ == "__main__":
+    main()
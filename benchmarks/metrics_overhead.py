@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Measure what the /metrics instrumentation adds to a search request.
+
+Times one histogram observation (bare and through the ``time()`` context
+manager used around each stage) and multiplies it by the observations a
+search request makes. Compares the total with the p50 latency of a flat
+index search over a synthetic catalog, the cheapest stage a request always
+runs. Also reports how long rendering /metrics takes, which is paid per
+scrape rather than per request.
+
+Examples:
+  python -m benchmarks.metrics_overhead
+  python -m benchmarks.metrics_overhead --synthetic 100000 -o bench/metrics.json
+"""
+import argparse
+import time
+from typing import Dict
+
+import numpy as np
+
+from benchmarks.common import percentiles, run_metadata, synthetic_vectors, write_output
+
+from app.core.metrics import REGISTRY, stage  # noqa: E402
+from app.embeddings.index_factory import IndexSpec, build_index  # noqa: E402
+
+# encode, index_search, hydrate, dump, serialize and the request itself
+OBSERVATIONS_PER_REQUEST = 6
+
+
+def per_call_ns(fn, calls: int) -> float:
+    began = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - began) / calls * 1e9
+
+
+def run(args) -> Dict:
+    series = stage("benchmark")
+
+    def timed():
+        with series.time():
+            pass
+
+    observe_ns = per_call_ns(lambda: series.observe(0.001), args.calls)
+    timer_ns = per_call_ns(timed, args.calls)
+    baseline_ns = per_call_ns(lambda: None, args.calls)
+    request_overhead_us = OBSERVATIONS_PER_REQUEST * (timer_ns - baseline_ns) / 1000.0
+
+    vectors = synthetic_vectors(args.synthetic, args.dimension)
+    index = build_index(vectors, np.arange(len(vectors)), IndexSpec("flat"))
+    queries = vectors[: args.queries]
+    samples = []
+    for row in range(len(queries)):
+        began = time.perf_counter()
+        index.search(queries[row : row + 1], 10)
+        samples.append(time.perf_counter() - began)
+    search = percentiles(samples)
+
+    render_samples = []
+    for _ in range(50):
+        began = time.perf_counter()
+        REGISTRY.render()
+        render_samples.append(time.perf_counter() - began)
+
+    result = {
+        "observe_ns": observe_ns - baseline_ns,
+        "timed_block_ns": timer_ns - baseline_ns,
+        "observations_per_request": OBSERVATIONS_PER_REQUEST,
+        "request_overhead_us": request_overhead_us,
+        "flat_search": {"rows": len(vectors), "dimension": args.dimension, **search},
+        "overhead_vs_search_p50": request_overhead_us / (search["p50_ms"] * 1000.0),
+        "render": percentiles(render_samples),
+    }
+    print(
+        f"observe={result['observe_ns']:.0f}ns timed block={result['timed_block_ns']:.0f}ns "
+        f"per request={request_overhead_us:.2f}us "
+        f"({result['overhead_vs_search_p50']:.2%} of a {search['p50_ms']:.3f}ms flat search); "
+        f"render p50={result['render']['p50_ms']:.3f}ms"
+    )
+    return {"benchmark": "metrics_overhead", "meta": run_metadata(), **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--synthetic", type=int, default=50_000, help="Synthetic catalog size")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-o", "--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    write_output(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Per-worker memory of a search index shared by forked worker processes.
+
+Publishes a synthetic catalog with app.embeddings.index_store, then forks
+``--workers`` processes that each search it and hydrate the hits, and reads
+their Rss, Pss (shared pages split between the processes mapping them) and
+private memory from /proc/self/smaps_rollup while all of them are alive.
+Modes:
+
+  private  every worker loads its own heap copy (no sharing, the old default)
+  preload  the parent loads a heap copy before forking (copy-on-write,
+           gunicorn --preload)
+  mmap     every worker maps the published release read-only
+           (INDEX_READ_ONLY=true)
+
+The "index_" figures subtract a baseline run of workers that load nothing,
+leaving the memory the index itself costs. Linux only. The
+sentence-transformers model is not loaded and not counted.
+
+Examples:
+  python -m benchmarks.prefork_memory --synthetic 200000 --workers 4
+  python -m benchmarks.prefork_memory --synthetic 200000 --index-type hnsw -o bench/prefork.json
+  python -m benchmarks.prefork_memory --synthetic 200000 --storage sq8 --modes mmap
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.common import run_metadata, synthetic_vectors, write_output
+
+from app.embeddings import index_store  # noqa: E402
+from app.embeddings.catalog import ProductCatalog, StringColumn  # noqa: E402
+from app.embeddings.index_factory import (  # noqa: E402
+    STORAGE_TYPES,
+    IndexSpec,
+    build_index,
+)
+from app.embeddings.lexical import BM25Index  # noqa: E402
+
+MODES = ("private", "preload", "mmap")
+MODEL_NAME = "synthetic"
+
+
+def synthetic_rows(n: int) -> List[tuple]:
+    return [
+        (
+            pid,
+            f"Product {pid}",
+            f"Synthetic product {pid} with a description long enough to matter",
+            f"Category {pid % 50}",
+            f"tag{pid % 7},tag{pid % 11}",
+            float(pid % 500),
+        )
+        for pid in range(1, n + 1)
+    ]
+
+
+def publish(path: str, n: int, dimension: int, spec: IndexSpec) -> None:
+    vectors = synthetic_vectors(n, dimension)
+    rows = synthetic_rows(n)
+    index = build_index(vectors, np.array([row[0] for row in rows], dtype=np.int64), spec)
+    catalog = ProductCatalog.from_rows(rows, vectors)
+    index_store.save_index(
+        path,
+        index,
+        catalog,
+        index_store.compute_fingerprint(rows, MODEL_NAME),
+        MODEL_NAME,
+        spec.key(),
+        BM25Index.from_catalog(catalog),
+    )
+
+
+def load_private(path: str, spec: IndexSpec):
+    """The published release copied onto the heap, as a worker that built it would hold it."""
+    artifact = index_store.load_index(path, None, MODEL_NAME, spec.key())
+    release = index_store.release_path(path, artifact.release)
+    index, _ = index_store.read_faiss_index(release, mmap=False)
+    mapped = artifact.catalog
+    catalog = ProductCatalog(
+        np.array(mapped.ids),
+        {
+            name: StringColumn(np.array(column.data), np.array(column.offsets))
+            for name, column in mapped.columns.items()
+        },
+        np.array(mapped.embeddings),
+        {name: np.array(values) for name, values in mapped.numeric.items()},
+    )
+    return index, catalog
+
+
+def load_mapped(path: str, spec: IndexSpec):
+    artifact = index_store.load_index(path, None, MODEL_NAME, spec.key())
+    return artifact.index, artifact.catalog
+
+
+def memory_kib() -> Dict[str, int]:
+    fields = {}
+    with open("/proc/self/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def worker(mode, path, spec, preloaded, queries, args, ready, done, results):
+    began = time.perf_counter()
+    if mode == "baseline":
+        ready.wait()
+        results.put({"pid": os.getpid(), "load_seconds": 0.0, **memory_kib()})
+        done.wait()
+        return
+    if mode == "preload":
+        index, catalog = preloaded
+    elif mode == "private":
+        index, catalog = load_private(path, spec)
+    else:
+        index, catalog = load_mapped(path, spec)
+    load_seconds = time.perf_counter() - began
+
+    # Serve traffic so the pages a worker really touches are resident
+    _, ids = index.search(queries, args.k)
+    for row in ids:
+        catalog.records([int(pid) for pid in row if pid >= 0])
+    if args.touch_embeddings:
+        # Touch every vector, as a neighbor build would
+        float(np.asarray(catalog.embeddings).sum())
+
+    ready.wait()
+    results.put({"pid": os.getpid(), "load_seconds": load_seconds, **memory_kib()})
+    done.wait()
+
+
+def run_mode(mode, path, spec, args, queries, baseline=None) -> Dict:
+    context = multiprocessing.get_context("fork")
+    preloaded = load_private(path, spec) if mode == "preload" else None
+    ready = context.Barrier(args.workers + 1)
+    done = context.Barrier(args.workers + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=worker,
+            args=(mode, path, spec, preloaded, queries, args, ready, done, results),
+        )
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    ready.wait()
+    workers = [results.get() for _ in processes]
+    done.wait()
+    for process in processes:
+        process.join()
+
+    mib = lambda kib: round(kib / 1024.0, 1)  # noqa: E731
+    summary = {
+        "mode": mode,
+        "workers": workers,
+        "per_worker_pss_mib": mib(np.mean([w["pss"] for w in workers])),
+        "per_worker_private_mib": mib(np.mean([w["private"] for w in workers])),
+        "per_worker_rss_mib": mib(np.mean([w["rss"] for w in workers])),
+        "total_pss_mib": mib(sum(w["pss"] for w in workers)),
+        "load_seconds_p50": float(np.median([w["load_seconds"] for w in workers])),
+    }
+    if baseline is None:
+        return summary
+    for field in ("pss", "private", "rss"):
+        summary[f"index_{field}_mib"] = round(
+            summary[f"per_worker_{field}_mib"] - baseline[f"per_worker_{field}_mib"], 1
+        )
+    print(
+        f"{mode:>8}: index per worker pss={summary['index_pss_mib']}MiB "
+        f"private={summary['index_private_mib']}MiB "
+        f"rss={summary['index_rss_mib']}MiB "
+        f"(process pss={summary['per_worker_pss_mib']}MiB), "
+        f"load={summary['load_seconds_p50'] * 1000:.0f}ms"
+    )
+    return summary
+
+
+def run(args) -> Dict:
+    path = tempfile.mkdtemp(prefix="prefork-index-")
+    try:
+        spec = IndexSpec(args.index_type, storage=args.storage, pca_dim=args.pca_dim)
+        publish(path, args.synthetic, args.dimension, spec)
+        release = index_store.release_path(path, index_store.current_release(path))
+        release_bytes = sum(
+            os.path.getsize(os.path.join(release, name)) for name in os.listdir(release)
+        )
+        print(
+            f"Published {args.synthetic} products ({args.index_type}, {args.storage}), "
+            f"{release_bytes / 2**20:.1f}MiB on disk; {args.workers} workers"
+        )
+        queries = synthetic_vectors(args.queries, args.dimension, seed=1)
+        baseline = run_mode("baseline", path, spec, args, queries)
+        results = [
+            run_mode(mode, path, spec, args, queries, baseline) for mode in args.modes
+        ]
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    return {
+        "benchmark": "prefork_memory",
+        "meta": run_metadata(),
+        "catalog": {
+            "rows": args.synthetic,
+            "dimension": args.dimension,
+            "index_type": args.index_type,
+            "storage": args.storage,
+            "pca_dim": args.pca_dim,
+            "release_bytes": release_bytes,
+        },
+        "workers": args.workers,
+        "baseline": baseline,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--synthetic", type=int, default=100_000, help="Synthetic catalog size")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--storage", choices=STORAGE_TYPES, default="float32")
+    parser.add_argument("--pca-dim", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument(
+        "--touch-embeddings",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Read every full-precision vector in each worker (off: only the index is searched)",
+    )
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("-o", "--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    write_output(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
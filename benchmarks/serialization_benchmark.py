@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Measure the cost of serializing search responses.
+
+Compares the response path ProductList.post used to have (json.dumps with a
+custom encoder calling ``.dict()``, whose string Flask-RESTX then encoded a
+second time) with the current one (one pydantic bulk dump encoded once with
+orjson), plus field projection and NDJSON output. Reports per-response
+latency percentiles and body size for several top_k values, as JSON.
+
+Products are built from the demo CSV catalog, so field lengths are realistic.
+
+Examples:
+  python -m benchmarks.serialization_benchmark
+  python -m benchmarks.serialization_benchmark --top-k 10 100 1000 -o bench/serialization.json
+"""
+import argparse
+import csv
+import json
+import time
+import warnings
+from typing import Callable, Dict, List
+
+from benchmarks.common import DEFAULT_CSV, percentiles, run_metadata, write_output
+
+from app.api.serialization import dump_products, dumps, ndjson_lines  # noqa: E402
+from app.schemas.product import ProductSchema  # noqa: E402
+
+
+class LegacyJSONEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, ProductSchema):
+            return obj.dict()
+        return super().default(obj)
+
+
+def legacy(products: List[ProductSchema]) -> bytes:
+    body = json.dumps(products, cls=LegacyJSONEncoder)
+    # Flask-RESTX's json representation then encoded the returned string again
+    return (json.dumps(body) + "\n").encode("utf-8")
+
+
+def load_products(path: str, count: int) -> List[ProductSchema]:
+    """``count`` products; the catalog repeats, with fresh ids, when it is smaller."""
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            rows.append(row)
+            if len(rows) >= count:
+                break
+    products = []
+    for product_id in range(count):
+        row = rows[product_id % len(rows)]
+        products.append(
+            ProductSchema(
+                id=product_id,
+                name=row["title"],
+                description=row["description"],
+                category=row["Gender"],
+                tags=",".join(filter(None, [row["ProductBrand"], row["PrimaryColor"]])),
+                price=float(row["Price (INR)"]) if row["Price (INR)"] else None,
+            )
+        )
+    return products
+
+
+def measure(serialize: Callable[[], bytes], repeats: int) -> Dict:
+    samples = []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        body = serialize()
+        samples.append(time.perf_counter() - began)
+    return {**percentiles(samples), "bytes": len(body)}
+
+
+def run(args) -> Dict:
+    catalog = load_products(args.csv, max(args.top_k))
+    print(f"Serializing up to {len(catalog)} products built from {args.csv}")
+    fields = set(args.fields.split(","))
+
+    results = []
+    for top_k in args.top_k:
+        products = catalog[:top_k]
+        paths = {
+            "before": lambda: legacy(products),
+            "after": lambda: dumps(dump_products(products)),
+            f"after_fields_{args.fields}": lambda: dumps(dump_products(products, fields)),
+            "after_ndjson": lambda: b"".join(ndjson_lines(dump_products(products))),
+        }
+        entry = {"top_k": len(products), "paths": {}}
+        for label, serialize in paths.items():
+            entry["paths"][label] = measure(serialize, args.repeats)
+        before = entry["paths"]["before"]["p50_ms"]
+        entry["speedup_p50"] = before / entry["paths"]["after"]["p50_ms"]
+        print(
+            f"top_k={len(products):>5}: "
+            + " ".join(
+                f"{label}={stats['p50_ms']:.3f}ms/{stats['bytes'] / 1024:.1f}KiB"
+                for label, stats in entry["paths"].items()
+            )
+        )
+        results.append(entry)
+
+    return {
+        "benchmark": "serialization",
+        "meta": run_metadata(),
+        "catalog": args.csv,
+        "repeats": args.repeats,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 50, 500, 5000])
+    parser.add_argument("--fields", default="id,name", help="Projection to measure")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("-o", "--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    # .dict() is deprecated in pydantic 2; the legacy path still measures it
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    write_output(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import os
+
 import streamlit as st
 import pandas as pd
 import numpy as np
@@ -9,11 +11,30 @@ from PIL import Image
 # Load the SentenceTransformer model
 model = SentenceTransformer("all-MiniLM-L6-v2")
 
-# Load product data from CSV (replace 'products.csv' with your file)
+def load_products(data_dir="demo/data"):
+    """Processed products, preferring the columnar outputs of data_processor.py.
+
+    products.arrow is memory-mapped, so its columns are paged in from the
+    file instead of being copied into memory; products.parquet is read with
+    memory mapping; products.csv is parsed as before. The columnar formats
+    need pyarrow, which is only imported when one of them is present.
+    """
+    arrow_path = os.path.join(data_dir, "products.arrow")
+    if os.path.exists(arrow_path):
+        import pyarrow as pa
+
+        with pa.memory_map(arrow_path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    parquet_path = os.path.join(data_dir, "products.parquet")
+    if os.path.exists(parquet_path):
+        return pd.read_parquet(parquet_path, memory_map=True)
+    return pd.read_csv(os.path.join(data_dir, "products.csv"))
+
+
+# Load product data (replace demo/data/products.* with your file)
 try:
-    df = pd.read_csv(
-        "demo/data/products.csv"
-    )  # Assumes columns: product_id, description, title, image_path
+    df = load_products()  # Assumes columns: product_id, description, title, image_path
     # Check if 'image_path' column exists, if not, create a dummy one
     if "image_path" not in df.columns:
         df["image_path"] = ""  # Or a default image path if you have one
@@ -6,7 +6,7 @@ from pathlib import Path
 import numpy as np
 import argparse
 import sys
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator
 import logging
 from rich.console import Console
 from rich.progress import track
@@ -117,6 +117,74 @@ class ImageGenerator:
         return None
 
 
+OUTPUT_FORMATS = ("csv", "parquet", "arrow")
+# Currency symbols and codes stripped from price strings
+PRICE_NOISE = r"[,$₹]|INR"
+
+
+def clean_text(values: pd.Series, default: str) -> pd.Series:
+    """Missing values replaced by ``default``, newlines by spaces, stripped."""
+    return (
+        values.fillna(default)
+        .astype(str)
+        .str.replace("\n", " ", regex=False)
+        .str.strip()
+    )
+
+
+def parse_prices(values: pd.Series) -> pd.Series:
+    """Prices as floats: separators and currency marks removed, blank as 0.0."""
+    if pd.api.types.is_numeric_dtype(values):
+        # Plain numbers in the file; nothing to strip
+        return values.astype("float64")
+    text = values.astype(str).str.replace(PRICE_NOISE, "", regex=True).str.strip()
+    return pd.to_numeric(text.mask(text == "", "0"), errors="raise").astype("float64")
+
+
+class ChunkWriter:
+    """Writes DataFrames with one schema to a single CSV, Parquet or Arrow
+    file as they arrive.
+
+    Parquet gets one row group per chunk. Arrow is the uncompressed IPC file
+    format, which readers can memory-map instead of loading into the heap.
+    Both need pyarrow.
+    """
+
+    def __init__(self, path: str, output_format: str):
+        self.path = path
+        self.output_format = output_format
+        self._writer = None
+        self._started = False
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.output_format == "csv":
+            df.to_csv(
+                self.path,
+                mode="a" if self._started else "w",
+                header=not self._started,
+                index=False,
+            )
+            self._started = True
+            return
+
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            if self.output_format == "parquet":
+                import pyarrow.parquet as pq
+
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                self._writer = pa.ipc.new_file(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
 class ProductDataProcessor:
     def __init__(
         self,
@@ -126,14 +194,22 @@ class ProductDataProcessor:
         verbose: bool = False,
         generate_images: bool = False,
         max_rows: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        output_format: str = "csv",
     ):
         """Initialize the data processor."""
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"output_format must be one of {', '.join(OUTPUT_FORMATS)}")
         self.input_file = input_file
         self.output_dir = output_dir
         self.currency = currency.upper()
         self.verbose = verbose
         self.generate_images = generate_images
         self.max_rows = max_rows
+        self.chunk_size = chunk_size
+        self.output_format = output_format
+        # Messages already logged, so chunked runs report each note once
+        self._notes = set()
         self.required_columns = {
             "product_id": "int",
             "title": "str",
@@ -153,48 +229,47 @@ class ProductDataProcessor:
         if self.verbose or level != "debug":
             getattr(logger, level)(message)
 
-    def validate_and_clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Validate and clean the input dataframe."""
+    def note(self, message: str) -> None:
+        """Log ``message`` the first time only."""
+        if message not in self._notes:
+            self._notes.add(message)
+            self.log(message)
+
+    def validate_and_clean_data(self, df: pd.DataFrame, first_id: int = 1) -> pd.DataFrame:
+        """Validate and clean the input dataframe.
+
+        ``first_id`` numbers the rows when the input has no product ids, so
+        consecutive chunks get consecutive ids.
+        """
         # Apply row limit if specified
-        if self.max_rows is not None:
+        if self.max_rows is not None and len(df) > self.max_rows:
             df = df.head(self.max_rows)
             self.log(f"Limited dataset to {self.max_rows} rows")
 
         total_rows = len(df)
-        self.log(f"Starting data validation and cleaning for {total_rows} records...")
+        self.log(f"Starting data validation and cleaning for {total_rows} records...", "debug")
 
         # Create product_id if not present
         if "product_id" not in df.columns:
-            df["product_id"] = range(1, total_rows + 1)
-            self.log("Generated new product IDs")
+            df["product_id"] = np.arange(first_id, first_id + total_rows)
+            self.note("Generated new product IDs")
 
-        # Process each required column
-        for col in track(self.required_columns, description="Processing columns"):
+        for col in self.required_columns:
             if col not in df.columns:
                 if col == "image_path":
                     df[col] = ""
-                    self.log("Added empty image_path column")
+                    self.note("Added empty image_path column")
                 elif col == "price":
                     df[col] = np.random.uniform(10, 100, total_rows).round(2)
-                    self.log("Generated random prices")
+                    self.note("Generated random prices")
                 else:
                     raise ValueError(f"Missing required column: {col}")
 
-        # Clean text fields
-        df["description"] = (
-            df["description"]
-            .fillna("")
-            .astype(str)
-            .apply(lambda x: x.replace("\n", " ").strip())
-        )
-        df["title"] = (
-            df["title"]
-            .fillna("Untitled Product")
-            .astype(str)
-            .apply(lambda x: x.replace("\n", " ").strip())
-        )
+        # Clean text fields with vectorized string ops
+        df["description"] = clean_text(df["description"], "")
+        df["title"] = clean_text(df["title"], "Untitled Product")
 
-        self.log("Text cleaning completed")
+        self.log("Text cleaning completed", "debug")
         return df
 
     def process_price(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -208,29 +283,15 @@ class ProductDataProcessor:
 
         if found_price_col:
             # Convert price to float
-            df[found_price_col] = (
-                df[found_price_col]
-                .astype(str)
-                .apply(
-                    lambda x: float(
-                        x.replace(",", "")
-                        .replace("$", "")
-                        .replace("₹", "")
-                        .replace("INR", "")
-                        .strip()
-                    )
-                    if x.strip()
-                    else 0.0
-                )
-            )
+            df[found_price_col] = parse_prices(df[found_price_col])
 
             # Handle currency conversion
             if "INR" in found_price_col and self.currency == "USD":
                 df[found_price_col] = (df[found_price_col] * 0.012).round(2)
-                self.log("Converted prices from INR to USD")
+                self.note("Converted prices from INR to USD")
             elif "INR" not in found_price_col and self.currency == "INR":
                 df[found_price_col] = (df[found_price_col] * 83.0).round(2)
-                self.log("Converted prices from USD to INR")
+                self.note("Converted prices from USD to INR")
 
             # Rename to standardized 'price' column
             if found_price_col != "price":
@@ -238,60 +299,119 @@ class ProductDataProcessor:
                 df = df.drop(columns=[found_price_col])
         else:
             df["price"] = np.random.uniform(10, 100, len(df)).round(2)
-            self.log("Generated random prices")
+            self.note("Generated random prices")
 
         return df
 
     def get_stats(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Generate statistics about the processed data."""
+        return self.format_stats(self.partial_stats(df))
+
+    def partial_stats(self, df: pd.DataFrame) -> Dict[str, float]:
+        """Counts and price extremes of one chunk, combined with ``merge_stats``."""
+        prices = df["price"]
         return {
             "total_products": len(df),
-            "price_range": f"{df['price'].min():.2f} - {df['price'].max():.2f} {self.currency}",
-            "avg_price": f"{df['price'].mean():.2f} {self.currency}",
+            "price_min": prices.min(),
+            "price_max": prices.max(),
+            "price_sum": prices.sum(),
+            "price_count": prices.count(),
             "missing_descriptions": df["description"].isna().sum(),
             "missing_titles": df["title"].isna().sum(),
             "has_images": (df["image_path"] != "").sum(),
         }
 
+    @staticmethod
+    def merge_stats(total: Optional[Dict[str, float]], part: Dict[str, float]) -> Dict[str, float]:
+        if total is None:
+            return part
+        merged = {key: total[key] + part[key] for key in total}
+        merged["price_min"] = np.nanmin([total["price_min"], part["price_min"]])
+        merged["price_max"] = np.nanmax([total["price_max"], part["price_max"]])
+        return merged
+
+    def format_stats(self, stats: Dict[str, float]) -> Dict[str, Any]:
+        average = stats["price_sum"] / stats["price_count"] if stats["price_count"] else float("nan")
+        return {
+            "total_products": stats["total_products"],
+            "price_range": f"{stats['price_min']:.2f} - {stats['price_max']:.2f} {self.currency}",
+            "avg_price": f"{average:.2f} {self.currency}",
+            "missing_descriptions": stats["missing_descriptions"],
+            "missing_titles": stats["missing_titles"],
+            "has_images": stats["has_images"],
+        }
+
+    def generate_missing_images(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Generate images for the rows of ``df`` without one."""
+        missing_images = df["image_path"].isna() | (df["image_path"] == "")
+
+        for idx in track(df[missing_images].index, description="Generating images"):
+            title = df.loc[idx, "title"]
+            description = df.loc[idx, "description"]
+
+            image_path = self.image_generator.generate_image(title, description)
+            if image_path:
+                df.loc[idx, "image_path"] = image_path
+        return df
+
+    def finalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """The output columns with fixed types, so every chunk has the same schema."""
+        df = df[list(self.required_columns)]
+        df = df.assign(
+            product_id=df["product_id"].astype("int64"),
+            title=df["title"].astype(str),
+            description=df["description"].astype(str),
+            price=df["price"].astype("float64"),
+            image_path=df["image_path"].fillna("").astype(str),
+        )
+        return df
+
+    def read_chunks(self) -> Iterator[pd.DataFrame]:
+        """The input file, whole or in ``chunk_size`` row chunks."""
+        options = {"nrows": self.max_rows}
+        if self.max_rows is not None:
+            self.log(f"Limited dataset to {self.max_rows} rows")
+        if self.chunk_size:
+            yield from pd.read_csv(self.input_file, chunksize=self.chunk_size, **options)
+        else:
+            yield pd.read_csv(self.input_file, **options)
+
     def process(self) -> Optional[str]:
         """Process the input file and save the processed data."""
         try:
             os.makedirs(self.output_dir, exist_ok=True)
 
             self.log(f"Reading input file: {self.input_file}")
-            df = pd.read_csv(self.input_file)
-
-            df = self.validate_and_clean_data(df)
-            df = self.process_price(df)
-
-            # Generate images if requested
             if self.generate_images:
                 self.log("Generating missing product images...")
-                missing_images = df["image_path"].isna() | (df["image_path"] == "")
-
-                for idx in track(
-                    df[missing_images].index, description="Generating images"
-                ):
-                    title = df.loc[idx, "title"]
-                    description = df.loc[idx, "description"]
-
-                    image_path = self.image_generator.generate_image(title, description)
-                    if image_path:
-                        df.loc[idx, "image_path"] = image_path
-
-            final_columns = [
-                "product_id",
-                "title",
-                "description",
-                "price",
-                "image_path",
-            ]
-            df = df[final_columns]
-
-            output_file = os.path.join(self.output_dir, "products.csv")
-            df.to_csv(output_file, index=False)
-
-            stats = self.get_stats(df)
+
+            output_file = os.path.join(self.output_dir, f"products.{self.output_format}")
+            writer = ChunkWriter(output_file, self.output_format)
+            stats = None
+            rows = 0
+            started = time.perf_counter()
+            try:
+                for df in self.read_chunks():
+                    df = self.validate_and_clean_data(df, first_id=rows + 1)
+                    df = self.process_price(df)
+
+                    # Generate images if requested
+                    if self.generate_images:
+                        df = self.generate_missing_images(df)
+
+                    df = self.finalize(df)
+                    writer.write(df)
+                    stats = self.merge_stats(stats, self.partial_stats(df))
+                    rows += len(df)
+                    if self.chunk_size:
+                        elapsed = time.perf_counter() - started
+                        self.log(f"Processed {rows} rows ({rows / elapsed:.0f} rows/s)")
+            finally:
+                writer.close()
+
+            if stats is None:
+                raise ValueError("Input file has no rows")
+            stats = self.format_stats(stats)
             console.print("\n[bold green]Processing completed successfully![/]")
             console.print("\n[bold]Dataset Statistics:[/]")
             for key, value in stats.items():
@@ -315,6 +435,8 @@ Examples:
   %(prog)s input.csv -v --generate-images             Process with image generation
   %(prog)s input.csv --generate-images --skip-exists  Generate only missing images
   %(prog)s input.csv --max-rows 100                   Process only the first 100 rows
+  %(prog)s input.csv --chunk-size 50000 --output-format arrow
+                                                      Stream a large feed to products.arrow
         """,
     )
 
@@ -349,6 +471,17 @@ Examples:
         type=int,
         help="Maximum number of rows to process (default: process all rows)",
     )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Process the file this many rows at a time (default: all at once)",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="csv",
+        help="products.csv, products.parquet or products.arrow (default: csv)",
+    )
 
     args = parser.parse_args()
 
@@ -369,6 +502,8 @@ Examples:
         verbose=args.verbose,
         generate_images=args.generate_images,
         max_rows=args.max_rows,
+        chunk_size=args.chunk_size,
+        output_format=args.output_format,
     )
 
     with console.status("[bold green]Processing data...") as _:
@@ -0,0 +1,62 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+
+# Settings are read once at import, so point everything at a scratch
+# directory before any app module loads
+_DATA_DIR = tempfile.mkdtemp(prefix="airecapi-tests-")
+API_KEY = "test-key"
+os.environ.update(
+    API_KEYS=f'["{API_KEY}"]',
+    DATABASE_URL=f"sqlite:///{os.path.join(_DATA_DIR, 'products.db')}",
+    INDEX_DIR=os.path.join(_DATA_DIR, "index"),
+    EMBEDDING_CACHE_PATH=os.path.join(_DATA_DIR, "embedding_cache.sqlite3"),
+    WARMUP_IN_BACKGROUND="false",
+    SHARD_URLS="[]",
+)
+os.environ.pop("SHARD_ID", None)
+
+from app.embeddings.encoders import Encoder  # noqa: E402
+
+
+class HashingEncoder(Encoder):
+    """Bag-of-words vectors from hashed lowercase tokens: texts that share
+    words score higher, with no model to download."""
+
+    backend = "hashing"
+    do_lower_case = True
+
+    def __init__(self, dimension: int = 32):
+        super().__init__("hashing")
+        self._dimension = dimension
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def encode(self, texts, batch_size: int = 32) -> np.ndarray:
+        vectors = np.full((len(texts), self._dimension), 0.01, dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in str(text).lower().split():
+                digest = hashlib.md5(word.encode("utf-8")).digest()
+                vectors[row, int.from_bytes(digest[:4], "little") % self._dimension] += 1.0
+        return vectors
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    from app.embeddings import faiss_service
+
+    faiss_service._encoder = HashingEncoder()
+    yield create_app()
+    shutil.rmtree(_DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
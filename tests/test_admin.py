@@ -0,0 +1,34 @@
+import pytest
+
+from conftest import API_KEY
+
+ADMIN_ROUTES = [
+    ("get", "/admin/search-scheduler"),
+    ("get", "/admin/caches"),
+    ("get", "/admin/index"),
+    ("get", "/admin/shards"),
+    ("post", "/admin/index/rebuild"),
+]
+
+
+@pytest.mark.parametrize("method, path", ADMIN_ROUTES)
+def test_admin_routes_reject_a_missing_or_wrong_key(client, method, path):
+    call = getattr(client, method)
+    assert call(path).status_code == 401
+    assert call(path, headers={"X-API-Key": "wrong"}).status_code == 401
+    assert call(path, query_string={"api_key": "wrong"}).status_code == 401
+
+
+def test_admin_routes_accept_the_key(client):
+    response = client.get("/admin/index", headers={"X-API-Key": API_KEY})
+    assert response.status_code == 200
+    assert response.get_json()["ready"] is True
+
+    response = client.get("/admin/caches", query_string={"api_key": API_KEY})
+    assert response.status_code == 200
+
+
+def test_public_routes_need_no_key(client):
+    response = client.post("/products/", json={"query": "headphones", "top_k": 1})
+    assert response.status_code == 200
+    assert client.get("/metrics").status_code == 200
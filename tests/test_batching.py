@@ -0,0 +1,68 @@
+import pytest
+from flask import current_app, has_app_context
+
+from app.embeddings.batching import SearchBatcher
+
+
+class RecordingSearch:
+    """search_batch stand-in: fails any batch holding "bad" and records
+    the batches it saw and whether they ran inside an app context."""
+
+    def __init__(self):
+        self.batches = []
+        self.app_names = []
+
+    def __call__(self, queries, top_ks):
+        self.batches.append(list(queries))
+        self.app_names.append(current_app.name if has_app_context() else None)
+        if "bad" in queries:
+            raise ValueError("bad query")
+        return [[{"product_id": i, "query": q}] for i, q in enumerate(queries)]
+
+
+@pytest.fixture
+def batcher():
+    created = []
+
+    def make(search, **kwargs):
+        created.append(SearchBatcher(search, max_batch_size=8, max_wait_ms=200, **kwargs))
+        return created[-1]
+
+    yield make
+    for batcher in created:
+        batcher.stop(timeout=1)
+
+
+def test_one_bad_request_fails_alone(batcher):
+    search = RecordingSearch()
+    searcher = batcher(search)
+
+    # Submitted well within max_wait_ms of each other, so they share a batch
+    futures = {query: searcher.submit(query) for query in ("red shoes", "bad", "blue hat")}
+
+    with pytest.raises(ValueError):
+        futures["bad"].result(timeout=5)
+    assert futures["red shoes"].result(timeout=5)[0]["query"] == "red shoes"
+    assert futures["blue hat"].result(timeout=5)[0]["query"] == "blue hat"
+    # The combined batch failed, then each request ran on its own
+    assert search.batches == [["red shoes", "bad", "blue hat"], ["red shoes"], ["bad"], ["blue hat"]]
+
+
+def test_batches_run_inside_the_app_context(app, batcher):
+    search = RecordingSearch()
+    searcher = batcher(search, app=app)
+    searcher.search("red shoes", timeout=5)
+    assert search.app_names == [app.name]
+
+    unbound = RecordingSearch()
+    batcher(unbound).search("red shoes", timeout=5)
+    assert unbound.app_names == [None]
+
+
+def test_batch_metrics_are_exported(client, batcher):
+    batcher(RecordingSearch()).search("red shoes", timeout=5)
+
+    exposition = client.get("/metrics").get_data(as_text=True)
+    assert 'search_batch_size_bucket{le="1.0"}' in exposition
+    assert "search_batch_size_count" in exposition
+    assert "search_batch_queue_depth 0.0" in exposition
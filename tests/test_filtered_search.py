@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from app.embeddings.catalog import ProductCatalog
+from app.embeddings.facets import FacetIndex, IdBitmapSelector, SearchFilters
+from app.embeddings.index_factory import IndexSpec, build_index
+from app.embeddings.snapshot import IndexSnapshot
+
+ROWS = 20_000
+DIMENSION = 32
+TOP_K = 10
+EXACT_LIMIT = 4096
+
+
+def _snapshot(index_type: str) -> IndexSnapshot:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((ROWS, DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = np.arange(1, ROWS + 1, dtype=np.int64)
+    # 1% "rare" and 10% "common" products, scattered over the id range
+    draw = rng.random(ROWS)
+    categories = np.where(draw < 0.01, "rare", np.where(draw < 0.11, "common", "other"))
+    rows = [
+        (int(pid), f"product {pid}", "", str(category), "", 10.0)
+        for pid, category in zip(ids, categories)
+    ]
+    catalog = ProductCatalog.from_rows(rows, vectors)
+    index = build_index(vectors, ids, IndexSpec(index_type=index_type))
+    return IndexSnapshot(index=index, catalog=catalog, facets=FacetIndex.from_catalog(catalog))
+
+
+@pytest.fixture(scope="module", params=["flat", "hnsw", "ivf_flat", "ivf_pq"])
+def snapshot(request):
+    return _snapshot(request.param)
+
+
+@pytest.mark.parametrize(
+    "category, exact_limit",
+    [("rare", EXACT_LIMIT), ("rare", 0), ("common", 0)],
+    ids=["rare-exact", "rare-index", "common-index"],
+)
+def test_selective_filter_returns_top_k(snapshot, category, exact_limit):
+    filters = SearchFilters(categories=(category,))
+    allowed = snapshot.facets.resolve(filters, snapshot.catalog)
+    selector = IdBitmapSelector(allowed)
+
+    queries = np.random.default_rng(1).standard_normal((20, DIMENSION)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    _, ids = snapshot.search(queries, TOP_K, selector=selector, exact_limit=exact_limit)
+
+    assert ids.shape == (len(queries), TOP_K)
+    assert (ids != -1).all()
+    assert np.isin(ids, allowed).all()
+
+
+def test_exact_search_matches_brute_force(snapshot):
+    allowed = snapshot.facets.resolve(SearchFilters(categories=("rare",)), snapshot.catalog)
+    queries = np.random.default_rng(2).standard_normal((5, DIMENSION)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    _, ids = snapshot.search(
+        queries, TOP_K, selector=IdBitmapSelector(allowed), exact_limit=EXACT_LIMIT
+    )
+
+    scores = queries @ snapshot.catalog.embeddings[allowed - 1].T
+    expected = allowed[np.argsort(-scores, axis=1, kind="stable")[:, :TOP_K]]
+    np.testing.assert_array_equal(ids, expected)
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+from app.embeddings import index_store
+from app.embeddings.catalog import ProductCatalog
+from app.embeddings.index_factory import IndexSpec, build_index
+from app.embeddings.neighbors import NeighborTable
+
+ROWS = 50
+DIMENSION = 8
+TOP_N = 4
+MODEL = "test-model"
+
+
+def _publish(path, neighbors=None):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((ROWS, DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = np.arange(1, ROWS + 1, dtype=np.int64)
+    rows = [(int(pid), f"product {pid}", "", "books", "", 10.0) for pid in ids]
+    catalog = ProductCatalog.from_rows(rows, vectors)
+    index = build_index(vectors, ids, IndexSpec(index_type="flat"))
+    fingerprint = index_store.compute_fingerprint(rows, MODEL)
+    index_store.save_index(path, index, catalog, fingerprint, MODEL, neighbors=neighbors)
+    return fingerprint
+
+
+def _table(fingerprint, fill):
+    rows = np.full((ROWS, TOP_N), fill, dtype=np.int32)
+    scores = np.full((ROWS, TOP_N), 0.5, dtype=np.float16)
+    return NeighborTable(rows, scores, fingerprint)
+
+
+def _release_files(path):
+    release = index_store.release_path(path, index_store.current_release(path))
+    return {
+        os.path.relpath(os.path.join(root, name), release): os.stat(os.path.join(root, name))
+        for root, _, names in os.walk(release)
+        for name in names
+    }
+
+
+def test_save_neighbors_leaves_published_files_untouched(tmp_path):
+    path = str(tmp_path)
+    fingerprint = _publish(path)
+    assert index_store.save_neighbors(path, _table(fingerprint, 1))
+    loaded = index_store.load_index(path, fingerprint, MODEL)
+    assert (loaded.neighbors.rows == 1).all()
+    published = _release_files(path)
+
+    assert index_store.save_neighbors(path, _table(fingerprint, 2))
+
+    after = _release_files(path)
+    for name, stat in published.items():
+        if name != index_store.NEIGHBORS_META_FILE:
+            assert (after[name].st_ino, after[name].st_mtime_ns) == (stat.st_ino, stat.st_mtime_ns)
+    # The table mapped before the swap still reads its own values
+    assert (loaded.neighbors.rows == 1).all()
+    assert (index_store.load_index(path, fingerprint, MODEL).neighbors.rows == 2).all()
+
+
+def test_save_neighbors_keeps_the_last_tables(tmp_path):
+    path = str(tmp_path)
+    fingerprint = _publish(path, neighbors=_table(fingerprint=None, fill=0))
+    for fill in range(1, 4):
+        assert index_store.save_neighbors(path, _table(fingerprint, fill))
+
+    release = index_store.release_path(path, index_store.current_release(path))
+    tables = os.listdir(os.path.join(release, index_store.NEIGHBORS_DIR))
+    assert len(tables) == index_store.KEEP_NEIGHBOR_TABLES
+    assert (index_store.load_index(path, fingerprint, MODEL).neighbors.rows == 3).all()
+
+
+def test_save_neighbors_rejects_another_catalog(tmp_path):
+    path = str(tmp_path)
+    _publish(path)
+    assert not index_store.save_neighbors(path, _table("other", 1))
+    release = index_store.release_path(path, index_store.current_release(path))
+    assert not os.path.exists(os.path.join(release, index_store.NEIGHBORS_DIR))
@@ -0,0 +1,63 @@
+import faiss
+import pytest
+
+from app.embeddings import faiss_service
+from app.extensions import db
+from app.models.product import Product
+
+
+def _delta_ids(snapshot):
+    if snapshot.delta is None:
+        return set()
+    return set(faiss.vector_to_array(snapshot.delta.id_map).tolist())
+
+
+def _tombstone_ids(snapshot):
+    if snapshot.tombstones is None:
+        return set()
+    return set(snapshot.tombstones.ids.tolist())
+
+
+@pytest.fixture
+def synced(app, monkeypatch):
+    """Record every batch index_sync hands to apply_changes, and put the
+    database and snapshot back afterwards."""
+    applied = []
+    apply_changes = faiss_service.apply_changes
+
+    def record(upserts, deleted_ids):
+        applied.append((set(upserts), set(deleted_ids)))
+        apply_changes(upserts, deleted_ids)
+
+    monkeypatch.setattr(faiss_service, "apply_changes", record)
+    with app.app_context():
+        original = faiss_service.snapshot
+        headphones = db.session.get(Product, 1).description
+        yield applied
+        monkeypatch.undo()
+        db.session.rollback()
+        db.session.query(Product).filter(Product.id >= 100).delete()
+        db.session.get(Product, 1).description = headphones
+        db.session.commit()
+        faiss_service.snapshot = original
+
+
+def test_only_committed_changes_reach_the_index(synced):
+    db.session.add(Product(id=100, name="Desk lamp", description="A warm desk lamp"))
+    db.session.get(Product, 1).description = "Noise cancelling over-ear headphones"
+    db.session.commit()
+
+    db.session.add(Product(id=101, name="Garden hose", description="A long garden hose"))
+    db.session.delete(db.session.get(Product, 2))
+    db.session.flush()
+    db.session.rollback()
+    # A later commit carries only its own changes, not the rolled back ones
+    db.session.get(Product, 100).description = "A bright desk lamp"
+    db.session.commit()
+
+    assert synced == [({1, 100}, set()), ({100}, set())]
+    snapshot = faiss_service.snapshot
+    assert _delta_ids(snapshot) == {1, 100}
+    # Product 1's base vector is replaced by its delta vector
+    assert _tombstone_ids(snapshot) == {1}
+    assert 2 in snapshot.catalog.ids[snapshot.catalog.alive]
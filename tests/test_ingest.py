@@ -0,0 +1,103 @@
+import csv
+
+import pytest
+from flask import Flask
+
+from app.core.config import settings
+from app.embeddings import faiss_service
+from app.embeddings.ingest import ingest_catalog, read_catalog
+from app.extensions import db
+from app.models.product import Product
+
+HEADER = ["id", "name", "description", "category", "price"]
+ROWS = [
+    ["10", "Trail shoes", "Light trail running shoes", "Shoes", "59.90"],
+    ["11", "Rain jacket", "Waterproof rain jacket", "Outerwear", "$89"],
+    ["abc", "Bad id", "Skipped: id is not a number", "Shoes", "1"],
+    ["12", "", "Skipped: no name", "Shoes", "1"],
+    ["0", "Zero id", "Skipped: ids start at 1", "Shoes", "1"],
+    ["12", "Wool socks", "Warm wool socks", "Shoes", "9"],
+    # Same id again in another chunk: the later row wins
+    ["10", "Trail shoes", "Light trail running shoes, new colors", "Shoes", "64.90"],
+]
+
+
+def _write_csv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def ingest_app(app, tmp_path, monkeypatch):
+    """An app on an empty database of its own, publishing to a scratch
+    INDEX_DIR; the shared app's snapshot is put back afterwards."""
+    monkeypatch.setattr(settings, "INDEX_DIR", str(tmp_path / "index"))
+    ingest_app = Flask(__name__)
+    ingest_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'ingest.db'}"
+    db.init_app(ingest_app)
+    original = faiss_service.snapshot
+    with ingest_app.app_context():
+        db.create_all()
+        yield ingest_app
+        db.session.remove()
+        db.engine.dispose()
+    faiss_service.snapshot = original
+
+
+def _products():
+    return {
+        product.id: (product.name, product.description, product.price)
+        for product in db.session.query(Product).order_by(Product.id)
+    }
+
+
+def test_read_catalog_skips_invalid_rows(tmp_path, capsys):
+    path = _write_csv(tmp_path / "catalog.csv", HEADER, ROWS)
+    chunks = list(read_catalog(path, chunk_size=3))
+
+    assert [skipped for _, skipped in chunks] == [1, 2, 0]
+    assert [[record["id"] for record in records] for records, _ in chunks] == [[10, 11], [12], [10]]
+    assert chunks[0][0][1]["price"] == 89.0
+    out = capsys.readouterr().out
+    # Line numbers count the header
+    assert "line 4: invalid id 'abc'" in out
+    assert "line 5: no product name" in out
+    assert "line 6: invalid id '0'" in out
+
+
+def test_ingesting_a_file_twice_upserts_by_id(ingest_app, tmp_path):
+    path = _write_csv(tmp_path / "catalog.csv", HEADER, ROWS)
+
+    for _ in range(2):
+        result = ingest_catalog(path, chunk_size=3, workers=1)
+        assert (result["rows"], result["skipped"]) == (4, 3)
+        db.session.expire_all()
+        products = _products()
+        assert sorted(products) == [10, 11, 12]
+        assert products[10] == ("Trail shoes", "Light trail running shoes, new colors", 64.9)
+        assert result["index"]["products"] == 3
+        assert sorted(faiss_service.snapshot.catalog.ids.tolist()) == [10, 11, 12]
+    # The second run found every text in the embedding store
+    assert result["texts_encoded"] == 0
+
+
+def test_ingesting_a_file_without_ids_twice_keeps_its_ids(ingest_app, tmp_path):
+    header = HEADER[1:]
+    rows = [row[1:] for row in ROWS if row[1]]
+    path = _write_csv(tmp_path / "catalog.csv", header, rows)
+
+    result = ingest_catalog(path, chunk_size=2, workers=1)
+    db.session.expire_all()
+    first = _products()
+    # Both "Trail shoes" rows differ in description, so both are products
+    assert (result["rows"], result["skipped"]) == (len(rows), 0)
+    assert len(first) == len(rows)
+
+    result = ingest_catalog(path, chunk_size=2, workers=1)
+    db.session.expire_all()
+    assert _products() == first
+    assert result["index"]["products"] == len(first)
+    assert sorted(faiss_service.snapshot.catalog.ids.tolist()) == sorted(first)
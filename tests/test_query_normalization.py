@@ -0,0 +1,59 @@
+import pytest
+
+from app.embeddings import faiss_service
+from app.embeddings.encoders import _lowercases
+from app.embeddings.faiss_service import normalize_query
+
+from conftest import HashingEncoder
+
+
+class RecordingEncoder(HashingEncoder):
+    def __init__(self, do_lower_case):
+        super().__init__()
+        self.do_lower_case = do_lower_case
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32):
+        self.encoded.extend(texts)
+        return super().encode(texts, batch_size)
+
+
+@pytest.fixture
+def encoder(app, monkeypatch):
+    def use(do_lower_case):
+        encoder = RecordingEncoder(do_lower_case)
+        monkeypatch.setattr(faiss_service, "_encoder", encoder)
+        return encoder
+
+    return use
+
+
+def test_normalize_query_lowercases_only_when_asked():
+    assert normalize_query("  Red\tShoes \n") == "Red Shoes"
+    assert normalize_query("  Red\tShoes \n", lowercase=True) == "red shoes"
+
+
+@pytest.mark.parametrize(
+    "normalizer, lowercases",
+    [
+        ({"type": "BertNormalizer", "lowercase": True}, True),
+        ({"type": "BertNormalizer", "lowercase": False}, False),
+        ({"type": "Sequence", "normalizers": [{"type": "NFD"}, {"type": "Lowercase"}]}, True),
+        ({"type": "NFC"}, False),
+        (None, False),
+    ],
+)
+def test_tokenizer_normalizer_lowercasing(normalizer, lowercases):
+    assert _lowercases(normalizer) is lowercases
+
+
+def test_cased_encoder_keeps_case_apart(encoder):
+    cased = encoder(do_lower_case=False)
+    faiss_service.encode_queries(["Apple Charger", "apple charger"])
+    assert sorted(cased.encoded) == ["Apple Charger", "apple charger"]
+
+
+def test_uncased_encoder_shares_one_embedding(encoder):
+    uncased = encoder(do_lower_case=True)
+    faiss_service.encode_queries(["Pear Charger", "pear  charger"])
+    assert uncased.encoded == ["pear charger"]
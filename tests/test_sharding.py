@@ -0,0 +1,212 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+from flask import Flask
+from flask_restx import Api
+
+from app.embeddings.facets import SearchFilters
+from app.embeddings.sharding import ShardCoordinator, ShardPlan, merge_results
+
+from conftest import API_KEY
+
+DEADLINE_MS = 300
+
+
+def _hit(product_id, score):
+    return {"product_id": product_id, "similarity_score": score, "product": {"id": product_id}}
+
+
+class FakeService:
+    warmup_status = {"state": "ready"}
+
+    def encode_queries(self, queries):
+        return np.ones((len(queries), 4), dtype=np.float32)
+
+
+class FakeShard:
+    """A shard answering /shard/search with fixed hits per query."""
+
+    def __init__(self, hits):
+        self.requests = []
+        shard = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                shard.requests.append((self.path, self.headers.get("X-API-Key"), payload))
+                self._send({"results": [hits for _ in payload["top_ks"]]})
+
+            def do_GET(self):
+                self._send({"status": "ready"})
+
+            def _send(self, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class DeadShard:
+    """Accepts connections and never answers."""
+
+    def __init__(self):
+        self.socket = socket.socket()
+        self.socket.bind(("127.0.0.1", 0))
+        self.socket.listen(16)
+        self.url = f"http://127.0.0.1:{self.socket.getsockname()[1]}"
+
+    def close(self):
+        self.socket.close()
+
+
+@pytest.fixture
+def shards():
+    opened = []
+
+    def open_shard(shard):
+        opened.append(shard)
+        return shard
+
+    yield open_shard
+    for shard in opened:
+        shard.close()
+
+
+def test_plan_partitions_by_id():
+    plan = ShardPlan(3)
+    assert [plan.shard_of(pid, None) for pid in range(6)] == [0, 1, 2, 0, 1, 2]
+    ranged = ShardPlan(3, id_boundaries=(100, 200))
+    assert [ranged.shard_of(pid, None) for pid in (1, 99, 100, 199, 200, 10**6)] == [
+        0, 0, 1, 1, 2, 2
+    ]
+    assert ranged.id_range(1) == (100, 200)
+    assert ranged.owner(150) == 1
+
+
+def test_plan_partitions_by_category():
+    plan = ShardPlan(4, key="category")
+    # Normalized the way facets are, so case and spaces do not move products
+    assert plan.shard_of(1, "Books") == plan.shard_of(2, " books ")
+    assert plan.owner(1) is None
+    only_books = plan.shards_for(SearchFilters(categories=("books",)))
+    assert only_books == [plan.shard_of(0, "books")]
+    assert plan.shards_for(None) == [0, 1, 2, 3]
+
+
+def test_plan_rejects_bad_boundaries():
+    with pytest.raises(ValueError):
+        ShardPlan(3, id_boundaries=(200, 100))
+    with pytest.raises(ValueError):
+        ShardPlan(3, id_boundaries=(100,))
+    with pytest.raises(ValueError):
+        ShardPlan(2, key="category", id_boundaries=(100,))
+
+
+def test_merge_results_orders_by_score_and_drops_duplicates():
+    merged = merge_results(
+        [
+            [_hit(1, 0.9), _hit(2, 0.5)],
+            [_hit(3, 0.95), _hit(1, 0.8), _hit(4, 0.4)],
+        ],
+        top_k=3,
+    )
+    assert [hit["product_id"] for hit in merged] == [3, 1, 2]
+    assert merged[1]["similarity_score"] == 0.9
+
+
+def test_search_merges_shards_and_sends_api_key(shards):
+    first = shards(FakeShard([_hit(1, 0.9), _hit(3, 0.2)]))
+    second = shards(FakeShard([_hit(2, 0.7)]))
+    coordinator = ShardCoordinator(
+        [first.url, second.url], ShardPlan(2), FakeService(), DEADLINE_MS, api_key=API_KEY
+    )
+
+    results = coordinator.search_batch(["red shoes"], [2])
+
+    assert [hit["product_id"] for hit in results[0]] == [1, 2]
+    for shard in (first, second):
+        path, api_key, payload = shard.requests[0]
+        assert path == "/shard/search"
+        assert api_key == API_KEY
+        assert payload["top_ks"] == [2]
+
+
+def test_dead_shard_is_left_out_after_the_deadline(shards):
+    live = shards(FakeShard([_hit(1, 0.9)]))
+    dead = shards(DeadShard())
+    coordinator = ShardCoordinator([live.url, dead.url], ShardPlan(2), FakeService(), DEADLINE_MS)
+
+    started = time.perf_counter()
+    results = coordinator.search_batch(["red shoes"], [5])
+    elapsed = time.perf_counter() - started
+
+    assert [hit["product_id"] for hit in results[0]] == [1]
+    assert elapsed < 3 * DEADLINE_MS / 1000.0
+    shard_stats = coordinator.stats()["shards"]
+    assert shard_stats[0]["timeouts"] == 0
+    assert shard_stats[1]["timeouts"] == 1
+
+
+def test_no_shard_answering_is_unavailable(shards):
+    dead = shards(DeadShard())
+    coordinator = ShardCoordinator([dead.url], ShardPlan(1), FakeService(), DEADLINE_MS)
+    with pytest.raises(RuntimeError):
+        coordinator.search_batch(["red shoes"], [5])
+
+
+def test_readiness_probes_shards_in_parallel(shards):
+    live = shards(FakeShard([]))
+    dead = [shards(DeadShard()) for _ in range(4)]
+    coordinator = ShardCoordinator(
+        [live.url] + [shard.url for shard in dead], ShardPlan(5), FakeService(), DEADLINE_MS
+    )
+
+    started = time.perf_counter()
+    status = coordinator.readiness()
+    elapsed = time.perf_counter() - started
+
+    assert status == {"status": "ready", "shards": ["ready"] + ["unreachable"] * 4}
+    # One deadline for all shards, not one per dead shard
+    assert elapsed < 2 * DEADLINE_MS / 1000.0
+
+
+def test_shard_routes_are_not_served_by_the_public_app(client):
+    assert client.post("/shard/search", json={}).status_code == 404
+    assert client.post("/shard/vector", json={"product_id": 1}).status_code == 404
+
+
+def test_shard_routes_require_an_api_key(app):
+    from app.api.routes.shard import shard_ns
+
+    shard_app = Flask(__name__)
+    Api(shard_app).add_namespace(shard_ns)
+    shard_client = shard_app.test_client()
+
+    assert shard_client.post("/shard/vector", json={"product_id": 1}).status_code == 401
+    response = shard_client.post(
+        "/shard/vector", json={"product_id": 1}, headers={"X-API-Key": "wrong"}
+    )
+    assert response.status_code == 401
+    response = shard_client.post(
+        "/shard/vector", json={"product_id": 1}, headers={"X-API-Key": API_KEY}
+    )
+    assert response.status_code == 200
+    assert response.get_json()["vector"]["shape"] == [1, 32]